@@ -1,4 +1,7 @@
 from abc import ABCMeta, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+import time
 
 
 class AccountClient(object):
@@ -24,26 +27,65 @@ class AccountClient(object):
         raise NotImplementedError('Should implement position()')
 
 class TDAAccountClient(AccountClient):
-    def __init__(self, client, acc_id):
+    '''
+    TDAmeritrade account client. Balances, orders and positions are all served from one snapshot of the account document, fetched with every field in a single request and reused until it is older than ttl seconds or explicitly invalidated.
+
+    :param client: TDA API client linked to the TDAmeritrade account
+    :param acc_id: TDA account number
+    :param ttl: Maximum age in seconds of the cached account snapshot, 0 fetches a fresh snapshot on every access
+    '''
+    FIELDS = ['orders', 'positions']
+
+    def __init__(self, client, acc_id, ttl=0):
         self.client = client
         self.ACC_ID = acc_id
+        self.ttl = ttl
+
+        self._snapshot = None
+        self._snapshot_time = None
 
         self.client.set_enforce_enums(enforce_enums=False) 
 
+    ########################################
+    # Snapshot methods
+
+    def refresh(self):
+        '''
+        Fetches a new snapshot of the account document with all fields.
+        '''
+        response = self.client.get_account(self.ACC_ID, fields=self.FIELDS).json()
+        self._snapshot = response['securitiesAccount']
+        self._snapshot_time = time.monotonic()
+        return self._snapshot
+
+    def invalidate(self):
+        '''
+        Discards the cached snapshot, e.g. after placing orders, so that the next access fetches a new one.
+        '''
+        self._snapshot = None
+
+    def snapshot(self):
+        '''
+        Returns the cached account snapshot, refreshing it if missing or older than the ttl.
+        '''
+        if self._snapshot is None or time.monotonic() - self._snapshot_time >= self.ttl:
+            return self.refresh()
+        return self._snapshot
+
+    ########################################
+    # Account information
+
     @property
     def balance(self):
-        response = self.client.get_account(self.ACC_ID).json()
-        return response['securitiesAccount']['currentBalances']['liquidationValue']
+        return self.snapshot()['currentBalances']['liquidationValue']
 
     @property
     def cash(self):
-        response = self.client.get_account(self.ACC_ID).json()
-        return response['securitiesAccount']['currentBalances']['cashAvailableForTrading']
+        return self.snapshot()['currentBalances']['cashAvailableForTrading']
 
     @property
     def order(self):
-        response = self.client.get_account(self.ACC_ID, fields=['orders']).json()
-        book = response['securitiesAccount']['orderStrategies']
+        book = self.snapshot().get('orderStrategies', list())
         order_book = list()
 
         for order in book:
@@ -62,8 +104,7 @@ class TDAAccountClient(AccountClient):
     
     @property
     def position(self):
-        response = self.client.get_account(self.ACC_ID, fields=['positions']).json()
-        positions = response['securitiesAccount']['positions']
+        positions = self.snapshot().get('positions', list())
         entries = dict()
         total_balance = 0
 
@@ -74,4 +115,14 @@ class TDAAccountClient(AccountClient):
         for ticker in entries:
             entries[ticker] /= total_balance
 
-        return entries
\ No newline at end of file
+        return entries
+
+def refresh_accounts(accounts, max_workers=8):
+    '''
+    Refreshes the snapshots of many TDAAccountClient objects concurrently, returning the snapshots in the same order.
+
+    :param accounts: List of TDAAccountClient objects
+    :param max_workers: Maximum number of concurrent account requests
+    '''
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(lambda a: a.refresh(), accounts))
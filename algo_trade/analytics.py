@@ -0,0 +1,198 @@
+import numpy as np
+import pandas as pd
+import warnings
+
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def _as_array(x):
+    return np.asarray(x, dtype=np.float64)
+
+def _nan_reduce(func, x, **kwargs):
+    '''
+    Applies a NaN-aware reduction along axis 0, returning NaN for all-NaN slices without warning.
+    '''
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return func(x, axis=0, **kwargs)
+
+def returns(equity):
+    '''
+    Returns the period returns of equity curves, with NaN in the first row.
+
+    Like every function of this module, works along axis 0 of an array with one bar per row, such as a (bars, curves) array with one equity curve per column, or a single curve.
+
+    :param equity: Array of equity curves
+    '''
+    equity = _as_array(equity)
+    result = np.full(equity.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result[1:] = equity[1:] / equity[:-1] - 1.0
+    return result
+
+def drawdowns(equity, relative=False):
+    '''
+    Returns the drawdown and the drawdown duration in bars of equity curves at every bar. Drawdowns are measured from the running high-water mark, ignoring missing values, in the units of the curve like create_drawdowns, or as a fraction of the high-water mark if relative is set.
+
+    Durations count the bars since the curve was last at its high-water mark, and are NaN before its first valid value.
+
+    :param equity: Array of equity curves
+    :param relative: Measure drawdowns as a fraction of the high-water mark
+    '''
+    equity = _as_array(equity)
+    hwm = np.fmax.accumulate(equity, axis=0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdown = 1.0 - equity / hwm if relative else hwm - equity
+
+    # Durations run from the last bar at the high-water mark, missing values counting as in drawdown
+    idx = np.arange(len(equity)).reshape((-1,) + (1,) * (equity.ndim - 1))
+    last_high = np.maximum.accumulate(np.where(drawdown == 0, idx, -1), axis=0)
+    duration = np.where(last_high >= 0, idx - last_high, np.nan)
+
+    return drawdown, duration
+
+def max_drawdown(equity, relative=False):
+    '''
+    Returns the maximum drawdown of equity curves.
+
+    :param equity: Array of equity curves
+    :param relative: Measure drawdowns as a fraction of the high-water mark
+    '''
+    return _nan_reduce(np.nanmax, drawdowns(equity, relative)[0])
+
+def max_duration(equity):
+    '''
+    Returns the longest drawdown duration in bars of equity curves.
+
+    :param equity: Array of equity curves
+    '''
+    return _nan_reduce(np.nanmax, drawdowns(equity)[1])
+
+def sharpe_ratio(returns, periods=252, rf=0):
+    '''
+    Returns the annualised Sharpe ratio of period returns, with the same definition as create_sharpe_ratio.
+
+    :param returns: Array of period returns
+    :param periods: Daily (252), Hourly (252 * 6.5), Minutely (252 * 6.5 * 60), etc.
+    :param rf: Annual risk-free rate
+    '''
+    excess = _as_array(returns) - rf / periods
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.sqrt(periods) * _nan_reduce(np.nanmean, excess) / _nan_reduce(np.nanstd, excess)
+
+def sortino_ratio(returns, periods=252, rf=0):
+    '''
+    Returns the annualised Sortino ratio of period returns: the mean excess return over the downside deviation, the root mean square of negative excess returns.
+
+    :param returns: Array of period returns
+    :param periods: Daily (252), Hourly (252 * 6.5), Minutely (252 * 6.5 * 60), etc.
+    :param rf: Annual risk-free rate
+    '''
+    excess = _as_array(returns) - rf / periods
+    downside = np.sqrt(_nan_reduce(np.nanmean, np.minimum(excess, 0.0) ** 2))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.sqrt(periods) * _nan_reduce(np.nanmean, excess) / downside
+
+def annualised_return(equity, periods=252):
+    '''
+    Returns the compound annual growth rate of equity curves between their first and last values.
+
+    :param equity: Array of equity curves
+    :param periods: Number of bars per year
+    '''
+    equity = _as_array(equity)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (equity[-1] / equity[0]) ** (periods / (len(equity) - 1.0)) - 1.0
+
+def calmar_ratio(equity, periods=252):
+    '''
+    Returns the Calmar ratio of equity curves: the annualised return over the maximum relative drawdown.
+
+    :param equity: Array of equity curves
+    :param periods: Number of bars per year
+    '''
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return annualised_return(equity, periods) / max_drawdown(equity, relative=True)
+
+def ulcer_index(equity):
+    '''
+    Returns the ulcer index of equity curves: the root mean square of relative drawdowns.
+
+    :param equity: Array of equity curves
+    '''
+    return np.sqrt(_nan_reduce(np.nanmean, drawdowns(equity, relative=True)[0] ** 2))
+
+def rolling(func, x, window, block_size=1 << 22, **kwargs):
+    '''
+    Applies one of the functions of this module over a rolling window of bars, returning an array of the same shape as x with the value of the window ending at each bar, and NaN where the window is incomplete.
+
+    Windows are strided views of x, processed in blocks of about block_size values at a time to bound memory.
+
+    :param func: Function reducing axis 0, e.g. sharpe_ratio
+    :param x: Array of equity curves or returns, depending on func
+    :param window: Number of bars per window
+    :param block_size: Approximate number of values per block of windows
+    '''
+    x = _as_array(x)
+    result = np.full(x.shape, np.nan)
+    if len(x) < window:
+        return result
+
+    # (windows, ..., window) view moved to (window, windows, ...) so that func reduces axis 0
+    windows = np.moveaxis(sliding_window_view(x, window, axis=0), -1, 0)
+    step = max(block_size // (window * max(x[0].size, 1)), 1)
+
+    for start in range(0, windows.shape[1], step):
+        result[window - 1 + start:window - 1 + start + step] = func(windows[:, start:start + step], **kwargs)
+    return result
+
+def rolling_max_drawdown(equity, window, relative=False):
+    return rolling(max_drawdown, equity, window, relative=relative)
+
+def rolling_max_duration(equity, window):
+    return rolling(max_duration, equity, window)
+
+def rolling_sharpe_ratio(returns, window, periods=252, rf=0):
+    return rolling(sharpe_ratio, returns, window, periods=periods, rf=rf)
+
+def rolling_sortino_ratio(returns, window, periods=252, rf=0):
+    return rolling(sortino_ratio, returns, window, periods=periods, rf=rf)
+
+def rolling_calmar_ratio(equity, window, periods=252):
+    return rolling(calmar_ratio, equity, window, periods=periods)
+
+def rolling_ulcer_index(equity, window):
+    return rolling(ulcer_index, equity, window)
+
+def summarize(equity, periods=252, rf=0):
+    '''
+    Returns a DataFrame of summary statistics with one row per equity curve, e.g. to rank the curves of a parameter sweep. Curves of a DataFrame keep its column labels.
+
+    :param equity: (bars, curves) array or DataFrame of equity curves
+    :param periods: Number of bars per year
+    :param rf: Annual risk-free rate
+    '''
+    labels = equity.columns if isinstance(equity, pd.DataFrame) else None
+    equity = _as_array(equity)
+    if equity.ndim == 1:
+        equity = equity[:, None]
+
+    period_returns = returns(equity)
+    drawdown, duration = drawdowns(equity)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        total_return = equity[-1] / equity[0] - 1.0
+
+    return pd.DataFrame(
+        {
+            'total_return': total_return,
+            'sharpe_ratio': sharpe_ratio(period_returns, periods, rf),
+            'sortino_ratio': sortino_ratio(period_returns, periods, rf),
+            'max_drawdown': _nan_reduce(np.nanmax, drawdown),
+            'drawdown_duration': _nan_reduce(np.nanmax, duration),
+            'calmar_ratio': calmar_ratio(equity, periods),
+            'ulcer_index': ulcer_index(equity),
+        },
+        index=labels,
+    )
@@ -1,113 +1,489 @@
 from __future__ import print_function
 
 import datetime
+import numpy as np
+import pandas as pd
 import pprint
-import queue
 import time
 
+from algo_trade.checkpoint import Checkpointer, load_checkpoint
+from algo_trade.event import EventQueue, EventType
+from algo_trade.journal import EventJournal
+
+
+class BacktestStats(object):
+    '''
+    Throughput statistics of a backtest run: bars processed, events handled by event type and wall time spent in each handler, from which bars/sec and events/sec are derived.
+
+    :param events: Optional dictionary of event counts by EventType to report on, such as EventQueue.counts
+    '''
+    HANDLERS = ['strategy', 'portfolio', 'execution']
+
+    def __init__(self, events=None):
+        self.events = events if events is not None else dict((t, 0) for t in EventType)
+        self.handler_time = dict((k, 0.0) for k in self.HANDLERS)
+        self.elapsed = 0.0
+
+    @property
+    def bars(self):
+        return self.events['MARKET']
+
+    @property
+    def bars_per_sec(self):
+        return self.bars / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def events_per_sec(self):
+        return dict((k.value, v / self.elapsed if self.elapsed else 0.0) for k, v in self.events.items())
+
+    def as_dict(self):
+        '''
+        Returns the statistics as a plain dictionary, e.g. for tracking engine throughput between releases.
+        '''
+        return {
+            'bars': self.bars,
+            'elapsed': self.elapsed,
+            'bars_per_sec': self.bars_per_sec,
+            'events': dict((k.value, v) for k, v in self.events.items()),
+            'events_per_sec': self.events_per_sec,
+            'handler_time': dict(self.handler_time),
+        }
+
+class StrategyEvents(object):
+    '''
+    Event queue handed to one of several strategies run side by side, which tags the signals the strategy puts with its strategy_id so that they reach the strategy's own portfolio.
+
+    :param events: Shared event queue
+    :param strategy_id: Identifier of the strategy
+    '''
+    def __init__(self, events, strategy_id):
+        self.events = events
+        self.strategy_id = strategy_id
+
+    def put(self, event, block=True, timeout=None):
+        if event is not None and event.type is EventType.SIGNAL:
+            event.strategy_id = self.strategy_id
+        self.events.put(event)
+
+    def empty(self):
+        return self.events.empty()
+
+    def qsize(self):
+        return self.events.qsize()
 
 class Backtest(object):
     '''
     Encapsulates the settings and components for carrying out an event-driven backtest.
 
+    A heartbeat of 0 replays historical data as fast as possible, without sleeping between bars. The run is silent apart from the optional progress reporter, and returns throughput statistics alongside the performance summary.
+
+    Passing a LatencyRecorder as latency records latency histograms for every event type and every handler, named e.g. 'MARKET' and 'MARKET.strategy'. Profile hooks such as CProfileHook are told the number of each bar before it is processed. Neither adds any work to the loop when not given.
+
+    With a journal path, every handled event is recorded to an EventJournal that JournalReplay can replay without the data handler. Checkpoints store the journal size, and resuming truncates the journal back to it, so that the bars replayed after a resume are not recorded twice.
+
+    Given a ResultsSink as results, the equity curve, trades and summary statistics of each strategy are written to it in the background rather than to equity CSV files. The sink is not closed, so that several backtests can share it, with results named <results_name>/strategy_<strategy_id> to tell their runs apart.
+
+    With a checkpoint path, the full engine state is checkpointed every checkpoint_interval bars on a background thread, and an interrupted run can be continued with resume().
+
+    Several strategies can be run over a single pass of the data by giving a list of strategy classes, a list of strategy parameter dictionaries, or both. Strategy i then gets strategy_id i and its own portfolio, and signals and fills are routed to that portfolio by strategy_id.
+
     :param csv_dir: Hard root to CSV data directory
     :param ticker_list: List of ticker strings
     :param initial_capital: Starting capital for portfolio
-    :param heartbeat: Backtest "heartbeat" in seconds
+    :param heartbeat: Backtest "heartbeat" in seconds, 0 to fast-forward
     :param start_date: Start datetime of the strategy
     :param data_handler: (Class) Handles market datafeed
     :param execution_handler: (Class) Handles the orders/fills for trades
     :param portfolio: (Class) Keeps track of portfolio current and prior positions
-    :param strategy: (Class) Generates signals based on market data
+    :param strategy: (Class) Generates signals based on market data, or a list of classes
+    :param progress: Optional callable receiving the BacktestStats every progress_interval bars
+    :param progress_interval: Number of bars between progress reports
+    :param bar_store: Optional pre-loaded BarStore passed to the data handler instead of loading csv_dir
+    :param strategy_params: Optional dictionary of keyword arguments for the strategy, or a list of dictionaries
+    :param checkpoint_path: Optional file the engine state is periodically checkpointed to
+    :param checkpoint_interval: Number of bars between checkpoints
+    :param latency: Optional LatencyRecorder for per event type and per handler latency histograms
+    :param profile_hooks: Optional list of hooks, such as CProfileHook, called with each bar number
+    :param journal_path: Optional file every handled event is journaled to
+    :param results: Optional ResultsSink the results of every strategy are written to
+    :param results_name: Optional name of the run, prefixed to the names of its results
+    :param sizer: Optional PositionSizer shared by the portfolios, sizing the signals of each bar together
     '''
-    def __init__(self, csv_dir, ticker_list, initial_capital, heartbeat, start_date, data_handler, execution_handler, portfolio, strategy):
+    def __init__(self, csv_dir, ticker_list, initial_capital, heartbeat, start_date, data_handler, execution_handler, portfolio, strategy, progress=None, progress_interval=1000, bar_store=None, strategy_params=None, checkpoint_path=None, checkpoint_interval=10000, latency=None, profile_hooks=None, journal_path=None, results=None, sizer=None, results_name=None):
         self.csv_dir = csv_dir
         self.ticker_list = ticker_list
         self.initial_capital = initial_capital
         self.heartbeat = heartbeat
         self.start_date = start_date
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self.bar_store = bar_store
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.latency = latency
+        self.profile_hooks = profile_hooks or list()
+        self.journal_path = journal_path
+        self.results = results
+        self.results_name = results_name
+        self.sizer = sizer
 
         self.data_handler_cls = data_handler
         self.execution_handler_cls = execution_handler
         self.portfolio_cls = portfolio
-        self.strategy_cls = strategy
 
-        self.events = queue.Queue()
+        # One (class, parameters) pair per strategy
+        strategies = strategy if isinstance(strategy, (list, tuple)) else None
+        params = strategy_params if isinstance(strategy_params, (list, tuple)) else None
+        num_strats = len(strategies or params or [None])
+        self.strategy_classes = strategies or [strategy] * num_strats
+        self.strategy_params = params or [strategy_params or dict()] * num_strats
+
+        if len(self.strategy_classes) != len(self.strategy_params):
+            raise ValueError('Got %d strategies but %d parameter sets' % (len(self.strategy_classes), len(self.strategy_params)))
 
-        self.signals = 0
-        self.orders = 0
-        self.fills = 0
-        self.num_strats = 1
+        self.events = EventQueue(latency)
+
+        self.num_strats = num_strats
+        self.run_stats = BacktestStats(self.events.counts)
 
         self._generate_trading_instances()
 
     def _generate_trading_instances(self):
         '''
-        Generates trading instance objects from their class types.
+        Generates trading instance objects from their class types and subscribes their handlers to the event queue.
+        '''
+        if self.bar_store is None:
+            self.data_handler = self.data_handler_cls(self.events, self.ticker_list, self.csv_dir)
+        else:
+            self.data_handler = self.data_handler_cls(self.events, self.ticker_list, bar_store=self.bar_store)
+
+        portfolio_params = dict() if self.sizer is None else {'sizer': self.sizer}
+        self.strategies = list()
+        self.portfolios = list()
+        for i, (strategy_cls, params) in enumerate(zip(self.strategy_classes, self.strategy_params)):
+            events = self.events if self.num_strats == 1 else StrategyEvents(self.events, i)
+            self.strategies.append(strategy_cls(self.data_handler, events, **params))
+            self.portfolios.append(self.portfolio_cls(self.data_handler, self.events, self.start_date, self.initial_capital, strategy_id=i, **portfolio_params))
+
+        self.strategy = self.strategies[0]
+        self.portfolio = self.portfolios[0]
+
+        # Simulated brokers are both the data handler and the execution handler
+        if isinstance(self.data_handler, self.execution_handler_cls):
+            self.execution_handler = self.data_handler
+        else:
+            self.execution_handler = self.execution_handler_cls(self.events)
+
+        self.journal = None
+        if self.journal_path:
+            self.journal = EventJournal(self.journal_path, self.data_handler)
+            self.journal.attach(self.events)
+
+        for strategy in self.strategies:
+            self._subscribe(EventType.MARKET, 'strategy', strategy.calculate_signals)
+        for portfolio in self.portfolios:
+            self._subscribe(EventType.MARKET, 'portfolio', portfolio.update_timeindex)
+        self._subscribe(EventType.ORDER, 'execution', self.execution_handler.execute_order)
+
+        # The signals of a bar are sized together
+        if self.num_strats == 1:
+            self._subscribe(EventType.SIGNAL, 'portfolio', self.portfolio.update_signals, batch=True)
+            self._subscribe(EventType.FILL, 'portfolio', self.portfolio.update_fill)
+        else:
+            portfolios = self.portfolios
+            self._subscribe(EventType.SIGNAL, 'portfolio', self._route_signals, batch=True)
+            self._subscribe(EventType.FILL, 'portfolio', lambda e: portfolios[e.strategy_id].update_fill(e))
+
+    def _route_signals(self, signals):
+        '''
+        Splits a batch of signals by strategy_id, passing each strategy's signals to its portfolio.
+        '''
+        batches = dict()
+        for signal in signals:
+            batches.setdefault(signal.strategy_id, list()).append(signal)
+        for strategy_id, batch in batches.items():
+            self.portfolios[strategy_id].update_signals(batch)
+
+    def _subscribe(self, event_type, name, handler, batch=False):
+        '''
+        Subscribes an event handler to the event queue, timed under the given handler name. Batch handlers receive runs of consecutive events as a list.
         '''
-        print('Creating DataHandler, Strategy, Portfolio, and ExecutionHandler')
-        self.data_handler = self.data_handler_cls(self.events, self.csv_dir, self.ticker_list) # This is assuming HistoricCSVDataHandler class
-        self.strategy = self.strategy_cls(self.data_handler, self.events)
-        self.portfolio = self.portfolio_cls(self.data_handler, self.events, self.start_date, self.initial_capital)
-        self.execution_handler = self.execution_handler_cls(self.events)
+        timed_handler = self._timed(event_type, name, handler)
+        if batch:
+            self.events.subscribe_batch(event_type, timed_handler)
+        else:
+            self.events.subscribe(event_type, timed_handler)
+
+    def _timed(self, event_type, name, handler):
+        '''
+        Wraps an event handler to add its wall time to the run statistics, and to its latency histogram if latency is recorded.
+        '''
+        handler_time = self.run_stats.handler_time
+        clock = time.perf_counter
+
+        if self.latency is None:
+            def timed_handler(event):
+                start = clock()
+                handler(event)
+                handler_time[name] += clock() - start
+        else:
+            record = self.latency.histogram('%s.%s' % (event_type.value, name)).record
+
+            def timed_handler(event):
+                start = clock()
+                handler(event)
+                elapsed = clock() - start
+                handler_time[name] += elapsed
+                record(elapsed)
+
+        return timed_handler
+
+    @property
+    def signals(self):
+        return self.events.counts[EventType.SIGNAL]
+
+    @property
+    def orders(self):
+        return self.events.counts[EventType.ORDER]
+
+    @property
+    def fills(self):
+        return self.events.counts[EventType.FILL]
+
+    def checkpoint_state(self):
+        '''
+        Returns a snapshot of the engine state: the data cursor, pending events, event counters, the journal size and the state of every portfolio and strategy. The snapshot holds no references to objects the event loop goes on to modify.
+        '''
+        return {
+            'data_handler': self.data_handler.checkpoint_state(),
+            'events': list(self.events._queue),
+            'counts': dict(self.events.counts),
+            'handler_time': dict(self.run_stats.handler_time),
+            'elapsed': self.run_stats.elapsed,
+            'portfolios': [p.checkpoint_state() for p in self.portfolios],
+            'strategies': [s.checkpoint_state() for s in self.strategies],
+            'journal': self.journal.tell() if self.journal else None,
+        }
+
+    def restore_state(self, state):
+        '''
+        Restores the engine state returned by checkpoint_state.
+        '''
+        if len(state['portfolios']) != self.num_strats:
+            raise ValueError('Checkpoint has %d strategies, expected %d' % (len(state['portfolios']), self.num_strats))
+
+        self.data_handler.restore_state(state['data_handler'])
+
+        self.events._queue.clear()
+        self.events._queue.extend(state['events'])
+        self.events.counts.update(state['counts'])
+        self.run_stats.handler_time.update(state['handler_time'])
+        self.run_stats.elapsed = state['elapsed']
+
+        for portfolio, portfolio_state in zip(self.portfolios, state['portfolios']):
+            portfolio.restore_state(portfolio_state)
+        for strategy, strategy_state in zip(self.strategies, state['strategies']):
+            strategy.restore_state(strategy_state)
+
+        if self.journal and state['journal'] is not None:
+            self.journal.truncate(state['journal'])
+
+    def resume(self, path=None):
+        '''
+        Restores the engine state from a checkpoint file, by default checkpoint_path, so that the next run continues from the checkpointed bar.
+        '''
+        self.restore_state(load_checkpoint(path or self.checkpoint_path))
 
     def _run_backtest(self):
         '''
-        Executes the backtest.
+        Executes the backtest, returning its BacktestStats.
         '''
-        i = 0
-        while True:
-            i += 1
-            print(i)
+        stats = self.run_stats
+        clock = time.perf_counter
+        start = clock() - stats.elapsed
+        next_report = (stats.bars // self.progress_interval + 1) * self.progress_interval
+
+        checkpointer = None
+        if self.checkpoint_path:
+            checkpointer = Checkpointer(self.checkpoint_path)
+            next_checkpoint = (stats.bars // self.checkpoint_interval + 1) * self.checkpoint_interval
+
+        hooks = self.profile_hooks
+
+        # The journal is closed at the end of every run and reopened by the next
+        if self.journal:
+            self.journal.open()
+
+        try:
+            while self.data_handler.continue_backtest:
+                if hooks:
+                    for hook in hooks:
+                        hook.on_bar(stats.bars)
 
-            if self.data_handler.continue_backtest == True:
                 self.data_handler.update_bars()
-            else:
-                break
-
-            # Handle events queue
-            while True:
-                try:
-                    event = self.events.get(False)
-                except queue.Empty:
-                    break
-                else:
-                    if event is not None:
-                        if event.type == 'MARKET':
-                            self.strategy.calculate_signals(event)
-                            self.portfolio.update_timeindex(event)
-                        elif event.type == 'SIGNAL':
-                            self.signals += 1
-                            self.portfolio.update_signal(event)
-                        elif event.type == 'ORDER':
-                            self.orders += 1
-                            self.execution_handler.execute_order(event)
-                        elif event.type == 'FILL':
-                            self.fills += 1
-                            self.portfolio.update_fill(event)
-
-            time.sleep(self.heartbeat)
+                self.events.dispatch()
+
+                if self.progress and stats.bars >= next_report:
+                    stats.elapsed = clock() - start
+                    self.progress(stats)
+                    next_report += self.progress_interval
+
+                # Retry on the next bar rather than snapshot while the previous checkpoint is being written
+                if checkpointer and stats.bars >= next_checkpoint and not checkpointer.busy:
+                    stats.elapsed = clock() - start
+                    checkpointer.save(self.checkpoint_state())
+                    next_checkpoint += self.checkpoint_interval
+
+                if self.heartbeat:
+                    time.sleep(self.heartbeat)
+        finally:
+            for hook in hooks:
+                hook.close()
+            if checkpointer:
+                checkpointer.close()
+            if self.journal:
+                self.journal.close()
+
+        stats.elapsed = clock() - start
+        return stats
+
+    def compare(self):
+        '''
+        Returns a DataFrame comparing the summary statistics of every strategy, indexed by strategy_id.
+        '''
+        rows = list()
+        for strategy, portfolio in zip(self.strategies, self.portfolios):
+            portfolio.create_equity_curve_dataframe()
+            row = {'strategy': type(strategy).__name__}
+            row.update(portfolio.summary_stats())
+            rows.append(row)
+        return pd.DataFrame(rows, index=pd.Index(range(self.num_strats), name='strategy_id'))
 
     def _output_performance(self):
         '''
-        Outputs the strategy performance from the backtest
+        Outputs the strategy performance from the backtest, returning the summary statistics of the first strategy
         '''
-        self.portfolio.create_equity_curve_dataframe()
+        reports = list()
+        for i, portfolio in enumerate(self.portfolios):
+            portfolio.create_equity_curve_dataframe()
 
-        print('Creating summary stats...')
-        stats = self.portfolio.output_summary_stats()
+            print('Creating summary stats...')
+            name = 'strategy_%d' % i if self.results_name is None else '%s/strategy_%d' % (self.results_name, i)
+            stats = portfolio.output_summary_stats('equity.csv' if self.num_strats == 1 else 'equity_%d.csv' % i, sink=self.results, name=name)
+            reports.append(stats)
 
-        print('Creating equity curve...')
-        print(self.portfolio.equity_curve.tail(10))
-        pprint.pprint(stats)
+            print('Creating equity curve...')
+            print(portfolio.equity_curve.tail(10))
+            pprint.pprint(stats)
+
+        if self.num_strats > 1:
+            print(self.compare())
+        stats = reports[0]
 
         print('Signals: %s' % self.signals)
         print('Orders: %s' % self.orders)
         print('Fills: %s' % self.fills)
+        print('Bars/sec: %0.1f' % self.run_stats.bars_per_sec)
+
+        return stats
 
     def simulate_trading(self):
         '''
-        Simulates the backtest and outputs portfolio performance.
+        Simulates the backtest and outputs portfolio performance, returning the summary statistics, the comparison of all strategies and the throughput statistics of the run, plus the latency summary if recorded.
         '''
         self._run_backtest()
-        self._output_performance()
\ No newline at end of file
+        stats = self._output_performance()
+        results = {'stats': stats, 'comparison': self.compare(), 'throughput': self.run_stats.as_dict()}
+        if self.latency is not None:
+            results['latency'] = self.latency.summary()
+        return results
+
+def signals_to_positions(signals, quantity=100):
+    '''
+    Converts a (bars, tickers) signal matrix into target share positions with the same rules as the default PositionSizer of Portfolio: LONG (1) or SHORT (-1) signals open a position of the given quantity only when flat, EXIT (0) signals close the position, and NaN means no signal.
+
+    :param signals: 2-D array of 1, -1, 0 or NaN values
+    :param quantity: Number of shares per position
+    '''
+    signals = np.asarray(signals, dtype=np.float64)
+    rows = np.arange(len(signals))[:, None]
+
+    exits = signals == 0
+    entries = (signals == 1) | (signals == -1)
+
+    # An entry only takes effect if no other entry happened since the last exit
+    last_exit = np.maximum.accumulate(np.where(exits, rows, -1), axis=0)
+    last_entry = np.maximum.accumulate(np.where(entries, rows, -1), axis=0)
+    prev_entry = np.vstack([np.full((1, signals.shape[1]), -1), last_entry[:-1]])
+    effective = exits | (entries & (prev_entry <= last_exit))
+
+    # Forward-fill the effective signals into a direction per bar
+    source = np.maximum.accumulate(np.where(effective, rows, -1), axis=0)
+    direction = np.where(source >= 0, np.take_along_axis(signals, np.maximum(source, 0), axis=0), 0.0)
+
+    return direction * quantity
+
+class VectorizedBacktest(object):
+    '''
+    Computes a backtest with NumPy array operations over the aligned bar panel instead of dispatching events bar by bar. Intended for screening strategies and parameters quickly before moving them to the event-driven Backtest.
+
+    Fills follow SimulatedBroker and Portfolio: positions targeted at a bar are filled at that bar's price and first show in the holdings of the next bar, and the equity curve has the same layout as Portfolio.create_equity_curve_dataframe().
+
+    :param bar_store: BarStore of aligned market data
+    :param strategy: VectorizedStrategy instance returning target positions
+    :param start_date: Start datetime of the strategy
+    :param initial_capital: Starting capital for portfolio
+    :param commission: Commission charged per share traded
+    :param price_field: Bar field used to fill orders and value holdings
+    '''
+    def __init__(self, bar_store, strategy, start_date, initial_capital=100000.0, commission=0.0, price_field='adj_close'):
+        self.bar_store = bar_store
+        self.strategy = strategy
+        self.start_date = start_date
+        self.initial_capital = initial_capital
+        self.commission = commission
+        self.price_field = price_field
+
+        self.equity_curve = None
+
+    def run(self, positions=None):
+        '''
+        Runs the backtest and returns the equity curve DataFrame.
+
+        :param positions: Optional (bars, tickers) target positions, computed with the strategy if not given
+        '''
+        if positions is None:
+            positions = self.strategy.calculate_positions(self.bar_store)
+
+        positions = np.asarray(positions, dtype=np.float64)
+        prices = self.bar_store.data[self.price_field]
+        num_bars, num_tickers = prices.shape
+
+        # Positions held at each bar are the targets filled on the previous bar
+        held = np.zeros((num_bars + 1, num_tickers))
+        held[2:] = positions[:-1]
+
+        trades = np.diff(positions, axis=0, prepend=0.0)
+        trade_cost = np.where(trades != 0, trades * prices, 0.0).sum(axis=1)
+        trade_commission = self.commission * np.abs(trades).sum(axis=1)
+
+        # Cash and commission recorded at each bar exclude that bar's fills
+        commission = np.zeros(num_bars + 1)
+        commission[2:] = np.cumsum(trade_commission)[:-1]
+        cash = np.full(num_bars + 1, float(self.initial_capital))
+        cash[2:] -= np.cumsum(trade_cost + trade_commission)[:-1]
+
+        holdings = np.zeros((num_bars + 1, num_tickers))
+        holdings[1:] = held[1:] * prices
+        total = cash + holdings.sum(axis=1)
+
+        curve = pd.DataFrame(holdings, columns=self.bar_store.ticker_list)
+        curve['cash'] = cash
+        curve['commission'] = commission
+        curve['total'] = total
+        curve.index = pd.Index([self.start_date] + list(self.bar_store.index), name='datetime')
+
+        curve['returns'] = curve['total'].pct_change()
+        curve['equity_curve'] = (1.0+curve['returns']).cumprod()
+        self.equity_curve = curve
+        return curve
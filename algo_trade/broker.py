@@ -1,12 +1,17 @@
 from __future__ import print_function
 from abc import ABCMeta, abstractmethod
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
 
 import numpy as np
 import os
 import pandas as pd
+import time
 
-from algo_trade.event import FillEvent, OrderEvent, MarketEvent
+from algo_trade.data import CSV_COLUMNS, BarStore, CandleStore, CSVCache, WindowStore, iter_bar_csv, read_bar_csv
+from algo_trade.event import EventType, FillEvent, OrderEvent, MarketEvent
+from algo_trade.utilities import RateLimiter
 from tda.orders import equities
 
 
@@ -29,203 +34,500 @@ class SimulatedBroker(Broker):
     :param events: Event queue
     :param csv_dir: Absolute directory path to CSV files
     :param ticker_list: List of ticker strings
-    :param test: Helper for unittest - blocks importing of CSV files
+    :param cache_dir: Optional directory of the binary cache of parsed CSV files
+    :param workers: Optional number of worker processes used to parse CSV files in parallel
+    :param bar_store: Optional pre-built BarStore, such as one attached to a published panel, used instead of loading CSV files
     '''
-    def __init__(self, events, ticker_list, csv_dir=None):
+    def __init__(self, events, ticker_list, csv_dir=None, cache_dir=None, workers=None, bar_store=None):
         # Initialization states
         self.events = events
         self.csv_dir = csv_dir
         self.ticker_list = ticker_list
+        self.cache = CSVCache(cache_dir) if cache_dir else None
+        self.workers = workers
 
-        # Data elements
-        self.ticker_data = dict()
-        self.latest_ticker_data = dict()
-        self.ticker_generator = dict()
+        # Data elements - columnar bar store and cursor to the next bar to be pushed
+        self.bar_store = bar_store
+        self.cursor = 0
         
         self.continue_backtest = True
 
-        if csv_dir:
+        if csv_dir and bar_store is None:
             self._open_convert_csv_files()
 
     ########################################
     # Data Initialization methods
+
+    def _read_csv_files(self, paths):
+        '''
+        Returns the parsed (index, values, fields) of every path. Cache hits are memory-mapped in directly, while misses are parsed across a pool of worker processes if workers is set.
+        '''
+        if self.cache:
+            results = [self.cache.load(p) for p in paths]
+            read = self.cache.read
+        else:
+            results = [None] * len(paths)
+            read = read_bar_csv
+
+        misses = [i for i, r in enumerate(results) if r is None]
+        miss_paths = [paths[i] for i in misses]
+
+        if self.workers and self.workers > 1 and len(misses) > 1:
+            chunksize = max(1, len(misses) // (self.workers * 4))
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                parsed = list(pool.map(read, miss_paths, chunksize=chunksize))
+        else:
+            parsed = [read(p) for p in miss_paths]
+
+        for i, r in zip(misses, parsed):
+            results[i] = r
+
+        return results
     
     def _open_convert_csv_files(self):
         '''
-        Opens CSV files from the data directory, converting them in pandas DataFrames within a ticker dictionary. Current assumption is that the data is taken from YFinance.
+        Opens CSV files from the data directory, converting them into the columnar bar store in one alignment step once all tickers are loaded. Parsed files are read from and saved to the binary cache if one is configured.
         '''
-        comb_index = None
-        for t in self.ticker_list:
-            self.ticker_data[t] = pd.io.parsers.read_csv(
-                os.path.join(self.csv_dir, '%s.csv' % t),
-                header=0,
-                index_col=0,
-                parse_dates=True,
-                names=[
-                    'datetime', 'open', 'high', 'low', 'close', 'volume', 'adj_close'
-                ]
-            ).sort_index()
-
-            if comb_index is None:
-                comb_index = self.ticker_data[t].index
-            else:
-                comb_index.union(self.ticker_data[t].index)
+        paths = [os.path.join(self.csv_dir, '%s.csv' % t) for t in self.ticker_list]
+        results = self._read_csv_files(paths)
+
+        self.bar_store = BarStore.from_arrays(
+            self.ticker_list,
+            [r[0] for r in results],
+            [r[1] for r in results],
+            results[0][2],
+        )
+        self.cursor = 0
+        self.continue_backtest = True
 
-            self.latest_ticker_data[t] = []
+    def load_ticker_data(self, ticker_data):
+        '''
+        Loads a dictionary of ticker DataFrames into the columnar bar store and rewinds the cursor to the first bar.
 
-        for t in self.ticker_list:
-            self.ticker_data[t] = self.ticker_data[t].reindex(index=comb_index, method='pad')
-            self.ticker_generator[t] = self.ticker_data[t].iterrows()
+        :param ticker_data: Dictionary of ticker to DataFrame indexed by datetime
+        '''
+        self.bar_store = BarStore.from_frames(ticker_data, self.ticker_list)
+        self.cursor = 0
+        self.continue_backtest = True
 
-    def _get_new_bar(self, ticker):
+    def _get_ticker_loc(self, ticker):
         '''
-        Returns latest bar from the data feed.
+        Returns the bar store column of the ticker, checking that at least one bar is available.
         '''
-        return next(self.ticker_generator[ticker])
+        try:
+            loc = self.bar_store.ticker_loc[ticker]
+        except KeyError:
+            print('That ticker is not available in the historical dataset.')
+            raise
+
+        if self.cursor == 0:
+            raise IndexError('No bars have been pushed for %s yet.' % ticker)
+
+        return loc
+
+    def _make_bar(self, loc, i):
+        '''
+        Returns the (timestamp, Series) bar tuple for a bar store column and row.
+        '''
+        timestamp = pd.Timestamp(self.bar_store.index[i])
+        values = dict((f, arr[i, loc]) for f, arr in self.bar_store.data.items())
+        return (timestamp, pd.Series(values, name=timestamp))
 
     ########################################
     # Data retrieval methods
     
     def get_latest_bar(self, ticker):
         '''
-        Returns the last bar from the latest_ticker list.
+        Returns the last bar as a (timestamp, Series) tuple.
         '''
-        try:
-            bars_list = self.latest_ticker_data[ticker]
-        except KeyError:
-            print('That ticker is not available in the historical dataset.')
-            raise
-        else:
-            return bars_list[-1]
+        loc = self._get_ticker_loc(ticker)
+        return self._make_bar(loc, self.cursor - 1)
 
     def get_latest_bars(self, ticker, N=1):
         '''
-        Returns the last N bars from the latest_ticker list, of N-k if less available.
+        Returns the last N bars as (timestamp, Series) tuples, of N-k if less available.
         '''
-        try:
-            bars_list = self.latest_ticker_data[ticker]
-        except KeyError:
-            print('That ticker is not available in the historical dataset.')
-            raise
-        else:
-            return bars_list[-N:]
+        loc = self._get_ticker_loc(ticker)
+        return [self._make_bar(loc, i) for i in range(max(self.cursor - N, 0), self.cursor)]
 
     def get_latest_bar_datetime(self, ticker):
         '''
         Return Python datetime object for the last bar.
         '''
-        try:
-            bars_list = self.latest_ticker_data[ticker]
-        except KeyError:
-            print('That ticker is not available in the historical dataset.')
-            raise
-        else:
-            return bars_list[-1][0]
+        self._get_ticker_loc(ticker)
+        return pd.Timestamp(self.bar_store.index[self.cursor - 1])
 
     def get_latest_bar_value(self, ticker, val_type):
         '''
-        Returns one of the OHLCVI values from the pandas Bar series object.
+        Returns one of the OHLCVI values of the last bar.
         '''
-        try:
-            bars_list = self.latest_ticker_data[ticker]
-        except KeyError:
-            print('That ticker is not available in the historical dataset.')
-            raise
-        else:
-            return getattr(bars_list[-1][1], val_type)
+        loc = self._get_ticker_loc(ticker)
+        return self.bar_store.data[val_type][self.cursor - 1, loc]
 
     def get_latest_bars_values(self, ticker, val_type, N=1):
         '''
-        Returns last N bar values from the latest_symbol list, or N-k if less available.
+        Returns last N bar values as a read-only view into the bar store, or N-k if less available.
         '''
-        try:
-            bars_list = self.get_latest_bars(ticker, N)
-        except KeyError:
-            print('That ticker is not available in the historical dataset.')
-            raise
-        else:
-            return np.array([getattr(b[1], val_type) for b in bars_list])
+        loc = self._get_ticker_loc(ticker)
+        values = self.bar_store.data[val_type][max(self.cursor - N, 0):self.cursor, loc]
+        values.flags.writeable = False
+        return values
 
     def update_bars(self):
         '''
-        Pushes latest bar to the latest_ticker_data structure for all tickers in the ticker list.
+        Advances the bar store cursor, making the next bar visible for all tickers in the ticker list.
         '''
-        for t in self.ticker_list:
-            try:
-                bar = self._get_new_bar(t)
-            except StopIteration:
-                self.continue_backtest = False
-            else:
-                if bar is not None:
-                    self.latest_ticker_data[t].append((bar[0], bar[1]))
+        if self.cursor < len(self.bar_store):
+            self.cursor += 1
+            self.events.put(MarketEvent())
+        else:
+            self.continue_backtest = False
 
-        self.events.put(MarketEvent())
+    def checkpoint_state(self):
+        '''
+        Returns the data cursor for checkpointing.
+        '''
+        return {'cursor': self.cursor, 'continue_backtest': self.continue_backtest}
+
+    def restore_state(self, state):
+        '''
+        Moves the data cursor back to the position returned by checkpoint_state.
+        '''
+        self.cursor = state['cursor']
+        self.continue_backtest = state['continue_backtest']
 
     def execute_order(self, event):
         '''
         Converts OrderEvent into FillEvent objects naively
         '''
-        if event.type == 'ORDER':
-            fill_cost = self.get_latest_bar_value('SPY', 'adj_close') * event.quantity
+        if event.type is EventType.ORDER:
+            fill_cost = self.get_latest_bar_value(event.ticker, 'adj_close') * event.quantity
             fill_event = FillEvent(
-                datetime.utcnow(), event.ticker, 'ARCA', event.quantity, event.action, fill_cost
+                datetime.utcnow(), event.ticker, 'ARCA', event.quantity, event.action, fill_cost,
+                strategy_id=event.strategy_id,
             )
             self.events.put(fill_event)
 
+class StreamingSimulatedBroker(SimulatedBroker):
+    '''
+    Simulated execution handler that streams bars from CSV files, or their binary cache entries, in bounded-size chunks instead of loading full histories into memory. Peak memory depends on the number of tickers, the chunk size and the lookback window rather than on the length of history.
+
+    Tickers are merged onto the union of their timestamps, carrying forward the last bar of any ticker without a bar at a given timestamp. CSV files must already be sorted by date. At least the last lookback bars are always available to the get_latest_bar* methods.
+
+    :param events: Event queue
+    :param ticker_list: List of ticker strings
+    :param csv_dir: Absolute directory path to CSV files
+    :param lookback: Number of most recent bars retained for strategies
+    :param chunksize: Number of rows read from each file at a time
+    :param cache_dir: Optional directory of the binary cache of parsed CSV files, used for files already cached
+    '''
+    EXHAUSTED = np.iinfo(np.int64).max
+
+    def __init__(self, events, ticker_list, csv_dir, lookback=100, chunksize=1024, cache_dir=None):
+        self.lookback = lookback
+        self.chunksize = chunksize
+        super().__init__(events, ticker_list, csv_dir, cache_dir)
+
+    ########################################
+    # Data Initialization methods
+
+    def _open_source(self, path):
+        '''
+        Returns a generator of (index, values) chunks for a file and its fields, reading from the binary cache if the file has an entry.
+        '''
+        cached = self.cache.load(path) if self.cache else None
+        if cached is None:
+            return iter_bar_csv(path, self.chunksize), CSV_COLUMNS[1:]
+
+        index, values, fields = cached
+        chunks = (
+            (np.array(index[i:i + self.chunksize]), np.array(values[i:i + self.chunksize]))
+            for i in range(0, len(index), self.chunksize)
+        )
+        return chunks, fields
+
+    def _open_convert_csv_files(self):
+        '''
+        Opens a chunked reader for every ticker and allocates the lookback window buffers.
+        '''
+        self._sources = list()
+        for t in self.ticker_list:
+            source, fields = self._open_source(os.path.join(self.csv_dir, '%s.csv' % t))
+            self._sources.append(source)
+
+        num_tickers = len(self.ticker_list)
+        self._chunk_index = [None] * num_tickers
+        self._chunk_values = [None] * num_tickers
+        self._chunk_pos = [0] * num_tickers
+        self._heads = np.empty(num_tickers, dtype=np.int64)
+
+        for i in range(num_tickers):
+            self._next_chunk(i)
+
+        # Window buffers hold up to twice the lookback, compacting back to the lookback when full
+        self.capacity = 2 * max(self.lookback, 1)
+        self._index_buffer = np.empty(self.capacity, dtype='datetime64[ns]')
+        self._value_buffer = np.full((self.capacity, num_tickers, len(fields)), np.nan)
+
+        self.bar_store = WindowStore(
+            self._index_buffer,
+            self.ticker_list,
+            dict((f, self._value_buffer[:, :, j]) for j, f in enumerate(fields)),
+        )
+        self.cursor = 0
+        self.bars_pushed = 0
+        self.continue_backtest = True
+
+    def _next_chunk(self, i):
+        '''
+        Loads the next non-empty chunk of a ticker, marking the ticker as exhausted at the end of its file.
+        '''
+        for index, values in self._sources[i]:
+            if len(index):
+                self._chunk_index[i] = index.astype('datetime64[ns]').view(np.int64)
+                self._chunk_values[i] = values
+                self._chunk_pos[i] = 0
+                self._heads[i] = self._chunk_index[i][0]
+                return
+
+        self._chunk_index[i] = None
+        self._chunk_values[i] = None
+        self._heads[i] = self.EXHAUSTED
+
+    ########################################
+    # Data retrieval methods
+
+    def update_bars(self):
+        '''
+        Pushes the next timestamp across all tickers into the lookback window.
+        '''
+        if self._push_bar():
+            self.events.put(MarketEvent())
+        else:
+            self.continue_backtest = False
+
+    def _push_bar(self):
+        '''
+        Pushes the next timestamp into the lookback window, returning False once all sources are exhausted.
+        '''
+        timestamp = self._heads.min()
+
+        if timestamp == self.EXHAUSTED:
+            return False
+
+        if self.cursor == self.capacity:
+            keep = self.capacity - self.lookback
+            self._index_buffer[:self.lookback] = self._index_buffer[keep:]
+            self._value_buffer[:self.lookback] = self._value_buffer[keep:]
+            self.cursor = self.lookback
+
+        row = self.cursor
+        if row > 0:
+            self._value_buffer[row] = self._value_buffer[row - 1]
+        self._index_buffer[row] = timestamp
+
+        for i in np.flatnonzero(self._heads == timestamp):
+            pos = self._chunk_pos[i]
+            self._value_buffer[row, i] = self._chunk_values[i][pos]
+
+            pos += 1
+            if pos == len(self._chunk_index[i]):
+                self._next_chunk(i)
+            else:
+                self._chunk_pos[i] = pos
+                self._heads[i] = self._chunk_index[i][pos]
+
+        self.cursor += 1
+        self.bars_pushed += 1
+        self.bar_store.rows = self.cursor
+        return True
+
+    def checkpoint_state(self):
+        '''
+        Returns the number of bars pushed for checkpointing.
+        '''
+        return {'bars_pushed': self.bars_pushed, 'continue_backtest': self.continue_backtest}
+
+    def restore_state(self, state):
+        '''
+        Reopens the sources and pushes bars without emitting market events until the position returned by checkpoint_state, which also rebuilds the lookback window.
+        '''
+        self._open_convert_csv_files()
+        while self.bars_pushed < state['bars_pushed'] and self._push_bar():
+            pass
+        self.continue_backtest = state['continue_backtest']
+
+@dataclass(frozen=True)
+class OrderAck:
+    '''
+    Acknowledgement of an order submitted to a live broker.
+
+    :param order: Submitted OrderEvent
+    :param response: Raw response returned by the broker API
+    :param latency: Round trip time of the submission in seconds
+    '''
+    order: OrderEvent
+    response: object
+    latency: float
+
+class OrderSubmissionError(Exception):
+    '''
+    Raised when some orders of a batch of concurrent submissions failed, carrying the outcome of every order of the batch so that the caller can tell which went through.
+
+    :param acks: List of the OrderAck of each order in submission order, None for the orders that failed
+    :param errors: List of (OrderEvent, exception) pairs of the orders that failed
+    '''
+    def __init__(self, acks, errors):
+        super().__init__('%d of %d orders failed, first error: %r' % (len(errors), len(acks), errors[0][1]))
+        self.acks = acks
+        self.errors = errors
+
 class TDABroker(Broker):
     '''
-    TDAmeritrade execution handler, takes OrderEvent objects and submits trades via the TDA API. Current feature is HTTP trade submission only, does not return FillEvent information.
+    TDAmeritrade execution handler, takes OrderEvent objects and submits trades via the TDA API. Current feature is HTTP trade submission only, does not return FillEvent information. Orders can be submitted concurrently under a rate limit, each returning an OrderAck with its latency.
 
     Future - Research TDA API trade execution receipt
 
     :param client:  TDA API client that links handler to TDAmeritrade account
     :param acc_id:  TDA account number
     :param events:  Queue of Event objects
+    :param ticker_list: List of ticker strings
+    :param max_workers: Optional number of threads sending API requests concurrently
+    :param rate_limit: Optional maximum number of API requests per second
+    :param retries: Number of times a failed API request is retried
+    :param candle_dir: Optional directory of the local price history store, so that only missing ranges are downloaded
+    :param async_orders: Submit orders concurrently in the background instead of blocking on each one
+    :param latency: Optional LatencyRecorder receiving the latency of every API call, e.g. 'price_history' and 'order.BUY'. Rate limit waits are not included
+
+    The order submission threads are shut down by close(), or on leaving a with block.
     '''
-    def __init__(self, client, acc_id, events, ticker_list):
+    PRICE_FIELDS = ['open', 'high', 'low', 'close']
+
+    def __init__(self, client, acc_id, events, ticker_list, max_workers=None, rate_limit=None, retries=2, candle_dir=None, async_orders=False, latency=None):
         self.client = client
         self.ACC_ID = acc_id
         self.events = events
         self.ticker_list = ticker_list
 
+        # Request concurrency settings - threads share the client and its connection pool
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(rate_limit) if rate_limit else None
+        self.retries = retries
+        self.retry_backoff = 0.5
+        self.latency = latency
+
+        self.candle_store = CandleStore(candle_dir) if candle_dir else None
+        self.bar_store = None
+
+        # Order submission pipeline
+        self.async_orders = async_orders
+        self.order_pool = None
+        self.pending_orders = list()
+
     ########################################
     # Data methods
 
+    def _request(self, name, method, *args, **kwargs):
+        '''
+        Calls a client method under the rate limit, retrying failed calls with exponential backoff. The latency of every attempt is recorded under the given name.
+        '''
+        if self.latency is not None:
+            method = self.latency.wrap(name, method)
+
+        for attempt in range(self.retries + 1):
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+
+            try:
+                return method(*args, **kwargs)
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.retry_backoff * 2 ** attempt)
+
+    def _get_price_history(self, ticker, params):
+        '''
+        Returns the sorted (index, values) arrays of one ticker's price history.
+        '''
+        def fetch():
+            return self.client.get_price_history(ticker, **params).json()['candles']
+
+        candles = self._request('price_history', fetch)
+        fields = self.PRICE_FIELDS
+
+        index = np.array([c['datetime'] for c in candles], dtype='datetime64[ms]')
+        values = np.array([[c[f] for f in fields] for c in candles], dtype=np.float64).reshape(-1, len(fields))
+
+        order = np.argsort(index, kind='stable')
+        return index[order], values[order]
+
+    def _get_stored_price_history(self, ticker, params, start, end):
+        '''
+        Returns one ticker's price history between start and end from the candle store, first downloading and merging in any ranges the store does not cover yet.
+        '''
+        frequency = '%s-%s' % (params['frequency_type'], params['frequency'])
+
+        for range_start, range_end in self.candle_store.missing_ranges(ticker, frequency, start, end):
+            index, values = self._get_price_history(
+                ticker,
+                dict(
+                    period_type=params['period_type'],
+                    frequency_type=params['frequency_type'],
+                    frequency=params['frequency'],
+                    start_datetime=pd.Timestamp(range_start).to_pydatetime(),
+                    end_datetime=pd.Timestamp(range_end).to_pydatetime(),
+                ),
+            )
+            self.candle_store.merge(ticker, frequency, index, values, self.PRICE_FIELDS, range_start, range_end)
+
+        return self.candle_store.read(ticker, frequency, start, end)
+
+    def _period_range(self, period_type, period):
+        '''
+        Returns the (start, end) timestamps of a price history period ending now.
+        '''
+        end = pd.Timestamp.utcnow().tz_localize(None).floor('s')
+
+        if period_type == 'ytd':
+            start = pd.Timestamp(end.year, 1, 1)
+        else:
+            start = end - pd.DateOffset(**{'%ss' % period_type: period})
+
+        return start, end
+
     def get_data(self, period_type = 'year', period = 1, frequency_type = 'daily', frequency = 1):
         '''
-        Returns dataframe dictionary of historical prices for a list of tickers
+        Returns dataframe dictionary of historical prices for a list of tickers, aligned onto the union of their timestamps. The aligned bars are also kept in the bar_store attribute.
+
+        Requests are sent concurrently across max_workers threads if set, under the client-side rate limit, and each ticker is retried on failure. If a candle store is configured, only the ranges it does not already cover are requested.
         '''
-        comb_index = None
-        for t in self.ticker_list:
-            response = self.client.get_price_history(
-                t,
-                period_type=period_type,
-                period=period,
-                frequency_type=frequency_type,
-                frequeny=frequency,
-            ).json()
-
-            price_history = pd.DataFrame(
-                    data=response['candles'],
-                    columns=['datetime', 'open', 'high', 'low', 'close'],
-                )
-            price_history.set_index('datetime', inplace=True)
-
-            self.ticker_data[t] = price_history
-
-            if comb_index is None:
-                comb_index = self.ticker_data[t].index
-            else:
-                comb_index.union(self.ticker_data[t].index)
+        params = dict(
+            period_type=period_type,
+            period=period,
+            frequency_type=frequency_type,
+            frequency=frequency,
+        )
 
-            self.latest_ticker_data[t] = list()
+        if self.candle_store is None:
+            get_history = lambda t: self._get_price_history(t, params)
+        else:
+            start, end = self._period_range(period_type, period)
+            get_history = lambda t: self._get_stored_price_history(t, params, start, end)
 
-        for t in self.ticker_list:
-            self.ticker_data[t] = self.ticker_data[t].reindex(index=comb_index, method='pad')
-            self.ticker_data[t].sort_index(inplace=True)
-            self.ticker_generator[t] = self.ticker_data[t].iterrows()
+        if self.max_workers and self.max_workers > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                results = list(pool.map(get_history, self.ticker_list))
+        else:
+            results = [get_history(t) for t in self.ticker_list]
+
+        self.bar_store = BarStore.from_arrays(
+            self.ticker_list,
+            [r[0] for r in results],
+            [r[1] for r in results],
+            self.PRICE_FIELDS,
+        )
 
-        return self.ticker_data
+        return dict((t, self.bar_store.to_frame(t)) for t in self.ticker_list)
 
     ########################################
     # Rebalance Portfolio Methods
@@ -307,7 +609,7 @@ class TDABroker(Broker):
         Takes OrderEvent and submits a BUY order to the TDA account
         '''
         if event.trade_type == 'MARKET':
-            self.client.place_order(
+            return self.client.place_order(
                 self.ACC_ID,
                 equities.equity_buy_market(
                     event.ticker,
@@ -315,7 +617,7 @@ class TDABroker(Broker):
                 ),
             )
         elif event.trade_type == 'LIMIT' and event.limit:
-            self.client.place_order(
+            return self.client.place_order(
                 self.ACC_ID,
                 equities.equity_buy_limit(
                     event.ticker,
@@ -331,7 +633,7 @@ class TDABroker(Broker):
         Takes OrderEvent and submits a SELL order to the TDA account
         '''
         if event.trade_type == 'MARKET':
-            self.client.place_order(
+            return self.client.place_order(
                 self.ACC_ID,
                 equities.equity_sell_market(
                     event.ticker,
@@ -339,7 +641,7 @@ class TDABroker(Broker):
                 ),
             )
         elif event.trade_type == 'LIMIT' and event.limit:
-            self.client.place_order(
+            return self.client.place_order(
                 self.ACC_ID,
                 equities.equity_sell_limit(
                     event.ticker,
@@ -350,12 +652,78 @@ class TDABroker(Broker):
         else:
             raise Exception('Invalid SELL order.')
 
-    def execute_order(self, event):
+    def _place_order(self, event):
         '''
-        Virtual method - takes OrderEvent and calls self._submitBuy() and self._submitSell() in accordance to the order type
+        Submits an OrderEvent under the rate limit, returning an OrderAck with the broker response and the round trip latency. Orders are never retried, to avoid duplicate submissions.
         '''
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+
+        start = time.perf_counter()
         if event.action == 'BUY':
-            self._submitBuy(event)
+            response = self._submitBuy(event)
+        elif event.action == 'SELL':
+            response = self._submitSell(event)
+        else:
+            raise Exception('Invalid order action.')
+
+        latency = time.perf_counter() - start
+        if self.latency is not None:
+            self.latency.record('order.%s' % event.action, latency)
+
+        return OrderAck(event, response, latency)
+
+    def submit_order(self, event):
+        '''
+        Queues an OrderEvent for concurrent submission across max_workers threads, returning a Future of its OrderAck.
+        '''
+        if self.order_pool is None:
+            self.order_pool = ThreadPoolExecutor(max_workers=self.max_workers or 1)
+
+        future = self.order_pool.submit(self._place_order, event)
+        self.pending_orders.append((event, future))
+        return future
+
+    def wait_orders(self):
+        '''
+        Blocks until every queued order is submitted, returning their OrderAcks in submission order. If any submission failed, raises an OrderSubmissionError holding the acks of the orders that went through and the errors of those that did not.
+        '''
+        pending, self.pending_orders = self.pending_orders, list()
+
+        acks = list()
+        errors = list()
+        for event, future in pending:
+            try:
+                acks.append(future.result())
+            except Exception as e:
+                acks.append(None)
+                errors.append((event, e))
+
+        if errors:
+            raise OrderSubmissionError(acks, errors) from errors[0][1]
+        return acks
+
+    def close(self):
+        '''
+        Waits for the queued orders to be submitted and shuts down the order submission threads. Use wait_orders() first to get their acks.
+        '''
+        if self.order_pool is not None:
+            self.order_pool.shutdown()
+            self.order_pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def execute_order(self, event):
+        '''
+        Virtual method - takes OrderEvent and calls self._submitBuy() and self._submitSell() in accordance to the order type.
+
+        Returns the OrderAck, or a Future of it without blocking if async_orders is set.
+        '''
+        if self.async_orders:
+            return self.submit_order(event)
 
-        if event.action =='SELL':
-            self._submitSell(event)
\ No newline at end of file
+        return self._place_order(event)
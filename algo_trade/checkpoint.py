@@ -0,0 +1,96 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import os
+import pickle
+import struct
+import zlib
+
+
+MAGIC = b'ATCK'
+VERSION = 1
+HEADER = struct.Struct('<4sHH')
+
+def dumps_checkpoint(state, compress=True):
+    '''
+    Serializes a checkpoint state dictionary to bytes: a small header followed by the pickled state, zlib-compressed if compress is set.
+
+    :param state: Dictionary of engine state
+    :param compress: Compress the pickled state
+    '''
+    payload = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+    if compress:
+        payload = zlib.compress(payload, 1)
+    return HEADER.pack(MAGIC, VERSION, int(compress)) + payload
+
+def loads_checkpoint(data):
+    '''
+    Deserializes the bytes written by dumps_checkpoint back into the state dictionary.
+    '''
+    magic, version, compressed = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('Not a version %d checkpoint' % VERSION)
+
+    payload = data[HEADER.size:]
+    if compressed:
+        payload = zlib.decompress(payload)
+    return pickle.loads(payload)
+
+def load_checkpoint(path):
+    '''
+    Reads the checkpoint state dictionary stored at path.
+    '''
+    with open(path, 'rb') as fh:
+        return loads_checkpoint(fh.read())
+
+class Checkpointer(object):
+    '''
+    Writes engine checkpoints to a file on a background thread, so that serialization, compression and disk I/O do not stall the event loop. Each checkpoint is written to a temporary file and renamed over the previous one, so a crash mid-write leaves the last complete checkpoint in place.
+
+    A checkpoint requested while the previous one is still being written is skipped rather than queued, so that a slow disk never builds up a backlog of stale states. Callers can check busy before taking a snapshot at all.
+
+    :param path: Checkpoint file path
+    :param compress: Compress checkpoints
+    '''
+    def __init__(self, path, compress=True):
+        self.path = path
+        self.compress = compress
+        self.written = 0
+
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = None
+
+    @property
+    def busy(self):
+        return self._pending is not None and not self._pending.done()
+
+    def save(self, state):
+        '''
+        Schedules a state dictionary to be written, returning False if it was skipped because a write is in progress. The state must not be modified afterwards.
+        '''
+        if self.busy:
+            return False
+
+        if self._pending is not None:
+            self._pending.result()
+        self._pending = self._executor.submit(self._write, state)
+        return True
+
+    def _write(self, state):
+        data = dumps_checkpoint(state, self.compress)
+
+        tmp_path = '%s.tmp' % self.path
+        with open(tmp_path, 'wb') as fh:
+            fh.write(data)
+        os.replace(tmp_path, self.path)
+        self.written += 1
+
+    def wait(self):
+        '''
+        Blocks until the checkpoint being written, if any, is on disk, re-raising any error of the write.
+        '''
+        if self._pending is not None:
+            self._pending.result()
+
+    def close(self):
+        self.wait()
+        self._executor.shutdown()
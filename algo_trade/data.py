@@ -0,0 +1,426 @@
+import hashlib
+import json
+import numpy as np
+import os
+import pandas as pd
+import shutil
+import tempfile
+
+
+CSV_COLUMNS = ['datetime', 'open', 'high', 'low', 'close', 'volume', 'adj_close']
+
+def read_bar_csv(path, names=CSV_COLUMNS):
+    '''
+    Parses a bar CSV file into a sorted datetime64 index array, a 2-D float64 array of values and the list of value fields. Current assumption is that the data is taken from YFinance.
+
+    :param path: Path to the CSV file
+    :param names: Column names, starting with the datetime column
+    '''
+    frame = pd.read_csv(
+        path,
+        header=0,
+        index_col=0,
+        parse_dates=True,
+        names=names,
+    ).sort_index()
+
+    return frame.index.values, frame.to_numpy(dtype=np.float64), list(frame.columns)
+
+def iter_bar_csv(path, chunksize, names=CSV_COLUMNS):
+    '''
+    Generates (index, values) array chunks of at most chunksize rows from a bar CSV file, without loading the whole file. Rows are returned in file order.
+
+    :param path: Path to the CSV file
+    :param chunksize: Maximum number of rows per chunk
+    :param names: Column names, starting with the datetime column
+    '''
+    reader = pd.read_csv(
+        path,
+        header=0,
+        index_col=0,
+        parse_dates=True,
+        names=names,
+        chunksize=chunksize,
+    )
+
+    with reader:
+        for frame in reader:
+            yield frame.index.values, frame.to_numpy(dtype=np.float64)
+
+def generate_bars(ticker_list, num_bars, seed=0, start='2000-01-03', freq='B'):
+    '''
+    Generates deterministic synthetic OHLCV bars as a random walk per ticker, for benchmarks and tests. The same arguments always give the same bars.
+
+    Returns a dictionary of ticker to DataFrame with the fields of CSV_COLUMNS, indexed by datetime.
+
+    :param ticker_list: List of ticker strings
+    :param num_bars: Number of bars per ticker
+    :param seed: Random seed
+    :param start: First bar datetime
+    :param freq: Pandas frequency string of the bars
+    '''
+    rng = np.random.RandomState(seed)
+    index = pd.date_range(start, periods=num_bars, freq=freq, name='datetime')
+
+    ticker_data = dict()
+    for t in ticker_list:
+        close = 100.0 * np.cumprod(1.0 + rng.normal(0.0, 0.01, num_bars))
+        open_ = np.concatenate([[100.0], close[:-1]]) * (1.0 + rng.normal(0.0, 0.002, num_bars))
+        spread = np.abs(rng.normal(0.0, 0.005, (2, num_bars)))
+
+        ticker_data[t] = pd.DataFrame(
+            {
+                'open': open_,
+                'high': np.maximum(open_, close) * (1.0 + spread[0]),
+                'low': np.minimum(open_, close) * (1.0 - spread[1]),
+                'close': close,
+                'volume': rng.randint(1000, 100000, num_bars).astype(np.float64),
+                'adj_close': close,
+            },
+            index=index,
+        )
+
+    return ticker_data
+
+def write_bar_csv(ticker_data, csv_dir):
+    '''
+    Writes bars to one <ticker>.csv file per ticker in csv_dir, in the layout read by read_bar_csv.
+
+    :param ticker_data: Dictionary of ticker to DataFrame with the fields of CSV_COLUMNS
+    :param csv_dir: Directory of the CSV files
+    '''
+    for t, frame in ticker_data.items():
+        frame[CSV_COLUMNS[1:]].to_csv(os.path.join(csv_dir, '%s.csv' % t), index_label=CSV_COLUMNS[0])
+
+def align_bars(indexes, values):
+    '''
+    Aligns per-ticker bars onto the union of their timestamps in a single vectorized pass. Every ticker is forward-filled from its last observed bar, and bars before a ticker's first observation are left as NaN.
+
+    Returns the union calendar as a datetime64[ns] array, a list of 2-D (bars, tickers) float64 arrays (one per field) and a boolean (bars, tickers) array marking the bars that were filled rather than observed.
+
+    :param indexes: List of sorted datetime64 index arrays, one per ticker
+    :param values: List of 2-D float64 arrays of shape (rows, fields), one per ticker
+    '''
+    num_tickers = len(indexes)
+    lengths = [len(i) for i in indexes]
+
+    # Union calendar and the calendar row of every observation
+    flat_index = np.concatenate([np.asarray(i, dtype='datetime64[ns]') for i in indexes])
+    calendar, rows = np.unique(flat_index, return_inverse=True)
+    cols = np.repeat(np.arange(num_tickers), lengths)
+
+    # Position of each observation in the flattened values, forward-filled down every column
+    source = np.full((len(calendar), num_tickers), -1, dtype=np.int64)
+    source[rows.ravel(), cols] = np.arange(len(flat_index))
+    filled = source < 0
+    np.maximum.accumulate(source, axis=0, out=source)
+
+    # Trailing NaN row so that bars before a ticker's first observation gather NaN
+    flat_values = np.concatenate(
+        [np.asarray(v, dtype=np.float64) for v in values] + [np.full((1, values[0].shape[1]), np.nan)]
+    )
+
+    panels = list()
+    for j in range(flat_values.shape[1]):
+        panel = np.empty((len(calendar), num_tickers))
+        np.take(flat_values[:, j], source, out=panel)
+        panels.append(panel)
+
+    return calendar, panels, filled
+
+
+class BarStore(object):
+    '''
+    Columnar store of aligned market bars. Each field (open, high, low, close, volume, adj_close, etc.) is held as one contiguous float64 array of shape (bars, tickers), with every ticker sharing a single datetime index.
+
+    Data handlers keep a cursor into the store rather than copying bars around, so single values are O(1) index lookups and windows of bars are zero-copy slices.
+
+    :param index: Sorted DatetimeIndex of bar timestamps
+    :param ticker_list: List of ticker strings, one per array column
+    :param data: Dictionary of field name to 2-D float64 array of shape (bars, tickers)
+    :param filled: Optional boolean array of shape (bars, tickers) marking stale bars carried forward from an earlier timestamp
+    '''
+    def __init__(self, index, ticker_list, data, filled=None):
+        self.index = index
+        self.ticker_list = list(ticker_list)
+        self.data = data
+        self.filled = filled
+
+        self.ticker_loc = dict((t, i) for i, t in enumerate(self.ticker_list))
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def fields(self):
+        return list(self.data)
+
+    @classmethod
+    def from_arrays(cls, ticker_list, indexes, values, fields):
+        '''
+        Builds a BarStore from per-ticker arrays, aligned onto the union of their timestamps with align_bars().
+
+        :param ticker_list: List of ticker strings
+        :param indexes: List of sorted datetime64 index arrays, one per ticker
+        :param values: List of 2-D float64 arrays of shape (rows, fields), one per ticker
+        :param fields: List of field names matching the value columns
+        '''
+        calendar, panels, filled = align_bars(indexes, values)
+        return cls(pd.DatetimeIndex(calendar), ticker_list, dict(zip(fields, panels)), filled)
+
+    @classmethod
+    def from_frames(cls, ticker_data, ticker_list=None):
+        '''
+        Builds a BarStore from a dictionary of ticker DataFrames, aligned onto the union of their timestamps.
+
+        :param ticker_data: Dictionary of ticker to DataFrame indexed by datetime
+        :param ticker_list: Optional column order of tickers, defaults to the dictionary order
+        '''
+        if ticker_list is None:
+            ticker_list = list(ticker_data)
+
+        fields = list()
+        for t in ticker_list:
+            for col in ticker_data[t].columns:
+                if col not in fields:
+                    fields.append(col)
+
+        frames = [ticker_data[t].sort_index().reindex(columns=fields) for t in ticker_list]
+
+        return cls.from_arrays(
+            ticker_list,
+            [f.index.values for f in frames],
+            [f.to_numpy(dtype=np.float64) for f in frames],
+            fields,
+        )
+
+    def slice(self, start, stop):
+        '''
+        Returns a BarStore over bars [start, stop) that shares memory with this store, without copying any data.
+
+        :param start: First bar position
+        :param stop: Bar position after the last bar
+        '''
+        return BarStore(
+            self.index[start:stop],
+            self.ticker_list,
+            dict((f, arr[start:stop]) for f, arr in self.data.items()),
+            None if self.filled is None else self.filled[start:stop],
+        )
+
+    def to_frame(self, ticker):
+        '''
+        Returns a DataFrame of all fields for a single ticker.
+        '''
+        i = self.ticker_loc[ticker]
+        return pd.DataFrame(
+            dict((f, arr[:, i]) for f, arr in self.data.items()),
+            index=self.index,
+        )
+
+    def publish(self, path):
+        '''
+        Writes the store to a directory of .npy files that other processes can attach() to. Placing the directory on a RAM-backed filesystem such as /dev/shm keeps the panel in shared memory.
+
+        :param path: Directory to publish to, must not already exist
+        '''
+        parent = os.path.dirname(os.path.abspath(path))
+        tmp_dir = tempfile.mkdtemp(dir=parent, prefix='.tmp-')
+
+        np.save(os.path.join(tmp_dir, 'index.npy'), np.asarray(self.index, dtype='datetime64[ns]'))
+        for j, f in enumerate(self.fields):
+            np.save(os.path.join(tmp_dir, 'field%d.npy' % j), np.ascontiguousarray(self.data[f]))
+        if self.filled is not None:
+            np.save(os.path.join(tmp_dir, 'filled.npy'), self.filled)
+
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as fh:
+            json.dump({'ticker_list': self.ticker_list, 'fields': self.fields}, fh)
+
+        # Rename last so that attaching processes never see a partially written panel
+        os.rename(tmp_dir, path)
+
+    @classmethod
+    def attach(cls, path):
+        '''
+        Returns a read-only BarStore memory-mapped from a directory written by publish(). Pages are shared through the OS page cache, so any number of processes can attach without copying the panel.
+
+        :param path: Directory of a published store
+        '''
+        with open(os.path.join(path, 'meta.json')) as fh:
+            meta = json.load(fh)
+
+        index = pd.DatetimeIndex(np.load(os.path.join(path, 'index.npy')))
+        data = dict(
+            (f, np.load(os.path.join(path, 'field%d.npy' % j), mmap_mode='r'))
+            for j, f in enumerate(meta['fields'])
+        )
+
+        filled_path = os.path.join(path, 'filled.npy')
+        filled = np.load(filled_path, mmap_mode='r') if os.path.exists(filled_path) else None
+
+        return cls(index, meta['ticker_list'], data, filled)
+
+class WindowStore(BarStore):
+    '''
+    BarStore over a preallocated window buffer of which only the first rows bars are filled, such as the lookback window of a streaming data handler. The handler writes bars into the buffer in place and updates rows, so len() is the number of bars held rather than the buffer size.
+
+    :param index: Index buffer of bar timestamps
+    :param ticker_list: List of ticker strings, one per array column
+    :param data: Dictionary of field name to 2-D float64 buffer of shape (capacity, tickers)
+    :param rows: Number of filled bars at the start of the buffers
+    '''
+    def __init__(self, index, ticker_list, data, rows=0):
+        super().__init__(index, ticker_list, data)
+        self.rows = rows
+
+    def __len__(self):
+        return self.rows
+
+    def to_frame(self, ticker):
+        return self.slice(0, self.rows).to_frame(ticker)
+
+    def publish(self, path):
+        self.slice(0, self.rows).publish(path)
+
+class CSVCache(object):
+    '''
+    Persistent binary cache of parsed bar CSV files. Each file is parsed once into its index and value arrays, which are saved as .npy files and memory-mapped straight back in on later loads.
+
+    Entries are keyed by the absolute file path, size and modification time, so replacing or editing a CSV file invalidates its entry.
+
+    :param cache_dir: Directory holding the cache entries
+    '''
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_key(self, path):
+        '''
+        Returns the (path hash, entry directory) pair for the current state of a file.
+        '''
+        stat = os.stat(path)
+        path_key = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+        entry = '%s-%d-%d' % (path_key, stat.st_size, stat.st_mtime_ns)
+        return path_key, os.path.join(self.cache_dir, entry)
+
+    def load(self, path):
+        '''
+        Returns the cached (index, values, fields) of a file as read-only memory maps, or None if there is no valid entry.
+        '''
+        _, entry_dir = self._entry_key(path)
+        if not os.path.isdir(entry_dir):
+            return None
+
+        index = np.load(os.path.join(entry_dir, 'index.npy'), mmap_mode='r')
+        values = np.load(os.path.join(entry_dir, 'values.npy'), mmap_mode='r')
+        fields = np.load(os.path.join(entry_dir, 'fields.npy')).tolist()
+        return index, values, fields
+
+    def store(self, path, index, values, fields):
+        '''
+        Saves the parsed arrays of a file, replacing any entries for older versions of it.
+        '''
+        path_key, entry_dir = self._entry_key(path)
+
+        # Write to a temporary directory first so readers never see partial entries
+        tmp_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix='.tmp-')
+        np.save(os.path.join(tmp_dir, 'index.npy'), np.asarray(index))
+        np.save(os.path.join(tmp_dir, 'values.npy'), np.asarray(values, dtype=np.float64))
+        np.save(os.path.join(tmp_dir, 'fields.npy'), np.array(fields))
+
+        try:
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            # Another process stored the same entry first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        for name in os.listdir(self.cache_dir):
+            stale = os.path.join(self.cache_dir, name)
+            if name.startswith(path_key) and stale != entry_dir:
+                shutil.rmtree(stale, ignore_errors=True)
+
+    def read(self, path):
+        '''
+        Returns the (index, values, fields) of a file, parsing and caching it on a miss.
+        '''
+        cached = self.load(path)
+        if cached is not None:
+            return cached
+
+        index, values, fields = read_bar_csv(path)
+        self.store(path, index, values, fields)
+        return index, values, fields
+
+class CandleStore(object):
+    '''
+    Local on-disk store of downloaded price history, keyed by ticker and bar frequency. Each entry records the date range it covers, so that only the ranges missing from the store need to be requested from the broker before being merged in.
+
+    :param store_dir: Directory holding one .npz file per ticker and frequency
+    '''
+    def __init__(self, store_dir):
+        self.store_dir = store_dir
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    def _entry_path(self, ticker, frequency):
+        return os.path.join(self.store_dir, '%s-%s.npz' % (ticker, frequency))
+
+    def load(self, ticker, frequency):
+        '''
+        Returns the stored (index, values, fields, covered) of a ticker, where covered is the [start, end] datetime64 range the entry spans, or None if nothing is stored.
+        '''
+        path = self._entry_path(ticker, frequency)
+        if not os.path.exists(path):
+            return None
+
+        with np.load(path) as entry:
+            return entry['index'], entry['values'], entry['fields'].tolist(), entry['covered']
+
+    def missing_ranges(self, ticker, frequency, start, end):
+        '''
+        Returns the list of (start, end) ranges of [start, end] not covered by the stored entry. The range starting at the end of the entry overlaps it, so that a partial last bar is refreshed.
+        '''
+        start, end = np.datetime64(start, 'ms'), np.datetime64(end, 'ms')
+
+        entry = self.load(ticker, frequency)
+        if entry is None:
+            return [(start, end)]
+
+        covered_start, covered_end = entry[3]
+        ranges = list()
+        if start < covered_start:
+            ranges.append((start, covered_start))
+        if end > covered_end:
+            ranges.append((covered_end, end))
+        return ranges
+
+    def merge(self, ticker, frequency, index, values, fields, start, end):
+        '''
+        Merges newly downloaded bars covering [start, end] into the stored entry, with new bars replacing stored bars at the same timestamp.
+        '''
+        index = np.asarray(index, dtype='datetime64[ms]')
+        values = np.asarray(values, dtype=np.float64)
+        covered = np.array([start, end], dtype='datetime64[ms]')
+
+        entry = self.load(ticker, frequency)
+        if entry is not None:
+            keep = ~np.isin(entry[0], index)
+            index = np.concatenate([entry[0][keep], index])
+            values = np.concatenate([entry[1][keep], values])
+            covered = np.array([min(covered[0], entry[3][0]), max(covered[1], entry[3][1])])
+
+        order = np.argsort(index, kind='stable')
+
+        # Write next to the entry and swap it in so that readers never see a partial file
+        path = self._entry_path(ticker, frequency)
+        tmp_path = path + '.tmp.npz'
+        np.savez(tmp_path, index=index[order], values=values[order], fields=np.array(fields), covered=covered)
+        os.replace(tmp_path, path)
+
+    def read(self, ticker, frequency, start, end):
+        '''
+        Returns the stored (index, values) of a ticker between start and end inclusive.
+        '''
+        index, values, _, _ = self.load(ticker, frequency)
+        lo = np.searchsorted(index, np.datetime64(start, 'ms'), side='left')
+        hi = np.searchsorted(index, np.datetime64(end, 'ms'), side='right')
+        return index[lo:hi], values[lo:hi]
@@ -1,12 +1,27 @@
+from collections import deque
 from dataclasses import dataclass
 from datetime import datetime
+from enum import Enum
+from typing import ClassVar
 
+import queue
+import time
+
+
+class EventType(str, Enum):
+    '''
+    Kinds of events passed between components. Members compare equal to their string names, e.g. EventType.FILL == 'FILL'.
+    '''
+    MARKET = 'MARKET'
+    SIGNAL = 'SIGNAL'
+    ORDER = 'ORDER'
+    FILL = 'FILL'
 
 class Event(object):
     '''
     Base class providing interface for all inherited events.
     '''
-    pass
+    __slots__ = ()
 
 @dataclass(frozen=True)
 class FillEvent(Event):
@@ -20,6 +35,7 @@ class FillEvent(Event):
     :param direction: Direction of fill ("BUY" or "SELL")
     :param fill_cost: Holdings value in dollars
     :param commission: Optional commission sent from broker
+    :param strategy_id: Identifier of the strategy whose order was filled
     '''
     timeindex: datetime
     ticker: str
@@ -28,14 +44,15 @@ class FillEvent(Event):
     direction: str
     fill_cost: float
     commission: float = 0.0
-    type: str = 'FILL'
+    strategy_id: int = 0
+    type: ClassVar[EventType] = EventType.FILL
 
 class MarketEvent(Event):
     '''
     Handles the event of receiving a new market update with corresponding bars.
     '''
-    def __init__(self):
-        self.type = 'MARKET'
+    __slots__ = ()
+    type = EventType.MARKET
 
 @dataclass(frozen=True)
 class OrderEvent(Event):
@@ -48,13 +65,15 @@ class OrderEvent(Event):
     :param action: BUY or SELL
     :param type: MARKET or LIMIT
     :param limit: Limit price
+    :param strategy_id: Identifier of the strategy the order was generated for
     '''
     ticker: str
     quantity: int
     action: str
     trade_type: str
     limit: float = None
-    type: str = 'ORDER'
+    strategy_id: int = 0
+    type: ClassVar[EventType] = EventType.ORDER
 
 class SignalEvent(Event):
     '''
@@ -67,10 +86,125 @@ class SignalEvent(Event):
     :param signal_type: 'LONG', 'SHORT' or 'EXIT'
     :param strength: Adjustment factor "suggestion" used to scale quantity at the portfolio level
     '''
+    __slots__ = ('strategy_id', 'ticker', 'datetime', 'signal_type', 'strength')
+    type = EventType.SIGNAL
+
     def __init__(self, strategy_id, ticker, datetime, signal_type, strength):
         self.strategy_id = strategy_id
         self.ticker = ticker
         self.datetime = datetime
         self.signal_type = signal_type
         self.strength = strength
-        self.type = 'SIGNAL'
\ No newline at end of file
+
+class EventQueue(object):
+    '''
+    Single-threaded event queue and dispatcher backed by a deque, for backtests that do not need the locking of queue.Queue. Supports the put/get/empty/qsize methods that components use on queue.Queue.
+
+    Handlers are kept in a table indexed by EventType, with any number of subscribers per event type called in subscription order. Dispatched events are counted by type.
+
+    Batch subscribers receive runs of consecutive events of a type as a list, once the last event of the run has been dispatched to the other subscribers, e.g. to size all the signals of a bar together.
+
+    :param latency: Optional LatencyRecorder receiving the time taken to handle each event, by event type
+    '''
+    def __init__(self, latency=None):
+        self._queue = deque()
+        self.handlers = dict((t, list()) for t in EventType)
+        self.batch_handlers = dict((t, list()) for t in EventType)
+        self.counts = dict((t, 0) for t in EventType)
+        self.latency = latency
+
+    def __len__(self):
+        return len(self._queue)
+
+    def put(self, event, block=True, timeout=None):
+        self._queue.append(event)
+
+    def get(self, block=True, timeout=None):
+        try:
+            return self._queue.popleft()
+        except IndexError:
+            raise queue.Empty
+
+    def empty(self):
+        return not self._queue
+
+    def qsize(self):
+        return len(self._queue)
+
+    def subscribe(self, event_type, handler):
+        '''
+        Registers a callable taking an event for every dispatched event of the given type.
+        '''
+        self.handlers[EventType(event_type)].append(handler)
+
+    def subscribe_batch(self, event_type, handler):
+        '''
+        Registers a callable taking a list of events for every run of consecutive dispatched events of the given type.
+        '''
+        self.batch_handlers[EventType(event_type)].append(handler)
+
+    def _end_of_batch(self, event_type):
+        '''
+        Returns whether the next pending event, if any, ends a run of events of the given type.
+        '''
+        pending = self._queue
+        return not pending or pending[0] is None or pending[0].type is not event_type
+
+    def dispatch(self):
+        '''
+        Dispatches events to their subscribers until the queue is empty, including events put by the handlers themselves.
+        '''
+        if self.latency is not None:
+            return self._dispatch_timed()
+
+        pending = self._queue
+        handlers = self.handlers
+        batch_handlers = self.batch_handlers
+        counts = self.counts
+        batch = list()
+
+        while pending:
+            event = pending.popleft()
+            if event is None:
+                continue
+
+            counts[event.type] += 1
+            for handler in handlers[event.type]:
+                handler(event)
+
+            if batch_handlers[event.type]:
+                batch.append(event)
+                if self._end_of_batch(event.type):
+                    for handler in batch_handlers[event.type]:
+                        handler(batch)
+                    batch = list()
+
+    def _dispatch_timed(self):
+        '''
+        Dispatches like dispatch(), recording the time taken by all subscribers of each event.
+        '''
+        pending = self._queue
+        handlers = self.handlers
+        batch_handlers = self.batch_handlers
+        counts = self.counts
+        batch = list()
+        histograms = dict((t, self.latency.histogram(t.value)) for t in EventType)
+        clock = time.perf_counter
+
+        while pending:
+            event = pending.popleft()
+            if event is None:
+                continue
+
+            counts[event.type] += 1
+            start = clock()
+            for handler in handlers[event.type]:
+                handler(event)
+
+            if batch_handlers[event.type]:
+                batch.append(event)
+                if self._end_of_batch(event.type):
+                    for handler in batch_handlers[event.type]:
+                        handler(batch)
+                    batch = list()
+            histograms[event.type].record(clock() - start)
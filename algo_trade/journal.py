@@ -0,0 +1,332 @@
+from datetime import datetime
+
+import json
+import numpy as np
+import os
+import pandas as pd
+import struct
+
+from algo_trade.broker import SimulatedBroker
+from algo_trade.data import BarStore
+from algo_trade.event import EventQueue, EventType, FillEvent, MarketEvent, OrderEvent, SignalEvent
+
+
+MAGIC = b'ATJL'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sHI')
+
+# Record layouts, each starting with its one byte record type. Strings are interned into
+# a symbol table as they first appear, and timestamps are stored as int64 nanoseconds.
+SYMBOL = struct.Struct('<BHH')
+MARKET = struct.Struct('<Bq')
+SIGNAL = struct.Struct('<BqHqHd')
+ORDER = struct.Struct('<BHqHHdq')
+FILL = struct.Struct('<BqHHqHddq')
+
+SYMBOL_RECORD, MARKET_RECORD, SIGNAL_RECORD, ORDER_RECORD, FILL_RECORD = range(5)
+
+NAT = np.iinfo(np.int64).min
+
+def _to_nanos(value):
+    '''
+    Returns a datetime-like value as int64 nanoseconds since the epoch, NAT for anything else.
+    '''
+    if isinstance(value, (datetime, np.datetime64)):
+        return pd.Timestamp(value).value
+    return NAT
+
+def _from_nanos(value):
+    return None if value == NAT else pd.Timestamp(value)
+
+class EventJournal(object):
+    '''
+    Append-only binary journal of the market, signal, order and fill events handled in a backtest or live session, for exact replay with JournalReplay.
+
+    Each event is packed into a fixed-layout record, with tickers and other strings interned into a symbol table, and market events store the latest bar of every ticker and field. Records go through a large write buffer, so journaling costs a struct pack and a memory copy per event.
+
+    Reopening an existing journal appends to it, provided it has the same tickers and fields. A closed journal can be reopened with open(), and truncate() rolls it back to an offset returned by tell(), e.g. when resuming from a checkpoint. Strategy ids and order quantities must be integers.
+
+    :param path: Journal file path
+    :param bars: Data handler whose latest bar is recorded with each market event
+    :param fields: Optional list of bar fields recorded, defaults to all fields of the data handler's bar store
+    :param buffer_size: Size of the write buffer in bytes
+    '''
+    def __init__(self, path, bars, fields=None, buffer_size=1 << 20):
+        self.path = path
+        self.bars = bars
+        self.buffer_size = buffer_size
+        self.ticker_list = list(bars.ticker_list)
+
+        bar_store = getattr(bars, 'bar_store', None)
+        self.fields = list(fields or bar_store.fields)
+        self._store_rows = bar_store is not None and hasattr(bars, 'cursor') and set(self.fields) <= set(bar_store.fields)
+
+        self.fh = None
+        self.open()
+
+    def open(self):
+        '''
+        Opens the journal for appending, reading back the symbol table of an existing file, unless it is already open.
+        '''
+        if self.fh is not None and not self.fh.closed:
+            return
+
+        path = self.path
+        meta = {'ticker_list': self.ticker_list, 'fields': self.fields}
+        self.symbols = dict()
+
+        if os.path.exists(path) and os.path.getsize(path):
+            existing, symbols = _read_header_and_symbols(path)
+            if existing != meta:
+                raise ValueError('Journal %s records %s, not %s' % (path, existing, meta))
+            self.symbols = dict((s, i) for i, s in enumerate(symbols))
+            self.fh = open(path, 'ab', buffering=self.buffer_size)
+        else:
+            self.fh = open(path, 'wb', buffering=self.buffer_size)
+            header = json.dumps(meta).encode('utf-8')
+            self.fh.write(FILE_HEADER.pack(MAGIC, VERSION, len(header)) + header)
+
+    def _symbol(self, value):
+        '''
+        Returns the symbol table id of a string, writing a symbol record the first time it is seen.
+        '''
+        value = '' if value is None else str(value)
+        i = self.symbols.get(value)
+        if i is None:
+            i = self.symbols[value] = len(self.symbols)
+            encoded = value.encode('utf-8')
+            self.fh.write(SYMBOL.pack(SYMBOL_RECORD, i, len(encoded)) + encoded)
+        return i
+
+    def _market_row(self):
+        '''
+        Returns the latest bar of every ticker and field as a (tickers, fields) array, with the bar datetime.
+        '''
+        if self._store_rows:
+            store = self.bars.bar_store
+            row = self.bars.cursor - 1
+            values = np.stack([store.data[f][row] for f in self.fields], axis=1)
+            return store.index[row], values
+
+        values = np.array([[self.bars.get_latest_bar_value(t, f) for f in self.fields] for t in self.ticker_list], dtype=np.float64)
+        return self.bars.get_latest_bar_datetime(self.ticker_list[0]), values
+
+    def record(self, event):
+        '''
+        Appends an event to the journal.
+        '''
+        event_type = event.type
+
+        if event_type is EventType.MARKET:
+            timestamp, values = self._market_row()
+            self.fh.write(MARKET.pack(MARKET_RECORD, _to_nanos(timestamp)))
+            self.fh.write(np.ascontiguousarray(values, dtype=np.float64).tobytes())
+        elif event_type is EventType.SIGNAL:
+            self.fh.write(SIGNAL.pack(
+                SIGNAL_RECORD, event.strategy_id, self._symbol(event.ticker), _to_nanos(event.datetime),
+                self._symbol(event.signal_type), event.strength,
+            ))
+        elif event_type is EventType.ORDER:
+            self.fh.write(ORDER.pack(
+                ORDER_RECORD, self._symbol(event.ticker), event.quantity, self._symbol(event.action),
+                self._symbol(event.trade_type), np.nan if event.limit is None else event.limit, event.strategy_id,
+            ))
+        elif event_type is EventType.FILL:
+            self.fh.write(FILL.pack(
+                FILL_RECORD, _to_nanos(event.timeindex), self._symbol(event.ticker), self._symbol(event.exchange),
+                event.quantity, self._symbol(event.direction), event.fill_cost, event.commission, event.strategy_id,
+            ))
+
+    def attach(self, events):
+        '''
+        Subscribes the journal to every event type of an EventQueue.
+        '''
+        for event_type in EventType:
+            events.subscribe(event_type, self.record)
+
+    def flush(self):
+        self.fh.flush()
+
+    def tell(self):
+        '''
+        Flushes the journal and returns its size in bytes, the offset the next record is written at.
+        '''
+        self.fh.flush()
+        return self.fh.tell()
+
+    def truncate(self, offset):
+        '''
+        Discards every record written from offset on and reopens the journal, so that recording continues from there.
+
+        :param offset: Offset returned by tell()
+        '''
+        self.close()
+        os.truncate(self.path, offset)
+        self.open()
+
+    def close(self):
+        self.fh.close()
+
+def _read_header(data):
+    magic, version, length = FILE_HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('Not a version %d event journal' % VERSION)
+    return json.loads(data[FILE_HEADER.size:FILE_HEADER.size + length].decode('utf-8')), FILE_HEADER.size + length
+
+def _read_header_and_symbols(path):
+    '''
+    Returns the metadata and symbol table of a journal, skipping over every other record.
+    '''
+    with open(path, 'rb') as fh:
+        data = fh.read()
+
+    meta, pos = _read_header(data)
+    sizes = {
+        MARKET_RECORD: MARKET.size + 8 * len(meta['ticker_list']) * len(meta['fields']),
+        SIGNAL_RECORD: SIGNAL.size,
+        ORDER_RECORD: ORDER.size,
+        FILL_RECORD: FILL.size,
+    }
+
+    symbols = list()
+    while pos < len(data):
+        kind = data[pos]
+        if kind == SYMBOL_RECORD:
+            _, i, length = SYMBOL.unpack_from(data, pos)
+            pos += SYMBOL.size
+            symbols.append(data[pos:pos + length].decode('utf-8'))
+            pos += length
+        elif kind in sizes:
+            pos += sizes[kind]
+        else:
+            raise ValueError('Corrupt journal record at byte %d' % pos)
+
+    return meta, symbols
+
+def read_journal(path):
+    '''
+    Reads a whole journal, returning its metadata dictionary and the list of (event, bar) records, where bar is the (timestamp, values) of market events and None otherwise.
+
+    :param path: Journal file path
+    '''
+    with open(path, 'rb') as fh:
+        data = fh.read()
+
+    meta, pos = _read_header(data)
+    num_values = len(meta['ticker_list']) * len(meta['fields'])
+    shape = (len(meta['ticker_list']), len(meta['fields']))
+
+    records = list()
+    symbols = list()
+    end = len(data)
+
+    while pos < end:
+        kind = data[pos]
+
+        if kind == SYMBOL_RECORD:
+            _, i, length = SYMBOL.unpack_from(data, pos)
+            pos += SYMBOL.size
+            symbols.append(data[pos:pos + length].decode('utf-8'))
+            pos += length
+        elif kind == MARKET_RECORD:
+            _, timestamp = MARKET.unpack_from(data, pos)
+            pos += MARKET.size
+            values = np.frombuffer(data, dtype=np.float64, count=num_values, offset=pos).reshape(shape)
+            pos += 8 * num_values
+            records.append((MarketEvent(), (timestamp, values)))
+        elif kind == SIGNAL_RECORD:
+            _, strategy_id, ticker, timestamp, signal_type, strength = SIGNAL.unpack_from(data, pos)
+            pos += SIGNAL.size
+            records.append((SignalEvent(strategy_id, symbols[ticker], _from_nanos(timestamp), symbols[signal_type], strength), None))
+        elif kind == ORDER_RECORD:
+            _, ticker, quantity, action, trade_type, limit, strategy_id = ORDER.unpack_from(data, pos)
+            pos += ORDER.size
+            limit = None if np.isnan(limit) else limit
+            records.append((OrderEvent(symbols[ticker], quantity, symbols[action], symbols[trade_type], limit, strategy_id), None))
+        elif kind == FILL_RECORD:
+            _, timestamp, ticker, exchange, quantity, direction, fill_cost, commission, strategy_id = FILL.unpack_from(data, pos)
+            pos += FILL.size
+            records.append((
+                FillEvent(_from_nanos(timestamp), symbols[ticker], symbols[exchange], quantity, symbols[direction], fill_cost, commission, strategy_id),
+                None,
+            ))
+        else:
+            raise ValueError('Corrupt journal record at byte %d' % pos)
+
+    return meta, records
+
+class JournalReplay(object):
+    '''
+    Feeds the events of a journal back into a portfolio and/or strategy as fast as possible, without the original data handler. The recorded bars are rebuilt into a BarStore served by a SimulatedBroker, bars, whose cursor advances with each replayed market event, so components built on bars see the same data as in the recorded session.
+
+    Recorded events are replayed in their original order. Events that the replayed components put on the events queue are not dispatched but collected, so that they can be compared with the recorded ones.
+
+    :param path: Journal file path
+    '''
+    def __init__(self, path):
+        self.meta, self.records = read_journal(path)
+        self.ticker_list = self.meta['ticker_list']
+        self.fields = self.meta['fields']
+
+        bars = [bar for _, bar in self.records if bar is not None]
+        index = pd.DatetimeIndex([timestamp for timestamp, _ in bars])
+        panel = np.stack([values for _, values in bars]) if bars else np.empty((0, len(self.ticker_list), len(self.fields)))
+        bar_store = BarStore(index, self.ticker_list, dict((f, panel[:, :, j]) for j, f in enumerate(self.fields)))
+
+        self.events = EventQueue()
+        self.bars = SimulatedBroker(self.events, self.ticker_list, bar_store=bar_store)
+        self.handlers = dict((t, list()) for t in EventType)
+        self.batch_handlers = dict((t, list()) for t in EventType)
+
+    def subscribe(self, event_type, handler):
+        '''
+        Registers a callable taking an event for every replayed event of the given type.
+        '''
+        self.handlers[EventType(event_type)].append(handler)
+
+    def subscribe_batch(self, event_type, handler):
+        '''
+        Registers a callable taking the list of events of every run of consecutive replayed events of the given type, as with EventQueue.subscribe_batch.
+        '''
+        self.batch_handlers[EventType(event_type)].append(handler)
+
+    def run(self, portfolio=None, strategy=None):
+        '''
+        Replays the journal, returning the list of events put by the replayed components. A strategy receives market events, and a portfolio receives market, signal and fill events, in the same order as in Backtest.
+
+        :param portfolio: Optional Portfolio built on bars and events
+        :param strategy: Optional Strategy built on bars and events
+        '''
+        if strategy is not None:
+            self.subscribe(EventType.MARKET, strategy.calculate_signals)
+        if portfolio is not None:
+            self.subscribe(EventType.MARKET, portfolio.update_timeindex)
+            self.subscribe_batch(EventType.SIGNAL, portfolio.update_signals)
+            self.subscribe(EventType.FILL, portfolio.update_fill)
+
+        handlers = self.handlers
+        batch_handlers = self.batch_handlers
+        records = self.records
+        pending = self.events._queue
+        generated = list()
+        batch = list()
+
+        for i, (event, bar) in enumerate(records):
+            if bar is not None:
+                self.bars.cursor += 1
+
+            for handler in handlers[event.type]:
+                handler(event)
+
+            if batch_handlers[event.type]:
+                batch.append(event)
+                if i + 1 == len(records) or records[i + 1][0].type is not event.type:
+                    for handler in batch_handlers[event.type]:
+                        handler(batch)
+                    batch = list()
+
+            if pending:
+                generated.extend(e for e in pending if e is not None)
+                pending.clear()
+
+        return generated
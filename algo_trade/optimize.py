@@ -0,0 +1,351 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import itertools
+import json
+import numpy as np
+import os
+import pandas as pd
+import shutil
+import tempfile
+
+from algo_trade.backtest import Backtest
+from algo_trade.broker import SimulatedBroker
+from algo_trade.data import BarStore
+from algo_trade.portfolio import Portfolio
+
+
+def parameter_grid(grid):
+    '''
+    Returns the list of parameter dictionaries in the cartesian product of a parameter grid.
+
+    :param grid: Dictionary of parameter name to list of values
+    '''
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*[grid[n] for n in names])]
+
+def run_backtest(bar_store, strategy, params, ticker_list, start_date, initial_capital=100000.0, portfolio=Portfolio, broker=SimulatedBroker, equity=False, warmup=0):
+    '''
+    Runs a silent, fast-forward event-driven backtest of one strategy configuration, returning its summary and throughput statistics as a dictionary, plus the total equity Series if equity is set.
+
+    The first warmup bars are traded as usual but left out of the equity curve and statistics, so that lookback strategies start the recorded bars with a full history. Positions opened during the warm-up are carried into the recorded bars.
+
+    :param bar_store: BarStore of aligned market data
+    :param strategy: (Class) Generates signals based on market data
+    :param params: Dictionary of keyword arguments for the strategy
+    :param ticker_list: List of ticker strings traded by the portfolio
+    :param start_date: Start datetime of the strategy
+    :param initial_capital: Starting capital for portfolio
+    :param portfolio: (Class) Keeps track of portfolio current and prior positions
+    :param broker: (Class) Simulated broker used as data and execution handler
+    :param equity: Include the portfolio total equity Series in the result
+    :param warmup: Number of bars at the start of the store left out of the results
+    '''
+    backtest = Backtest(
+        None, ticker_list, initial_capital, 0, start_date, broker, broker, portfolio, strategy,
+        bar_store=bar_store, strategy_params=params,
+    )
+    backtest._run_backtest()
+    portfolio = backtest.portfolio
+    portfolio.create_equity_curve_dataframe()
+
+    # Keep the last warm-up bar as the base row of the recorded bars
+    if warmup:
+        curve = portfolio.equity_curve.iloc[warmup:].copy()
+        curve['returns'] = curve['total'].pct_change()
+        curve['equity_curve'] = (1.0+curve['returns']).cumprod()
+        portfolio.equity_curve = curve
+
+    result = {
+        'stats': portfolio.summary_stats(),
+        'throughput': backtest.run_stats.as_dict(),
+    }
+    if equity:
+        result['equity'] = portfolio.equity_curve['total']
+    return result
+
+def optimize_window(bar_store, strategy, grid, ticker_list, train, test, objective='sharpe_ratio', initial_capital=100000.0, warmup=0):
+    '''
+    Runs every configuration of a parameter grid over the training bars of a walk-forward window, then the configuration maximising the objective over the test bars. Bars are sliced from the store without copying.
+
+    Without a warm-up, the test run starts on the first test bar with no earlier history, so lookback strategies cannot trade until they have seen enough test bars. With warmup, the test run starts up to warmup bars earlier, and those bars feed the strategy but are not recorded.
+
+    Returns a dictionary of the chosen parameters, its training and test statistics and its test equity Series.
+
+    :param bar_store: BarStore of aligned market data
+    :param strategy: (Class) Generates signals based on market data
+    :param grid: Dictionary of strategy parameter name to list of values
+    :param ticker_list: List of ticker strings traded by the portfolio
+    :param train: (start, stop) bar positions of the training period
+    :param test: (start, stop) bar positions of the test period
+    :param objective: Summary statistic maximised over the training period
+    :param initial_capital: Starting capital for portfolio
+    :param warmup: Number of bars before the test period fed to the strategy but not recorded
+    '''
+    warmup = min(warmup, test[0])
+    train_store = bar_store.slice(*train)
+    test_store = bar_store.slice(test[0] - warmup, test[1])
+
+    best_params, best_stats, best_score = None, None, -np.inf
+    for params in parameter_grid(grid):
+        stats = run_backtest(train_store, strategy, params, ticker_list, train_store.index[0], initial_capital)['stats']
+        score = stats[objective]
+        if best_params is None or score > best_score:
+            best_params, best_stats = params, stats
+            best_score = score if not np.isnan(score) else -np.inf
+
+    result = run_backtest(test_store, strategy, best_params, ticker_list, test_store.index[0], initial_capital, equity=True, warmup=warmup)
+
+    return {
+        'train': (train_store.index[0], train_store.index[-1]),
+        'test': (test_store.index[warmup], test_store.index[-1]),
+        'params': best_params,
+        'train_stats': best_stats,
+        'test_stats': result['stats'],
+        'equity': result['equity'],
+    }
+
+########################################
+# Worker process state
+
+_worker_store = None
+
+def _attach_worker(path):
+    '''
+    Process pool initializer attaching each worker once to the published bar panel.
+    '''
+    global _worker_store
+    _worker_store = BarStore.attach(path)
+
+def _run_worker(kwargs):
+    return run_backtest(_worker_store, **kwargs)
+
+def _optimize_worker(kwargs):
+    return optimize_window(_worker_store, **kwargs)
+
+def _publish_store(bar_store, shared_dir=None):
+    '''
+    Publishes a bar store for worker processes, returning its path and the temporary directory to remove afterwards. Defaults to /dev/shm when available so that the panel stays in shared memory.
+    '''
+    if shared_dir is None and os.path.isdir('/dev/shm'):
+        shared_dir = '/dev/shm'
+
+    tmp_dir = tempfile.mkdtemp(dir=shared_dir, prefix='algo-trade-')
+    path = os.path.join(tmp_dir, 'bars')
+    bar_store.publish(path)
+    return path, tmp_dir
+
+class ParameterSweep(object):
+    '''
+    Runs a strategy over a grid of parameters and ticker lists in a pool of worker processes. The bar panel is published once to a memory-mapped directory and every worker attaches to the same pages, so data is loaded a single time for the whole sweep.
+
+    Completed runs are appended to a JSON lines results file as they finish. Running the same sweep again skips every configuration already in the file, so a crashed sweep resumes where it stopped.
+
+    Strategy classes must be importable at module level so that they can be sent to worker processes.
+
+    :param bar_store: BarStore of aligned market data, or the path of a published one
+    :param strategy: (Class) Generates signals based on market data
+    :param grid: Dictionary of strategy parameter name to list of values
+    :param ticker_lists: Optional list of ticker lists to sweep over, defaults to all tickers of the bar store
+    :param start_date: Optional start datetime of the strategy, defaults to the first bar
+    :param initial_capital: Starting capital for portfolio
+    :param results_path: Optional JSON lines file recording completed runs
+    :param workers: Number of worker processes, 1 runs in the current process
+    :param shared_dir: Optional directory the bar panel is published to, defaults to /dev/shm when available
+    '''
+    def __init__(self, bar_store, strategy, grid, ticker_lists=None, start_date=None, initial_capital=100000.0, results_path=None, workers=os.cpu_count(), shared_dir=None):
+        self.bar_store = bar_store if isinstance(bar_store, BarStore) else BarStore.attach(bar_store)
+        self.store_path = None if isinstance(bar_store, BarStore) else bar_store
+        self.strategy = strategy
+        self.grid = grid
+        self.ticker_lists = ticker_lists or [self.bar_store.ticker_list]
+        self.start_date = start_date if start_date is not None else self.bar_store.index[0]
+        self.initial_capital = initial_capital
+        self.results_path = results_path
+        self.workers = workers
+        self.shared_dir = shared_dir
+
+    def configurations(self):
+        '''
+        Returns the list of (key, params, ticker_list) configurations of the sweep, where key uniquely identifies a configuration in the results file.
+        '''
+        configs = list()
+        for ticker_list in self.ticker_lists:
+            for params in parameter_grid(self.grid):
+                key = json.dumps({'params': params, 'ticker_list': ticker_list}, sort_keys=True, default=str)
+                configs.append((key, params, ticker_list))
+        return configs
+
+    def _load_results(self):
+        '''
+        Returns the dictionary of results already recorded in the results file, keyed by configuration.
+        '''
+        results = dict()
+        if self.results_path and os.path.exists(self.results_path):
+            with open(self.results_path) as fh:
+                for line in fh:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Partially written line from an interrupted run
+                        continue
+                    results[record['key']] = record
+        return results
+
+    def _publish(self):
+        '''
+        Publishes the bar store for the worker processes, returning its path and the temporary directory to remove afterwards.
+        '''
+        if self.store_path:
+            return self.store_path, None
+        return _publish_store(self.bar_store, self.shared_dir)
+
+    def run(self):
+        '''
+        Runs every configuration not yet in the results file, returning the result records of all configurations in grid order.
+        '''
+        results = self._load_results()
+        pending = [c for c in self.configurations() if c[0] not in results]
+
+        out = open(self.results_path, 'a+') if self.results_path else None
+        try:
+            # Terminate any line left partially written by an interrupted run
+            if out and out.tell() > 0:
+                out.seek(out.tell() - 1)
+                if out.read(1) != '\n':
+                    out.write('\n')
+
+            for key, params, ticker_list, result in self._execute(pending):
+                record = dict(key=key, params=params, ticker_list=ticker_list, **result)
+                results[key] = record
+
+                if out:
+                    out.write(json.dumps(record, default=str) + '\n')
+                    out.flush()
+        finally:
+            if out:
+                out.close()
+
+        return [results[c[0]] for c in self.configurations()]
+
+    def _execute(self, configs):
+        '''
+        Generates (key, params, ticker_list, result) tuples as configurations complete.
+        '''
+        def run_kwargs(params, ticker_list):
+            return dict(
+                strategy=self.strategy,
+                params=params,
+                ticker_list=ticker_list,
+                start_date=self.start_date,
+                initial_capital=self.initial_capital,
+            )
+
+        if not self.workers or self.workers <= 1:
+            for key, params, ticker_list in configs:
+                yield key, params, ticker_list, run_backtest(self.bar_store, **run_kwargs(params, ticker_list))
+            return
+
+        path, tmp_dir = self._publish()
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_attach_worker, initargs=(path,)) as pool:
+                futures = dict(
+                    (pool.submit(_run_worker, run_kwargs(params, ticker_list)), (key, params, ticker_list))
+                    for key, params, ticker_list in configs
+                )
+                for future in as_completed(futures):
+                    key, params, ticker_list = futures[future]
+                    yield key, params, ticker_list, future.result()
+        finally:
+            if tmp_dir:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+class WalkForward(object):
+    '''
+    Walk-forward optimization over rolling in-sample/out-of-sample windows of an already loaded bar store. Windows are zero-copy slices of the store, and each window is optimized in parallel in a pool of worker processes attached to a single published copy of the panel.
+
+    In every window the parameter grid is run over the training bars, and the configuration maximising the objective is run over the following test bars. The out-of-sample test segments are then chained into one equity curve.
+
+    :param bar_store: BarStore of aligned market data
+    :param strategy: (Class) Generates signals based on market data
+    :param grid: Dictionary of strategy parameter name to list of values
+    :param train_bars: Number of bars in each training period
+    :param test_bars: Number of bars in each test period
+    :param step: Number of bars between window starts, defaults to test_bars. It cannot be shorter than test_bars, so that test periods do not overlap
+    :param ticker_list: Optional list of tickers traded, defaults to all tickers of the bar store
+    :param objective: Summary statistic maximised over each training period
+    :param initial_capital: Starting capital for portfolio
+    :param warmup: Number of bars before each test period fed to the strategy but not recorded, e.g. its longest lookback
+    :param workers: Number of worker processes, 1 runs in the current process
+    :param shared_dir: Optional directory the bar panel is published to, defaults to /dev/shm when available
+    '''
+    def __init__(self, bar_store, strategy, grid, train_bars, test_bars, step=None, ticker_list=None, objective='sharpe_ratio', initial_capital=100000.0, warmup=0, workers=os.cpu_count(), shared_dir=None):
+        self.bar_store = bar_store
+        self.strategy = strategy
+        self.grid = grid
+        self.train_bars = train_bars
+        self.test_bars = test_bars
+        self.step = step or test_bars
+        if self.step < test_bars:
+            raise ValueError('Step of %d bars is shorter than the test period of %d bars, so test periods would overlap' % (self.step, test_bars))
+        if len(bar_store) < train_bars + test_bars:
+            raise ValueError('Bar store of %d bars is shorter than one training and test window of %d bars' % (len(bar_store), train_bars + test_bars))
+        self.ticker_list = ticker_list or bar_store.ticker_list
+        self.objective = objective
+        self.initial_capital = initial_capital
+        self.warmup = warmup
+        self.workers = workers
+        self.shared_dir = shared_dir
+
+        self.results = None
+        self.equity_curve = None
+
+    def windows(self):
+        '''
+        Returns the list of ((train_start, train_stop), (test_start, test_stop)) bar positions of every window.
+        '''
+        windows = list()
+        start = 0
+        while start + self.train_bars + self.test_bars <= len(self.bar_store):
+            split = start + self.train_bars
+            windows.append(((start, split), (split, split + self.test_bars)))
+            start += self.step
+        return windows
+
+    def run(self):
+        '''
+        Optimizes every window and returns the chained out-of-sample equity curve. Per-window results are kept in the results attribute.
+        '''
+        configs = [
+            dict(
+                strategy=self.strategy,
+                grid=self.grid,
+                ticker_list=self.ticker_list,
+                train=train,
+                test=test,
+                objective=self.objective,
+                initial_capital=self.initial_capital,
+                warmup=self.warmup,
+            )
+            for train, test in self.windows()
+        ]
+
+        if not self.workers or self.workers <= 1:
+            self.results = [optimize_window(self.bar_store, **c) for c in configs]
+        else:
+            path, tmp_dir = _publish_store(self.bar_store, self.shared_dir)
+            try:
+                with ProcessPoolExecutor(max_workers=self.workers, initializer=_attach_worker, initargs=(path,)) as pool:
+                    self.results = list(pool.map(_optimize_worker, configs))
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        self.equity_curve = self._combine([r['equity'] for r in self.results])
+        return self.equity_curve
+
+    def _combine(self, segments):
+        '''
+        Chains the returns of the out-of-sample equity segments into one equity curve starting at 1.0.
+        '''
+        # The first row of each segment is the portfolio start row, before any test bar
+        returns = pd.concat([s.pct_change().iloc[1:] for s in segments])
+        return (1.0 + returns).cumprod()
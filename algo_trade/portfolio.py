@@ -1,59 +1,168 @@
 from __future__ import print_function
 
+import copy
 import numpy as np
 import pandas as pd
 
-from algo_trade.event import OrderEvent
-from algo_trade.utilities import create_drawdowns, create_sharpe_ratio
+from algo_trade.data import BarStore, WindowStore
+from algo_trade.event import EventType, OrderEvent
+from algo_trade.sizing import DIRECTIONS, PositionSizer
+from algo_trade.utilities import RunningMetrics, create_drawdowns, create_sharpe_ratio
 
 
+class Ledger(object):
+    '''
+    Append-only time series of rows stored in a 2-D float64 array with one row per bar and one column per column name, alongside a datetime64 index. The arrays grow geometrically when full, so appending is amortised constant time, and no growth happens at all if capacity covers every row.
+
+    Rows read back as dictionaries with a 'datetime' key, like the list of dictionaries the ledger replaces, while values and index are views of the filled rows.
+
+    :param columns: List of column names
+    :param capacity: Number of rows to preallocate
+    '''
+    def __init__(self, columns, capacity=1024):
+        self.columns = list(columns)
+        self._values = np.empty((max(capacity, 1), len(self.columns)), dtype=np.float64)
+        # Datetimes are kept as int64 nanoseconds, which are much faster to assign than Timestamps
+        self._index = np.empty(max(capacity, 1), dtype=np.int64)
+        self._size = 0
+
+    @classmethod
+    def from_arrays(cls, columns, index, values, capacity=None):
+        '''
+        Builds a ledger holding a copy of existing rows, with room for at least capacity rows.
+        '''
+        ledger = cls(columns, max(capacity or 0, len(index)))
+        ledger._index[:len(index)] = np.asarray(index, dtype='datetime64[ns]').view(np.int64)
+        ledger._values[:len(index)] = values
+        ledger._size = len(index)
+        return ledger
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError('Ledger row %d out of range' % i)
+
+        row = dict(zip(self.columns, self._values[i].tolist()))
+        timestamp = pd.Timestamp(self._index[i])
+        row['datetime'] = None if timestamp is pd.NaT else timestamp
+        return row
+
+    def __iter__(self):
+        for i in range(self._size):
+            yield self[i]
+
+    @property
+    def values(self):
+        return self._values[:self._size]
+
+    @property
+    def index(self):
+        return self._index[:self._size].view('datetime64[ns]')
+
+    def append(self, timestamp, row=None):
+        '''
+        Appends a row of values in column order, returning a writable view of the new row. Without values the row is left to be filled through that view.
+        '''
+        if self._size == len(self._index):
+            self._grow()
+        i = self._size
+        self._index[i] = timestamp.value if isinstance(timestamp, pd.Timestamp) else pd.Timestamp(timestamp).value
+        if row is not None:
+            self._values[i] = row
+        self._size += 1
+        return self._values[i]
+
+    def _grow(self):
+        capacity = 2 * len(self._index)
+        values = np.empty((capacity, len(self.columns)), dtype=np.float64)
+        values[:self._size] = self._values[:self._size]
+        index = np.empty(capacity, dtype=np.int64)
+        index[:self._size] = self._index[:self._size]
+        self._values, self._index = values, index
+
+    def to_frame(self):
+        '''
+        Returns the rows as a DataFrame indexed by datetime, sharing memory with the ledger.
+        '''
+        return pd.DataFrame(
+            self.values, columns=self.columns, index=pd.DatetimeIndex(self.index, name='datetime'), copy=False
+        )
+
 class Portfolio:
     '''
     Handles positions and market value of all instruments at a resolution of a "bar." The positions DataFrame stores a time-index of the quantity of positions held.
 
     The holdings DataFrame stores the cash and total market holdings value of each symbol for a particular time-index, as well as the percentage change in portfolio total across bars.
 
+    Both are kept in array-backed Ledgers, preallocated to the length of the data handler's bar store when it has one, and the equity curve wraps the holdings ledger without copying.
+
+    Performance metrics are also accumulated bar by bar in metrics, a RunningMetrics, so that running_stats() can be read at any point of a run without building the equity curve.
+
+    Signals are sized into orders by a PositionSizer, one batch of signals at a time when update_signals() is subscribed as a batch handler, or one signal at a time through update_signal().
+
+    Fills received are logged in trades, and written with the equity curve and summary statistics when output_summary_stats() is given a results sink.
+
     :param bars: The DataHandler object with current market data
     :param events: The Event queue object
     :param start_date: The start date (bar) of the portfolio
     :param initial_capital: The starting capital in USD
+    :param strategy_id: Identifier of the strategy whose signals the portfolio acts on, attached to its orders
+    :param sizer: Optional PositionSizer, defaults to 100 shares per signal
     '''
-    def __init__(self, bars, events, start_date, initial_capital=100000.0):
+    # Number of bars per year used to annualise the Sharpe ratio
+    PERIODS = 252*60*6.5
+
+    def __init__(self, bars, events, start_date, initial_capital=100000.0, strategy_id=0, sizer=None):
         '''
         Initialises portfolio with bars and an event queue. Also includes starting datetime index and initial capital.
         '''
         self.bars = bars
         self.events = events
         self.ticker_list = self.bars.ticker_list
+        self.ticker_loc = dict((t, i) for i, t in enumerate(self.ticker_list))
         self.start_date = start_date
         self.initial_capital = initial_capital
+        self.strategy_id = strategy_id
+        self.sizer = sizer if sizer is not None else PositionSizer()
 
         self.all_positions = self._construct_all_positions()
         self.current_positions = self._construct_current_positions()
         self.all_holdings = self._construct_all_holdings()
         self.current_holdings = self._construct_current_holdings()
+        self.metrics = RunningMetrics(self.initial_capital)
+        self.trades = list()
 
     ##################################################
     # Initialization methods
 
+    def _ledger_capacity(self):
+        '''
+        Returns the number of ledger rows to preallocate: one per bar plus the starting row if the number of bars is known. A streaming window only holds the latest bars, so it does not tell how many bars the run has.
+        '''
+        bar_store = getattr(self.bars, 'bar_store', None)
+        if isinstance(bar_store, BarStore) and not isinstance(bar_store, WindowStore):
+            return len(bar_store) + 1
+        return 1024
+
     def _construct_all_positions(self):
         '''
-        Constructs the positions list using the start_date to determine when the time index will begin
+        Constructs the positions ledger using the start_date to determine when the time index will begin
         '''
-        d = dict( (k,v) for k, v in [(t,0) for t in self.ticker_list] )
-        d['datetime'] = self.start_date
-        return [d]
+        ledger = Ledger(self.ticker_list, self._ledger_capacity())
+        ledger.append(self.start_date, np.zeros(len(self.ticker_list)))
+        return ledger
 
     def _construct_all_holdings(self):
         '''
-        Constructs the holdings list using the start_date to determine when the time index will begin
+        Constructs the holdings ledger using the start_date to determine when the time index will begin
         '''
-        d = dict( (k,v) for k, v in [ (t, 0.0) for t in self.ticker_list] )
-        d['datetime'] = self.start_date
-        d['cash'] = self.initial_capital
-        d['commission'] = 0.0
-        d['total'] = self.initial_capital
-        return [d]
+        ledger = Ledger(self.ticker_list + ['cash', 'commission', 'total'], self._ledger_capacity())
+        ledger.append(self.start_date, [0.0] * len(self.ticker_list) + [self.initial_capital, 0.0, self.initial_capital])
+        return ledger
 
     def _construct_current_positions(self):
         '''
@@ -84,30 +193,17 @@ class Portfolio:
         latest_datetime = self.bars.get_latest_bar_datetime(self.ticker_list[0])
 
         # Update positions
-        dp = dict( (k,v) for k, v in [(t,0) for t in self.ticker_list] )
-        dp['datetime'] = latest_datetime
-
-        for t in self.ticker_list:
-            dp[t] = self.current_positions[t]
-
-        # Append the current positions
-        self.all_positions.append(dp)
+        positions = [self.current_positions[t] for t in self.ticker_list]
+        self.all_positions.append(latest_datetime, positions)
 
-        # Update Holdings
-        dh = dict( (k,v) for k, v in [(t,0) for t in self.ticker_list] )
-        dh['datetime'] = latest_datetime
-        dh['cash'] = self.current_holdings['cash']
-        dh['commission'] = self.current_holdings['commission']
-        dh['total'] = self.current_holdings['cash']
+        # Update holdings, approximating to the real value. Names not held are worth nothing, even before they have a price
+        market_value = [q * self.bars.get_latest_bar_value(t, 'adj_close') if q else 0.0 for t, q in zip(self.ticker_list, positions)]
+        cash = self.current_holdings['cash']
+        total = cash + sum(market_value)
+        market_value += [cash, self.current_holdings['commission'], total]
+        self.all_holdings.append(latest_datetime, market_value)
 
-        for t in self.ticker_list:
-            # Approximate to the real value
-            market_value = self.current_positions[t] * self.bars.get_latest_bar_value(t, 'adj_close')
-            dh[t] = market_value
-            dh['total'] += market_value
-
-        # Append current holdings
-        self.all_holdings.append(dh)
+        self.metrics.update(total)
 
     ##################################################
     # Update holdings/positions from FillEvent methods
@@ -147,79 +243,176 @@ class Portfolio:
         '''
         Updates the portfolio current positions and holdings from a FillEvent.
         '''
-        if event.type == 'FILL':
+        if event.type is EventType.FILL:
             self._update_positions_from_fill(event)
             self._update_holdings_from_fill(event)
+            self.metrics.add_trade(event.fill_cost)
+            self.trades.append((
+                self.all_holdings.index[-1], event.ticker, event.direction,
+                event.quantity, event.fill_cost, event.commission,
+            ))
 
     ##################################################
     # Signal Digestion/Order Creation
 
-    def _generate_naive_order(self, signal):
+    def _latest_prices(self, tickers, N=1):
         '''
-        Files an Order object as a constant quantity sizing of the signal object, without risk management or position sizing considerations.
+        Returns the last N adjusted close prices of the given tickers as a (bars, tickers) array, sliced straight from the data handler's bar store when it has one.
         '''
-        order = None
-
-        ticker = signal.ticker
-        direction = signal.signal_type
-        strength = signal.strength
-
-        print(ticker, direction, strength)
+        bar_store = getattr(self.bars, 'bar_store', None)
+        if isinstance(bar_store, BarStore) and hasattr(self.bars, 'cursor'):
+            cursor = self.bars.cursor
+            return bar_store.data['adj_close'][max(cursor - N, 0):cursor, [bar_store.ticker_loc[t] for t in tickers]]
 
-        mkt_quantity = 100
-        cur_quantity = self.current_positions[ticker]
-        order_type = 'MARKET'
+        if N == 1:
+            return np.array([[self.bars.get_latest_bar_value(t, 'adj_close') for t in tickers]], dtype=np.float64)
+        return np.column_stack([self.bars.get_latest_bars_values(t, 'adj_close', N=N) for t in tickers])
 
-        if direction == 'LONG' and cur_quantity == 0:
-            order = OrderEvent(ticker, mkt_quantity, 'BUY', order_type)
-        if direction == 'SHORT' and cur_quantity == 0:
-            order = OrderEvent(ticker, mkt_quantity, 'SELL', order_type)
+    def _generate_orders(self, signals):
+        '''
+        Sizes a list of signals, at most one per ticker, together with the sizer and returns the OrderEvents taking each position to its target.
+        '''
+        tickers = [s.ticker for s in signals]
+        positions = [self.current_positions[t] for t in tickers]
+        prices = self._latest_prices(tickers, self.sizer.history)
+        holdings = self.all_holdings.values[-1]
+
+        # Gross market value held outside the batch, as of the latest holdings record
+        exposure = 0.0
+        if self.sizer.max_leverage is not None:
+            market_value = np.abs(holdings[:len(self.ticker_list)])
+            market_value[[self.ticker_loc[t] for t in tickers]] = 0.0
+            exposure = np.nansum(market_value)
+
+        targets = self.sizer.target_positions(
+            [DIRECTIONS[s.signal_type] for s in signals], [s.strength for s in signals], positions,
+            prices[-1], holdings[-1], self.current_holdings['cash'], prices, exposure,
+        )
+
+        orders = list()
+        for ticker, current, target in zip(tickers, positions, targets.tolist()):
+            if target != current:
+                action = 'BUY' if target > current else 'SELL'
+                orders.append(OrderEvent(ticker, abs(target - current), action, 'MARKET', strategy_id=self.strategy_id))
+        return orders
+
+    def update_signals(self, events):
+        '''
+        Acts on a batch of SignalEvents, such as all the signals of a bar, sizing them together and putting the resulting orders on the events queue. Only the last signal of each ticker in the batch is acted upon.
+        '''
+        latest = dict((e.ticker, e) for e in events if e.type is EventType.SIGNAL)
+        if latest:
+            for order in self._generate_orders(list(latest.values())):
+                self.events.put(order)
 
-        if direction == 'EXIT' and cur_quantity > 0:
-            order = OrderEvent(ticker, abs(cur_quantity), 'SELL', order_type)
-        if direction == 'EXIT' and cur_quantity < 0:
-            order = OrderEvent(ticker, abs(cur_quantity), 'BUY', order_type)
+    def update_signal(self, event):
+        '''
+        Acts on a single SignalEvent to generate new orders based on the portfolio logic.
+        '''
+        self.update_signals([event])
 
-        return order
+    ##################################################
+    # Checkpointing
 
-    def update_signal(self, event):
+    def checkpoint_state(self):
         '''
-        Acts on a SignalEvent to generate new orders based on the portfolio logic.
+        Returns the current and historical positions and holdings for checkpointing. Ledger rows are never modified once appended, so the historical records are views rather than copies.
         '''
-        if event.type == 'SIGNAL':
-            order_event = self._generate_naive_order(event)
-            self.events.put(order_event)
+        return {
+            'current_positions': dict(self.current_positions),
+            'current_holdings': dict(self.current_holdings),
+            'all_positions': (self.all_positions.index, self.all_positions.values),
+            'all_holdings': (self.all_holdings.index, self.all_holdings.values),
+            'metrics': copy.copy(self.metrics),
+            'trades': list(self.trades),
+        }
+
+    def restore_state(self, state):
+        '''
+        Restores the positions and holdings returned by checkpoint_state.
+        '''
+        capacity = self._ledger_capacity()
+        self.current_positions = dict(state['current_positions'])
+        self.current_holdings = dict(state['current_holdings'])
+        self.all_positions = Ledger.from_arrays(self.all_positions.columns, *state['all_positions'], capacity=capacity)
+        self.all_holdings = Ledger.from_arrays(self.all_holdings.columns, *state['all_holdings'], capacity=capacity)
+        self.metrics = copy.copy(state['metrics'])
+        self.trades = list(state['trades'])
 
     ##################################################
     # Output Backtesting results
 
     def create_equity_curve_dataframe(self):
         '''
-        Creates a pandas DataFrame from the all_holdings list of dictionaries.
+        Creates a pandas DataFrame wrapping the all_holdings ledger, without copying it.
         '''
-        curve = pd.DataFrame(self.all_holdings)
-        curve.set_index('datetime', inplace=True)
+        curve = self.all_holdings.to_frame()
         curve['returns'] = curve['total'].pct_change()
         curve['equity_curve'] = (1.0+curve['returns']).cumprod()
         self.equity_curve = curve
 
-    def output_summary_stats(self):
+    def create_trades_dataframe(self):
+        '''
+        Returns a pandas DataFrame of the fills received, indexed by the datetime of the latest holdings record when they were filled.
+        '''
+        trades = pd.DataFrame.from_records(self.trades, columns=['datetime', 'ticker', 'direction', 'quantity', 'fill_cost', 'commission'])
+        trades['datetime'] = pd.to_datetime(trades['datetime'])
+        return trades.set_index('datetime')
+
+    def summary_stats(self):
         '''
-        Creates a list of summary statistics for the portfolio
+        Returns a dictionary of numeric summary statistics for the portfolio, without writing any output.
         '''
-        total_return = self.equity_curve['equity_curve'][-1]
+        total_return = self.equity_curve['equity_curve'].iloc[-1]
         returns = self.equity_curve['returns']
         pnl = self.equity_curve['equity_curve']
 
-        sharpe_ratio = create_sharpe_ratio(returns, periods=252*60*6.5)
+        sharpe_ratio = create_sharpe_ratio(returns, periods=self.PERIODS)
         drawdown, max_dd, dd_duration = create_drawdowns(pnl)
         self.equity_curve['drawdown'] = drawdown
 
+        return {
+            'total_return': float(total_return - 1.0),
+            'sharpe_ratio': float(sharpe_ratio),
+            'max_drawdown': float(max_dd),
+            'drawdown_duration': float(dd_duration),
+        }
+
+    def running_stats(self):
+        '''
+        Returns the summary statistics of the bars processed so far from the running metrics, in O(1) and without building the equity curve. Includes the current drawdown, its duration and the turnover.
+        '''
+        metrics = self.metrics
+        return {
+            'total_return': metrics.total_return,
+            'sharpe_ratio': metrics.sharpe_ratio(self.PERIODS),
+            'max_drawdown': metrics.max_drawdown,
+            'drawdown_duration': float(metrics.max_duration),
+            'drawdown': metrics.drawdown,
+            'current_duration': metrics.duration,
+            'high_water_mark': metrics.high_water_mark,
+            'volatility': metrics.volatility,
+            'turnover': metrics.turnover,
+        }
+
+    def output_summary_stats(self, path='equity.csv', sink=None, name=None):
+        '''
+        Creates a list of summary statistics for the portfolio, and writes the equity curve to a CSV file, or the equity curve, trades and summary statistics to a results sink.
+
+        :param path: CSV file the equity curve is written to without a sink
+        :param sink: Optional ResultsSink the results are written to in the background instead
+        :param name: Name of the results in the sink, defaults to strategy_<strategy_id>
+        '''
+        summary = self.summary_stats()
+
         stats = [
-            ('Total Return', '%0.2f' % ((total_return - 1.0) * 100.0)),
-            ('Sharpe Ratio', '%0.2f' % sharpe_ratio),
-            ('Max Drawdown', '%0.2f%%' % (max_dd * 100.0)),
-            ('Drawdown Duration', '%d' % dd_duration),
+            ('Total Return', '%0.2f' % (summary['total_return'] * 100.0)),
+            ('Sharpe Ratio', '%0.2f' % summary['sharpe_ratio']),
+            ('Max Drawdown', '%0.2f%%' % (summary['max_drawdown'] * 100.0)),
+            ('Drawdown Duration', '%d' % summary['drawdown_duration']),
         ]
-        self.equity_curve.to_csv('equity.csv')
-        return stats
\ No newline at end of file
+        if sink is None:
+            self.equity_curve.to_csv(path)
+        else:
+            sink.write(name or 'strategy_%d' % self.strategy_id, self.equity_curve, self.create_trades_dataframe(), summary)
+        return stats
@@ -0,0 +1,190 @@
+import cProfile
+import math
+import pstats
+import threading
+import time
+
+
+class LatencyHistogram(object):
+    '''
+    Log-linear histogram of latencies in seconds. Every power of two between MIN_EXPONENT and MAX_EXPONENT is split into SUB_BUCKETS equal buckets, so recording is a constant-time increment and percentiles are accurate to within 1/SUB_BUCKETS of the value, whatever the number of samples.
+    '''
+    SUB_BUCKETS = 16
+    MIN_EXPONENT = -29
+    MAX_EXPONENT = 8
+
+    def __init__(self):
+        self.counts = [0] * ((self.MAX_EXPONENT - self.MIN_EXPONENT) * self.SUB_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def _bucket(self, seconds):
+        if seconds <= 0.0:
+            return 0
+
+        # seconds = mantissa * 2 ** exponent with 0.5 <= mantissa < 1
+        mantissa, exponent = math.frexp(seconds)
+        i = (exponent - self.MIN_EXPONENT) * self.SUB_BUCKETS + int((mantissa - 0.5) * 2 * self.SUB_BUCKETS)
+        return min(max(i, 0), len(self.counts) - 1)
+
+    def _upper_bound(self, i):
+        exponent, sub = divmod(i, self.SUB_BUCKETS)
+        return math.ldexp(0.5 + (sub + 1) / (2.0 * self.SUB_BUCKETS), exponent + self.MIN_EXPONENT)
+
+    def record(self, seconds):
+        self.counts[self._bucket(seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        '''
+        Returns the latency below which q percent of the samples fall.
+
+        :param q: Percentile between 0 and 100
+        '''
+        if not self.count:
+            return 0.0
+
+        rank = max(int(math.ceil(q / 100.0 * self.count)), 1)
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                break
+
+        # The last bucket also holds every sample above its range
+        if i == len(self.counts) - 1:
+            return self.max
+        return min(self._upper_bound(i), self.max)
+
+    def merge(self, other):
+        '''
+        Adds the samples of another histogram to this one.
+        '''
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+class LatencyRecorder(object):
+    '''
+    Collection of latency histograms by name, such as one per event type and one per event handler. Handlers are instrumented by wrapping them with wrap(), so uninstrumented code pays nothing.
+
+    :param threadsafe: Serialize recording with a lock, for calls made from several threads such as concurrent broker requests
+    '''
+    PERCENTILES = (50, 90, 99, 99.9)
+
+    def __init__(self, threadsafe=False):
+        self.histograms = dict()
+        self.lock = threading.Lock() if threadsafe else None
+
+    def histogram(self, name):
+        '''
+        Returns the histogram of the given name, creating it if needed.
+        '''
+        if self.lock is None:
+            return self._histogram(name)
+        with self.lock:
+            return self._histogram(name)
+
+    def _histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram()
+        return histogram
+
+    def record(self, name, seconds):
+        if self.lock is None:
+            self._histogram(name).record(seconds)
+        else:
+            with self.lock:
+                self._histogram(name).record(seconds)
+
+    def wrap(self, name, func):
+        '''
+        Wraps a callable to record the latency of every call under the given name.
+        '''
+        record = self.histogram(name).record if self.lock is None else lambda s: self.record(name, s)
+        clock = time.perf_counter
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(clock() - start)
+
+        return timed
+
+    def summary(self, percentiles=PERCENTILES):
+        '''
+        Returns a dictionary of name to count, mean, max and percentile latencies in seconds.
+        '''
+        if self.lock is None:
+            histograms = sorted(self.histograms.items())
+        else:
+            with self.lock:
+                histograms = sorted(self.histograms.items())
+
+        summary = dict()
+        for name, histogram in histograms:
+            stats = {'count': histogram.count, 'mean': histogram.mean, 'max': histogram.max}
+            for q in percentiles:
+                stats['p%g' % q] = histogram.percentile(q)
+            summary[name] = stats
+        return summary
+
+class BarRangeHook(object):
+    '''
+    Calls on_start before the bar numbered start_bar (counting from 0) is processed and on_stop before stop_bar is, e.g. to start and stop a sampling profiler around a range of bars.
+
+    :param start_bar: First bar of the range
+    :param stop_bar: Bar after the last bar of the range
+    :param on_start: Callable run at the start of the range
+    :param on_stop: Callable run at the end of the range
+    '''
+    def __init__(self, start_bar, stop_bar, on_start, on_stop):
+        self.start_bar = start_bar
+        self.stop_bar = stop_bar
+        self.on_start = on_start
+        self.on_stop = on_stop
+        self.active = False
+
+    def on_bar(self, bar):
+        if bar == self.start_bar and not self.active:
+            self.active = True
+            self.on_start()
+        elif bar == self.stop_bar and self.active:
+            self.close()
+
+    def close(self):
+        '''
+        Ends the range early, e.g. when the run stops before stop_bar.
+        '''
+        if self.active:
+            self.active = False
+            self.on_stop()
+
+class CProfileHook(BarRangeHook):
+    '''
+    Profiles a range of bars with cProfile.
+
+    :param start_bar: First bar of the range
+    :param stop_bar: Bar after the last bar of the range
+    '''
+    def __init__(self, start_bar, stop_bar):
+        self.profile = cProfile.Profile()
+        super(CProfileHook, self).__init__(start_bar, stop_bar, self.profile.enable, self.profile.disable)
+
+    def stats(self, sort='cumulative'):
+        '''
+        Returns the pstats.Stats of the profiled range.
+        '''
+        return pstats.Stats(self.profile).sort_stats(sort)
@@ -0,0 +1,177 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import json
+import numpy as np
+import pandas as pd
+import struct
+import zlib
+
+
+MAGIC = b'ATRS'
+VERSION = 1
+
+# Each result is one self-contained record: this header, a JSON description of the
+# result and its columns, then the raw column buffers, zlib-compressed if flagged.
+RECORD = struct.Struct('<4sHBxIQ')
+
+def _frame_columns(frame):
+    '''
+    Returns the columns of a DataFrame, index first, as a list of (name, array) pairs.
+    '''
+    columns = [(frame.index.name or 'index', frame.index.to_numpy())]
+    columns += [(str(c), frame[c].to_numpy()) for c in frame.columns]
+    return columns
+
+def _pack_table(columns):
+    '''
+    Packs (name, array) columns into their column descriptions and list of buffers. Datetimes are stored as int64 nanoseconds, numbers as raw little-endian buffers and anything else as strings in the description.
+    '''
+    descriptions = list()
+    buffers = list()
+    offset = 0
+
+    for name, values in columns:
+        if values.dtype.kind == 'M':
+            values = values.astype('datetime64[ns]')
+        if values.dtype.kind in 'biufM':
+            data = np.ascontiguousarray(values).tobytes()
+            descriptions.append({'name': name, 'dtype': values.dtype.str, 'offset': offset, 'nbytes': len(data)})
+            buffers.append(data)
+            offset += len(data)
+        else:
+            descriptions.append({'name': name, 'dtype': 'str', 'values': [None if v is None else str(v) for v in values]})
+
+    return descriptions, buffers, offset
+
+def dumps_result(name, tables, stats=None, compress=True):
+    '''
+    Serializes a named result, made of tables of columns and a dictionary of statistics, to a single record.
+
+    :param name: Name of the result, e.g. of the run or strategy
+    :param tables: Dictionary of table name to DataFrame or list of (name, array) columns
+    :param stats: Optional dictionary of JSON-serializable statistics
+    :param compress: Compress the column buffers
+    '''
+    meta = {'name': name, 'stats': stats or dict(), 'tables': dict()}
+    body = list()
+    start = 0
+
+    for table, columns in tables.items():
+        if isinstance(columns, pd.DataFrame):
+            columns = _frame_columns(columns)
+        descriptions, buffers, size = _pack_table(columns)
+        for d in descriptions:
+            if 'offset' in d:
+                d['offset'] += start
+        meta['tables'][table] = descriptions
+        body.extend(buffers)
+        start += size
+
+    body = b''.join(body)
+    if compress:
+        body = zlib.compress(body, 1)
+    header = json.dumps(meta).encode('utf-8')
+    return RECORD.pack(MAGIC, VERSION, int(compress), len(header), len(body)) + header + body
+
+def _unpack_table(descriptions, body):
+    columns = list()
+    for d in descriptions:
+        if d['dtype'] == 'str':
+            values = np.array(d['values'], dtype=object)
+        else:
+            values = np.frombuffer(body, dtype=np.dtype(d['dtype']), count=d['nbytes'] // np.dtype(d['dtype']).itemsize, offset=d['offset'])
+        columns.append((d['name'], values))
+
+    (index_name, index), columns = columns[0], columns[1:]
+    return pd.DataFrame(dict(columns), index=pd.Index(index, name=index_name), columns=[name for name, _ in columns])
+
+def read_results(path):
+    '''
+    Reads every result of a results file, returning a list of dictionaries with the name, the stats and a DataFrame per table of each result, in the order they were written.
+
+    :param path: Results file path
+    '''
+    with open(path, 'rb') as fh:
+        data = fh.read()
+
+    results = list()
+    pos = 0
+    while pos < len(data):
+        magic, version, compressed, header_size, body_size = RECORD.unpack_from(data, pos)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Corrupt or unsupported results record at byte %d' % pos)
+        pos += RECORD.size
+
+        meta = json.loads(data[pos:pos + header_size].decode('utf-8'))
+        pos += header_size
+        body = data[pos:pos + body_size]
+        pos += body_size
+        if compressed:
+            body = zlib.decompress(body)
+
+        result = {'name': meta['name'], 'stats': meta['stats']}
+        for table, descriptions in meta['tables'].items():
+            result[table] = _unpack_table(descriptions, body)
+        results.append(result)
+
+    return results
+
+class ResultsSink(object):
+    '''
+    Writes backtest results, such as equity curves, trades and summary statistics, to a compact columnar binary file on a background thread. Columns are stored as raw arrays rather than formatted text, optionally compressed, so that writing the results of thousands of runs costs little more than copying their arrays, and the run calling write() only waits for those copies.
+
+    Writes are queued and written in order. With append set, results are added to an existing file, so many runs, e.g. of a parameter sweep, can share a single file. read_results() reads them back.
+
+    :param path: Results file path
+    :param compress: Compress the columns of each result
+    :param append: Append to an existing file rather than overwriting it
+    '''
+    def __init__(self, path, compress=True, append=False):
+        self.path = path
+        self.compress = compress
+        self.written = 0
+
+        self._fh = open(path, 'ab' if append else 'wb')
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = list()
+
+    def write(self, name, equity, trades=None, stats=None):
+        '''
+        Schedules a result to be written. The equity curve and trades are snapshotted before returning, so they can be modified afterwards.
+
+        :param name: Name of the result, e.g. of the run or strategy
+        :param equity: Equity curve DataFrame
+        :param trades: Optional DataFrame of trades
+        :param stats: Optional dictionary of summary statistics
+        '''
+        tables = {'equity': [(c, np.array(v)) for c, v in _frame_columns(equity)]}
+        if trades is not None:
+            tables['trades'] = [(c, np.array(v)) for c, v in _frame_columns(trades)]
+
+        # Drop finished writes, re-raising their errors
+        done = [f for f in self._pending if f.done()]
+        self._pending = [f for f in self._pending if f not in done]
+        for future in done:
+            future.result()
+
+        self._pending.append(self._executor.submit(self._write, name, tables, dict(stats or dict())))
+
+    def _write(self, name, tables, stats):
+        self._fh.write(dumps_result(name, tables, stats, self.compress))
+        self._fh.flush()
+        self.written += 1
+
+    def wait(self):
+        '''
+        Blocks until every scheduled result is on disk, re-raising any error of the writes.
+        '''
+        pending, self._pending = self._pending, list()
+        for future in pending:
+            future.result()
+
+    def close(self):
+        try:
+            self.wait()
+        finally:
+            self._executor.shutdown()
+            self._fh.close()
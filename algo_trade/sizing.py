@@ -0,0 +1,116 @@
+import numpy as np
+
+
+# Sign of the target position of each signal type
+DIRECTIONS = {'LONG': 1, 'SHORT': -1, 'EXIT': 0}
+
+class PositionSizer(object):
+    '''
+    Turns a batch of signals, such as all the signals of a bar, into target positions in one vectorized step, so that sizing and constraints can take every signal of the batch into account at once.
+
+    Positions are sized, in order of precedence, to an annualised volatility target (target_volatility over the volatility of the last vol_window returns of each ticker, as a fraction of equity), to a fixed fraction of equity (weight), or to a fixed number of shares (quantity), optionally scaled by the absolute signal strength. Sizes are then capped per name by max_weight and max_quantity. Across the batch, new positions are scaled down so that gross exposure stays within max_leverage times equity, or closed if equity is unknown, and buys other than exits are scaled down to what cash and the proceeds of the batch's sells can pay for if cash_limit is set. Targets are rounded towards zero to whole shares, so that caps hold exactly.
+
+    EXIT signals close the position. Without rebalance, LONG and SHORT signals only open positions from flat, and names already held are left alone; with rebalance, held positions are traded to their new target. Names whose size cannot be computed, e.g. without enough history for their volatility, are left alone.
+
+    The defaults reproduce the naive sizing of 100 shares per signal.
+
+    :param quantity: Number of shares per position
+    :param weight: Optional fraction of equity per position
+    :param target_volatility: Optional annualised volatility target per position, as a fraction of equity
+    :param vol_window: Number of returns the volatility of each ticker is estimated over
+    :param periods: Number of bars per year used to annualise volatilities
+    :param scale_by_strength: Scale sizes by the absolute signal strength
+    :param max_weight: Optional cap on the value of each position as a fraction of equity
+    :param max_quantity: Optional cap on the number of shares of each position
+    :param max_leverage: Optional cap on the gross exposure of the portfolio as a multiple of equity
+    :param cash_limit: Limit buys to the available cash plus the proceeds of the batch's sells
+    :param rebalance: Trade positions already held to their new target
+    '''
+    def __init__(self, quantity=100, weight=None, target_volatility=None, vol_window=20, periods=252, scale_by_strength=False, max_weight=None, max_quantity=None, max_leverage=None, cash_limit=False, rebalance=False):
+        self.quantity = quantity
+        self.weight = weight
+        self.target_volatility = target_volatility
+        self.vol_window = vol_window
+        self.periods = periods
+        self.scale_by_strength = scale_by_strength
+        self.max_weight = max_weight
+        self.max_quantity = max_quantity
+        self.max_leverage = max_leverage
+        self.cash_limit = cash_limit
+        self.rebalance = rebalance
+
+    @property
+    def history(self):
+        '''
+        Number of bars of prices needed to size a batch.
+        '''
+        return self.vol_window + 1 if self.target_volatility is not None else 1
+
+    def _sizes(self, prices, equity, history):
+        '''
+        Returns the unsigned size in shares of a position in each name, before strength scaling and caps.
+        '''
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if self.target_volatility is not None:
+                returns = history[1:] / history[:-1] - 1.0
+                volatility = np.std(returns, axis=0) * np.sqrt(self.periods) if len(returns) > 1 else np.full(len(prices), np.nan)
+                return self.target_volatility / volatility * equity / prices
+            if self.weight is not None:
+                return self.weight * equity / prices
+        return np.full(len(prices), float(self.quantity))
+
+    def target_positions(self, directions, strengths, positions, prices, equity, cash, history=None, exposure=0.0):
+        '''
+        Returns the target position in shares of each name of a batch of signals.
+
+        :param directions: Array of 1 (LONG), -1 (SHORT) or 0 (EXIT) per name
+        :param strengths: Array of signal strengths per name
+        :param positions: Array of current positions per name
+        :param prices: Array of latest prices per name
+        :param equity: Current portfolio value
+        :param cash: Current cash
+        :param history: (bars, names) array of the last history bars of prices, needed for volatility targeting
+        :param exposure: Gross market value of the positions held in names outside the batch
+        '''
+        directions = np.asarray(directions, dtype=np.float64)
+        positions = np.asarray(positions, dtype=np.float64)
+        prices = np.asarray(prices, dtype=np.float64)
+
+        size = np.maximum(self._sizes(prices, equity, history), 0.0)
+        if self.scale_by_strength:
+            size = size * np.abs(np.asarray(strengths, dtype=np.float64))
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if self.max_weight is not None:
+                size = np.minimum(size, self.max_weight * equity / prices)
+            if self.max_quantity is not None:
+                size = np.minimum(size, self.max_quantity)
+
+            targets = np.where(np.isfinite(size), directions * size, positions)
+
+        targets[directions == 0] = 0.0
+        if not self.rebalance:
+            held = (directions != 0) & (positions != 0)
+            targets[held] = positions[held]
+
+        # Scale down the positions being traded to keep within the leverage cap
+        trading = targets != positions
+        if self.max_leverage is not None and trading.any():
+            value = np.abs(np.where(targets != 0, targets * prices, 0.0))
+            budget = self.max_leverage * equity - exposure - value[~trading].sum()
+            if not np.isfinite(budget):
+                budget = 0.0
+            traded_value = value[trading].sum()
+            if traded_value > budget:
+                targets[trading] *= max(budget, 0.0) / traded_value
+
+        # Scale down buys to what cash and the proceeds of sells can pay for, after buying back exited shorts
+        if self.cash_limit:
+            trades = (targets - positions) * prices
+            buys = (trades > 0) & (directions != 0)
+            cost = trades[buys].sum()
+            available = cash - trades[trades < 0].sum() - trades[(trades > 0) & (directions == 0)].sum()
+            if cost > available:
+                targets[buys] = positions[buys] + (targets[buys] - positions[buys]) * max(available, 0.0) / cost
+
+        return np.trunc(targets).astype(np.int64)
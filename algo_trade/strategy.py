@@ -1,5 +1,7 @@
 from abc import ABCMeta, abstractmethod
 
+import copy
+
 
 class Strategy(object):
     '''
@@ -11,6 +13,31 @@ class Strategy(object):
     '''
     __metaclass__ = ABCMeta
 
+    # Attributes shared with the rest of the engine rather than owned by the strategy
+    SHARED_ATTRIBUTES = ('bars', 'events')
+
     @abstractmethod
     def calculate_signals(self):
-        raise NotImplementedError('Should implement calculate_signals()')
\ No newline at end of file
+        raise NotImplementedError('Should implement calculate_signals()')
+
+    def checkpoint_state(self):
+        '''
+        Returns a picklable copy of the strategy state for checkpointing. By default this is a deep copy of every attribute other than the data handler and event queue, and can be overridden by strategies holding unpicklable objects.
+        '''
+        return copy.deepcopy(dict((k, v) for k, v in vars(self).items() if k not in self.SHARED_ATTRIBUTES))
+
+    def restore_state(self, state):
+        '''
+        Restores the strategy state returned by checkpoint_state.
+        '''
+        self.__dict__.update(copy.deepcopy(state))
+
+class VectorizedStrategy(object):
+    '''
+    Abstract base class for strategies run by VectorizedBacktest. Rather than reacting to one bar at a time, a vectorized strategy computes its target positions over the whole aligned bar panel in one go.
+    '''
+    __metaclass__ = ABCMeta
+
+    @abstractmethod
+    def calculate_positions(self, bar_store):
+        raise NotImplementedError('Should implement calculate_positions()')
@@ -1,9 +1,13 @@
 from datetime import datetime, timedelta
 from scipy import stats
 
+from algo_trade.analytics import drawdowns
+
 import pandas as pd
 import math
 import numpy as np
+import threading
+import time
 
 
 def create_sharpe_ratio(returns, periods=252, rf=0):
@@ -21,22 +25,140 @@ def create_drawdowns(pnl):
 
     :param pnl: A pandas Series representing period percentage returns.
     '''
-    # Calculate cumulative returns curve and set up High Water Mark
-    hwm = [0]
-
-    # Create drawdown and duration series
-    idx = pnl.index
-    drawdown = pd.Series(index=idx)
-    duration = pd.Series(index=idx)
+    # The first value is skipped, as the first return of the curve is undefined
+    values = pnl.to_numpy(dtype=np.float64, copy=True)
+    values[:1] = np.nan
 
-    # Loop over the index range
-    for t in range(1, len(idx)):
-        hwm.append(max(hwm[t-1], pnl[t]))
-        drawdown[t] = (hwm[t] - pnl[t])
-        duration[t] = (0 if drawdown[t] == 0 else duration[t-1] + 1)
+    drawdown, duration = drawdowns(values)
+    drawdown = pd.Series(drawdown, index=pnl.index)
+    duration = pd.Series(duration, index=pnl.index)
 
     return drawdown, drawdown.max(), duration.max()
 
+class RunningMetrics(object):
+    '''
+    Online performance metrics of a portfolio value series, updated one value at a time so that every metric can be read at any bar in O(1) without building the equity curve. Definitions follow create_sharpe_ratio and create_drawdowns over the curve normalised to the initial value:
+
+    - Running mean and population variance of period returns (Welford's algorithm)
+    - High-water mark, current and maximum drawdown, current and maximum drawdown duration in bars
+    - Turnover, the traded value divided by the average portfolio value
+
+    Missing (NaN) values are skipped, and returns are taken from the last valid value.
+
+    :param initial_value: Starting value of the series, e.g. the initial capital
+    '''
+    def __init__(self, initial_value):
+        self.initial_value = float(initial_value)
+        self.last_value = float(initial_value)
+        self.bars = 0
+
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+        self.high_water_mark = 0.0
+        self.drawdown = 0.0
+        self.max_drawdown = 0.0
+        self.duration = 0
+        self.max_duration = 0
+
+        self.traded_value = 0.0
+        self._value_sum = 0.0
+        self._value_count = 0
+
+    def update(self, value):
+        '''
+        Adds the portfolio value at the next bar.
+        '''
+        self.bars += 1
+        if value != value:
+            return
+
+        self._value_sum += value
+        self._value_count += 1
+
+        if self.last_value:
+            r = value / self.last_value - 1.0
+            self.count += 1
+            delta = r - self.mean
+            self.mean += delta / self.count
+            self._m2 += delta * (r - self.mean)
+        self.last_value = value
+
+        equity = value / self.initial_value
+        if equity > self.high_water_mark:
+            self.high_water_mark = equity
+
+        self.drawdown = self.high_water_mark - equity
+        self.duration = 0 if self.drawdown == 0 else self.duration + 1
+        if self.drawdown > self.max_drawdown:
+            self.max_drawdown = self.drawdown
+        if self.duration > self.max_duration:
+            self.max_duration = self.duration
+
+    def add_trade(self, value):
+        '''
+        Adds the value of a trade to the turnover.
+        '''
+        self.traded_value += abs(value)
+
+    @property
+    def variance(self):
+        return self._m2 / self.count if self.count else 0.0
+
+    @property
+    def volatility(self):
+        return math.sqrt(self.variance)
+
+    @property
+    def total_return(self):
+        return self.last_value / self.initial_value - 1.0
+
+    @property
+    def turnover(self):
+        return self.traded_value * self._value_count / self._value_sum if self._value_sum else 0.0
+
+    def sharpe_ratio(self, periods=252):
+        '''
+        Returns the annualised Sharpe ratio of the returns so far, NaN while their volatility is zero.
+
+        :param periods: Daily (252), Hourly (252 * 6.5), Minutely (252 * 6.5 * 60), etc.
+        '''
+        volatility = self.volatility
+        return math.sqrt(periods) * self.mean / volatility if volatility else float('nan')
+
+class RateLimiter(object):
+    '''
+    Thread-safe token bucket that limits calls to a sustained rate, allowing short bursts up to the bucket size. Used to keep concurrent API requests within broker rate limits.
+
+    :param rate: Maximum sustained calls per second
+    :param burst: Maximum number of calls allowed back to back
+    '''
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        '''
+        Blocks until a call is allowed under the rate limit.
+        '''
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = (1 - self.tokens) / self.rate
+
+            time.sleep(wait)
+
 # TODO: Under development - American/European? Dividends?
 def black_scholes(stock_price, strike_price, time, rf, div, volatility, option_type):
     '''
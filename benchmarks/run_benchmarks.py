@@ -0,0 +1,240 @@
+'''
+Benchmarks of the backtesting hot paths over deterministic synthetic market data.
+
+Results are written as JSON, and can be compared against a saved baseline to catch regressions:
+
+    python benchmarks/run_benchmarks.py --tickers 10 --bars 5000 --output results.json
+    python benchmarks/run_benchmarks.py --output results.json --baseline baseline.json --tolerance 0.2
+
+The run exits with status 1 if any benchmark is slower than the baseline by more than the tolerance. Baselines are only comparable between runs on the same machine with the same --tickers, --bars and --seed.
+'''
+from datetime import datetime
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from algo_trade.backtest import Backtest
+from algo_trade.broker import SimulatedBroker
+from algo_trade.data import BarStore, generate_bars, write_bar_csv
+from algo_trade.event import EventQueue, SignalEvent
+from algo_trade.portfolio import Portfolio
+from algo_trade.strategy import Strategy
+from algo_trade.utilities import create_drawdowns
+
+
+class MovingAverageCrossStrategy(Strategy):
+    '''
+    Goes long when the short moving average crosses above the long one and exits when it crosses back.
+    '''
+    def __init__(self, bars, events, short_window=10, long_window=40):
+        self.bars = bars
+        self.events = events
+        self.short_window = short_window
+        self.long_window = long_window
+        self.invested = dict((t, False) for t in self.bars.ticker_list)
+
+    def calculate_signals(self, event):
+        for t in self.bars.ticker_list:
+            closes = self.bars.get_latest_bars_values(t, 'adj_close', self.long_window)
+            if len(closes) < self.long_window:
+                continue
+
+            above = closes[-self.short_window:].mean() > closes.mean()
+            if above and not self.invested[t]:
+                self.events.put(SignalEvent(0, t, None, 'LONG', 1.0))
+                self.invested[t] = True
+            elif not above and self.invested[t]:
+                self.events.put(SignalEvent(0, t, None, 'EXIT', 1.0))
+                self.invested[t] = False
+
+class Benchmarks(object):
+    '''
+    Benchmark cases over one set of synthetic bars. Each case is a method returning a callable to be timed, after any setup that should not be timed, and the number of operations per call.
+
+    :param csv_dir: Directory the synthetic CSV files are written to
+    :param num_tickers: Number of tickers
+    :param num_bars: Number of bars per ticker
+    :param seed: Random seed of the synthetic bars
+    '''
+    CASES = [
+        'open_convert_csv_files',
+        'update_bars',
+        'get_latest_bars_values',
+        'update_timeindex',
+        'create_equity_curve_dataframe',
+        'create_drawdowns',
+        'backtest',
+    ]
+
+    def __init__(self, csv_dir, num_tickers, num_bars, seed=0):
+        self.csv_dir = csv_dir
+        self.ticker_list = ['T%03d' % i for i in range(num_tickers)]
+        self.num_bars = num_bars
+        self.start_date = datetime(1999, 12, 31)
+
+        ticker_data = generate_bars(self.ticker_list, num_bars, seed)
+        write_bar_csv(ticker_data, csv_dir)
+        self.bar_store = BarStore.from_frames(ticker_data, self.ticker_list)
+
+    def _broker(self):
+        return SimulatedBroker(EventQueue(), self.ticker_list, bar_store=self.bar_store)
+
+    def _portfolio(self):
+        broker = self._broker()
+        portfolio = Portfolio(broker, broker.events, self.start_date)
+        for _ in range(self.num_bars):
+            broker.cursor += 1
+            portfolio.update_timeindex(None)
+        return portfolio
+
+    def open_convert_csv_files(self):
+        return lambda: SimulatedBroker(EventQueue(), self.ticker_list, self.csv_dir), 1
+
+    def update_bars(self):
+        def run():
+            broker = self._broker()
+            for _ in range(self.num_bars):
+                broker.update_bars()
+        return run, self.num_bars
+
+    def get_latest_bars_values(self):
+        broker = self._broker()
+        broker.cursor = self.num_bars
+        calls = 10000
+
+        def run():
+            for i in range(calls):
+                broker.get_latest_bars_values(self.ticker_list[i % len(self.ticker_list)], 'adj_close', 40)
+        return run, calls
+
+    def update_timeindex(self):
+        return self._portfolio, self.num_bars
+
+    def create_equity_curve_dataframe(self):
+        portfolio = self._portfolio()
+        return portfolio.create_equity_curve_dataframe, 1
+
+    def create_drawdowns(self):
+        portfolio = self._portfolio()
+        portfolio.create_equity_curve_dataframe()
+        pnl = portfolio.equity_curve['equity_curve']
+        return lambda: create_drawdowns(pnl), 1
+
+    def backtest(self):
+        def run():
+            Backtest(
+                None, self.ticker_list, 100000.0, 0, self.start_date,
+                SimulatedBroker, SimulatedBroker, Portfolio, MovingAverageCrossStrategy,
+                bar_store=self.bar_store,
+            )._run_backtest()
+        return run, self.num_bars
+
+def time_case(func, repeat):
+    '''
+    Returns the wall times in seconds of repeat calls of func.
+    '''
+    times = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return times
+
+def run_benchmarks(num_tickers, num_bars, seed=0, repeat=5, cases=None):
+    '''
+    Runs the benchmark cases, returning a results dictionary with the run settings and the best and median time of every case.
+    '''
+    csv_dir = tempfile.mkdtemp()
+    try:
+        benchmarks = Benchmarks(csv_dir, num_tickers, num_bars, seed)
+        results = dict()
+        for name in cases or Benchmarks.CASES:
+            # Output of the code under test still costs time but is not shown
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                func, ops = getattr(benchmarks, name)()
+                times = time_case(func, repeat)
+            results[name] = {
+                'best': min(times),
+                'median': float(np.median(times)),
+                'repeat': repeat,
+                'ops': ops,
+                'ops_per_sec': ops / float(np.median(times)),
+            }
+    finally:
+        shutil.rmtree(csv_dir)
+
+    return {
+        'settings': {'tickers': num_tickers, 'bars': num_bars, 'seed': seed},
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'machine': platform.machine(),
+        },
+        'results': results,
+    }
+
+def compare(results, baseline, tolerance=0.2):
+    '''
+    Compares median times against a baseline, returning a list of (name, baseline, current, ratio, regressed) tuples for the cases in both.
+
+    :param tolerance: Allowed fractional slowdown before a case counts as a regression
+    '''
+    rows = list()
+    for name, current in results['results'].items():
+        if name not in baseline['results']:
+            continue
+        before = baseline['results'][name]['median']
+        ratio = current['median'] / before
+        rows.append((name, before, current['median'], ratio, ratio > 1.0 + tolerance))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickers', type=int, default=10)
+    parser.add_argument('--bars', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--cases', nargs='*', choices=Benchmarks.CASES)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.tickers, args.bars, args.seed, args.repeat, args.cases)
+    with open(args.output, 'w') as fh:
+        json.dump(results, fh, indent=2, sort_keys=True)
+
+    for name, r in results['results'].items():
+        print('%-32s %10.4fs median %14.1f ops/sec' % (name, r['median'], r['ops_per_sec']))
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        if baseline['settings'] != results['settings']:
+            print('Baseline settings %s differ from %s' % (baseline['settings'], results['settings']))
+            return 2
+
+        rows = compare(results, baseline, args.tolerance)
+        print()
+        for name, before, after, ratio, regressed in rows:
+            print('%-32s %10.4fs -> %10.4fs %6.2fx%s' % (name, before, after, ratio, '  REGRESSION' if regressed else ''))
+        if any(row[-1] for row in rows):
+            return 1
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,51 @@
+import numpy as np
+import os
+import pandas as pd
+
+from algo_trade.event import SignalEvent
+from algo_trade.strategy import Strategy
+
+
+SIGNAL_TYPES = {1: 'LONG', -1: 'SHORT', 0: 'EXIT'}
+
+def make_test_signals(num_bars, num_tickers, seed=0):
+    rng = np.random.RandomState(seed)
+    signals = rng.choice([1.0, -1.0, 0.0, np.nan], size=(num_bars, num_tickers), p=[0.1, 0.1, 0.1, 0.7])
+    return signals
+
+def write_test_csv_dir(csv_dir, ticker_list, num_bars, seed=0):
+    rng = np.random.RandomState(seed)
+    dates = pd.bdate_range('2000-01-03', periods=num_bars)
+
+    for t in ticker_list:
+        close = 100.0 * np.cumprod(1.0 + rng.normal(0.0, 0.01, num_bars))
+        pd.DataFrame(
+            {
+                'Date': dates,
+                'Open': close,
+                'High': close,
+                'Low': close,
+                'Close': close,
+                'Volume': 1000,
+                'Adj Close': close,
+            }
+        ).to_csv(os.path.join(csv_dir, '%s.csv' % t), index=False)
+
+
+class MatrixStrategy(Strategy):
+    '''
+    Event-driven strategy replaying a precomputed signal matrix.
+    '''
+    signals = None
+
+    def __init__(self, bars, events, signals=None):
+        self.bars = bars
+        self.events = events
+        if signals is not None:
+            self.signals = signals
+
+    def calculate_signals(self, event):
+        row = self.signals[self.bars.cursor - 1]
+        for i, t in enumerate(self.bars.ticker_list):
+            if not np.isnan(row[i]):
+                self.events.put(SignalEvent(0, t, event, SIGNAL_TYPES[int(row[i])], 1.0))
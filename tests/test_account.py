@@ -1,7 +1,80 @@
+from unittest.mock import Mock
+
+import time
 import unittest
 
 import account
 
 
+def make_test_client(cash=1000.0):
+    document = {
+        'securitiesAccount': {
+            'currentBalances': {'liquidationValue': 5000.0, 'cashAvailableForTrading': cash},
+            'positions': [
+                {'instrument': {'symbol': 'SPY'}, 'marketValue': 3000.0},
+                {'instrument': {'symbol': 'IWM'}, 'marketValue': 1000.0},
+            ],
+            'orderStrategies': [
+                {
+                    'orderLegCollection': [{'instrument': {'symbol': 'SPY'}, 'instruction': 'BUY'}],
+                    'quantity': 10,
+                    'orderType': 'LIMIT',
+                    'price': 300.0,
+                    'status': 'QUEUED',
+                },
+            ],
+        }
+    }
+    client = Mock()
+    client.get_account = Mock(return_value=Mock(json=Mock(return_value=document)))
+    return client
+
+
 class TestTDAAccountClient(unittest.TestCase):
-    pass
\ No newline at end of file
+    def setUp(self):
+        self.test_client = make_test_client()
+
+    def test_properties(self):
+        test_account = account.TDAAccountClient(self.test_client, 'ACC', ttl=60)
+
+        self.assertEqual(test_account.balance, 5000.0)
+        self.assertEqual(test_account.cash, 1000.0)
+        self.assertEqual(test_account.position, {'SPY': 0.75, 'IWM': 0.25})
+        self.assertEqual(test_account.order[0]['ticker'], 'SPY')
+        self.assertEqual(test_account.order[0]['status'], 'QUEUED')
+
+        self.test_client.get_account.assert_called_once_with('ACC', fields=['orders', 'positions'])
+
+    def test_ttl(self):
+        test_account = account.TDAAccountClient(self.test_client, 'ACC', ttl=0.05)
+        test_account.balance
+        test_account.cash
+        self.assertEqual(self.test_client.get_account.call_count, 1)
+
+        time.sleep(0.06)
+        test_account.cash
+        self.assertEqual(self.test_client.get_account.call_count, 2)
+
+    def test_no_ttl(self):
+        test_account = account.TDAAccountClient(self.test_client, 'ACC')
+        test_account.balance
+        test_account.cash
+        self.assertEqual(self.test_client.get_account.call_count, 2)
+
+    def test_invalidate(self):
+        test_account = account.TDAAccountClient(self.test_client, 'ACC', ttl=60)
+        test_account.balance
+        test_account.invalidate()
+        test_account.balance
+        self.assertEqual(self.test_client.get_account.call_count, 2)
+
+    def test_refresh_accounts(self):
+        clients = [make_test_client(cash=float(i)) for i in range(5)]
+        accounts = [account.TDAAccountClient(c, 'ACC%d' % i, ttl=60) for i, c in enumerate(clients)]
+
+        snapshots = account.refresh_accounts(accounts, max_workers=3)
+
+        self.assertEqual([s['currentBalances']['cashAvailableForTrading'] for s in snapshots], [0.0, 1.0, 2.0, 3.0, 4.0])
+        self.assertEqual([a.cash for a in accounts], [0.0, 1.0, 2.0, 3.0, 4.0])
+        for c in clients:
+            self.assertEqual(c.get_account.call_count, 1)
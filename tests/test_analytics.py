@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import unittest
+
+from algo_trade import analytics
+from algo_trade import utilities
+
+class TestAnalytics(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.equity = np.cumprod(1.0 + rng.normal(0.0005, 0.01, size=(300, 4)), axis=0)
+        self.returns = analytics.returns(self.equity)
+
+    def test_matches_utilities(self):
+        sharpe = analytics.sharpe_ratio(self.returns)
+        max_dd = analytics.max_drawdown(self.equity)
+
+        for j in range(self.equity.shape[1]):
+            pnl = pd.Series(self.equity[:, j])
+            drawdown, ddmax, duration = utilities.create_drawdowns(pnl)
+            self.assertAlmostEqual(sharpe[j], utilities.create_sharpe_ratio(pnl.pct_change()))
+            self.assertAlmostEqual(max_dd[j], analytics.max_drawdown(self.equity[:, j]))
+            self.assertAlmostEqual(analytics.max_drawdown(self.equity[1:, j]), ddmax)
+            self.assertEqual(analytics.max_duration(self.equity[1:, j]), duration)
+
+    def test_drawdowns(self):
+        drawdown, duration = analytics.drawdowns([np.nan, 1.0, 1.2, 0.9, np.nan, 1.0, 1.3, 1.1])
+
+        np.testing.assert_allclose(drawdown, [np.nan, 0.0, 0.0, 0.3, np.nan, 0.2, 0.0, 0.2])
+        np.testing.assert_array_equal(duration, [np.nan, 0, 0, 1, 2, 3, 0, 1])
+
+        relative, _ = analytics.drawdowns([1.0, 2.0, 1.5], relative=True)
+        np.testing.assert_allclose(relative, [0.0, 0.0, 0.25])
+
+    def test_ratios(self):
+        equity = self.equity[:, 0]
+        returns = self.returns[1:, 0]
+        relative, _ = analytics.drawdowns(equity, relative=True)
+        downside = np.sqrt(np.mean(np.minimum(returns, 0.0) ** 2))
+        cagr = (equity[-1] / equity[0]) ** (252.0 / (len(equity) - 1)) - 1.0
+
+        self.assertAlmostEqual(analytics.sortino_ratio(returns), np.sqrt(252) * returns.mean() / downside)
+        self.assertAlmostEqual(analytics.calmar_ratio(equity), cagr / relative.max())
+        self.assertAlmostEqual(analytics.ulcer_index(equity), np.sqrt(np.mean(relative ** 2)))
+
+    def test_rolling(self):
+        window = 50
+        for func, x in [
+            (analytics.rolling_sharpe_ratio, self.returns[1:]),
+            (analytics.rolling_sortino_ratio, self.returns[1:]),
+            (analytics.rolling_max_drawdown, self.equity),
+            (analytics.rolling_max_duration, self.equity),
+            (analytics.rolling_calmar_ratio, self.equity),
+            (analytics.rolling_ulcer_index, self.equity),
+        ]:
+            result = func(x, window)
+            self.assertEqual(result.shape, x.shape)
+            self.assertTrue(np.isnan(result[:window - 1]).all())
+
+            # Small blocks give the same results, and each row matches the reduction of its window
+            np.testing.assert_allclose(analytics.rolling(lambda w: func(w, window)[-1], x, window, block_size=1), result)
+            for t in (window - 1, 120, len(x) - 1):
+                np.testing.assert_allclose(result[t], func(x[t - window + 1:t + 1], window)[-1])
+
+        np.testing.assert_allclose(
+            analytics.rolling_sharpe_ratio(self.returns[1:, 0], window)[window - 1:],
+            pd.Series(self.returns[1:, 0]).rolling(window).apply(utilities.create_sharpe_ratio, raw=True)[window - 1:],
+        )
+
+    def test_summarize(self):
+        frame = pd.DataFrame(self.equity, columns=['a', 'b', 'c', 'd'])
+        summary = analytics.summarize(frame)
+
+        self.assertEqual(list(summary.index), ['a', 'b', 'c', 'd'])
+        self.assertAlmostEqual(summary.loc['c', 'total_return'], self.equity[-1, 2] / self.equity[0, 2] - 1.0)
+        self.assertAlmostEqual(summary.loc['c', 'sharpe_ratio'], analytics.sharpe_ratio(self.returns[:, 2]))
+        self.assertAlmostEqual(summary.loc['c', 'ulcer_index'], analytics.ulcer_index(self.equity[:, 2]))
+        self.assertEqual(len(analytics.summarize(self.equity[:, 0])), 1)
@@ -0,0 +1,233 @@
+from datetime import datetime
+
+import numpy as np
+import os
+import pandas as pd
+import shutil
+import tempfile
+import unittest
+
+from algo_trade.backtest import Backtest, BacktestStats, VectorizedBacktest, signals_to_positions
+from algo_trade.broker import SimulatedBroker
+from algo_trade.portfolio import Portfolio
+from algo_trade.profiling import CProfileHook, LatencyRecorder
+from algo_trade.results import ResultsSink, read_results
+from algo_trade.strategy import VectorizedStrategy
+from backtest_helpers import MatrixStrategy, make_test_signals, write_test_csv_dir
+
+
+class MatrixVectorizedStrategy(VectorizedStrategy):
+    def __init__(self, signals):
+        self.signals = signals
+
+    def calculate_positions(self, bar_store):
+        return signals_to_positions(self.signals)
+
+
+class TestBacktest(unittest.TestCase):
+    def setUp(self):
+        self.csv_dir = tempfile.mkdtemp()
+        self.ticker_list = ['SPY', 'IWM']
+        write_test_csv_dir(self.csv_dir, self.ticker_list, 50)
+        MatrixStrategy.signals = make_test_signals(50, 2)
+
+    def tearDown(self):
+        shutil.rmtree(self.csv_dir)
+
+    def test_run_stats(self):
+        reports = list()
+        backtest = Backtest(
+            self.csv_dir, self.ticker_list, 100000.0, 0, datetime(2000, 1, 1),
+            SimulatedBroker, SimulatedBroker, Portfolio, MatrixStrategy,
+            progress=lambda stats: reports.append(stats.bars), progress_interval=20,
+        )
+        stats = backtest._run_backtest()
+
+        self.assertIsInstance(stats, BacktestStats)
+        self.assertEqual(stats.bars, 50)
+        self.assertEqual(reports, [20, 40])
+        self.assertEqual(stats.events['SIGNAL'], backtest.signals)
+        self.assertEqual(stats.events['ORDER'], backtest.orders)
+        self.assertEqual(stats.events['FILL'], backtest.fills)
+        self.assertGreater(stats.bars_per_sec, 0)
+        self.assertGreater(stats.handler_time['strategy'], 0)
+        self.assertGreater(stats.handler_time['portfolio'], 0)
+        self.assertGreater(stats.handler_time['execution'], 0)
+        self.assertEqual(stats.as_dict()['events']['MARKET'], 50)
+
+    def test_running_stats(self):
+        backtest = Backtest(
+            self.csv_dir, self.ticker_list, 100000.0, 0, datetime(2000, 1, 1),
+            SimulatedBroker, SimulatedBroker, Portfolio, MatrixStrategy,
+        )
+        backtest._run_backtest()
+        running = backtest.portfolio.running_stats()
+        backtest.portfolio.create_equity_curve_dataframe()
+        summary = backtest.portfolio.summary_stats()
+
+        for k, v in summary.items():
+            self.assertAlmostEqual(running[k], v)
+        self.assertGreater(running['turnover'], 0)
+
+    def test_results_sink(self):
+        sink = ResultsSink(os.path.join(self.csv_dir, 'results.bin'))
+        for name in ('run_a', 'run_b'):
+            backtest = Backtest(
+                self.csv_dir, self.ticker_list, 100000.0, 0, datetime(2000, 1, 1),
+                SimulatedBroker, SimulatedBroker, Portfolio, [MatrixStrategy, MatrixStrategy],
+                results=sink, results_name=name,
+            )
+            results = backtest.simulate_trading()
+        sink.close()
+
+        written = read_results(sink.path)[2:]
+        self.assertEqual([r['name'] for r in read_results(sink.path)], ['run_a/strategy_0', 'run_a/strategy_1', 'run_b/strategy_0', 'run_b/strategy_1'])
+        self.assertAlmostEqual(written[0]['stats']['sharpe_ratio'], results['comparison']['sharpe_ratio'][0])
+        np.testing.assert_allclose(written[1]['equity']['total'], backtest.portfolios[1].equity_curve['total'])
+        self.assertEqual(len(written[0]['trades']), backtest.fills // 2)
+        self.assertEqual(list(written[0]['trades'].columns), ['ticker', 'direction', 'quantity', 'fill_cost', 'commission'])
+
+    def test_latency(self):
+        latency = LatencyRecorder()
+        hook = CProfileHook(10, 20)
+        backtest = Backtest(
+            self.csv_dir, self.ticker_list, 100000.0, 0, datetime(2000, 1, 1),
+            SimulatedBroker, SimulatedBroker, Portfolio, MatrixStrategy,
+            latency=latency, profile_hooks=[hook],
+        )
+        backtest._run_backtest()
+        summary = latency.summary()
+
+        self.assertEqual(summary['MARKET']['count'], 50)
+        self.assertEqual(summary['MARKET.strategy']['count'], 50)
+        self.assertEqual(summary['MARKET.portfolio']['count'], 50)
+        self.assertEqual(summary['ORDER.execution']['count'], backtest.orders)
+        self.assertEqual(summary['FILL.portfolio']['count'], backtest.fills)
+        self.assertGreaterEqual(summary['MARKET']['p99'], summary['MARKET']['p50'])
+        self.assertFalse(hook.active)
+
+        calls = [f for f in hook.stats().stats if f[2] == 'calculate_signals']
+        self.assertEqual(hook.stats().stats[calls[0]][1], 10)
+
+    def test_multiple_strategies(self):
+        variants = [make_test_signals(50, 2, seed=i) for i in range(3)]
+        backtest = Backtest(
+            self.csv_dir, self.ticker_list, 100000.0, 0, datetime(2000, 1, 1),
+            SimulatedBroker, SimulatedBroker, Portfolio, MatrixStrategy,
+            strategy_params=[{'signals': v} for v in variants],
+        )
+        stats = backtest._run_backtest()
+        comparison = backtest.compare()
+
+        self.assertEqual(backtest.num_strats, 3)
+        self.assertEqual(stats.bars, 50)
+        self.assertEqual(list(comparison.index), [0, 1, 2])
+        self.assertEqual(list(comparison['strategy']), ['MatrixStrategy'] * 3)
+
+        for i, signals in enumerate(variants):
+            single = Backtest(
+                self.csv_dir, self.ticker_list, 100000.0, 0, datetime(2000, 1, 1),
+                SimulatedBroker, SimulatedBroker, Portfolio, MatrixStrategy,
+                strategy_params={'signals': signals},
+            )
+            single._run_backtest()
+            single.portfolio.create_equity_curve_dataframe()
+            single_stats = single.portfolio.summary_stats()
+
+            pd.testing.assert_frame_equal(backtest.portfolios[i].equity_curve, single.portfolio.equity_curve)
+            self.assertEqual(comparison.loc[i, 'total_return'], single_stats['total_return'])
+
+    def test_checkpoint_resume(self):
+        def make_backtest(**kwargs):
+            return Backtest(
+                self.csv_dir, self.ticker_list, 100000.0, 0, datetime(2000, 1, 1),
+                SimulatedBroker, SimulatedBroker, Portfolio, MatrixStrategy, **kwargs
+            )
+
+        class Preempted(Exception):
+            pass
+
+        def preempt(stats):
+            raise Preempted
+
+        expected = make_backtest()
+        expected._run_backtest()
+        expected.portfolio.create_equity_curve_dataframe()
+
+        checkpoint_path = os.path.join(self.csv_dir, 'run.ckpt')
+        interrupted = make_backtest(checkpoint_path=checkpoint_path, checkpoint_interval=20, progress=preempt, progress_interval=30)
+        with self.assertRaises(Preempted):
+            interrupted._run_backtest()
+
+        resumed = make_backtest(checkpoint_path=checkpoint_path, checkpoint_interval=20)
+        resumed.resume()
+        self.assertEqual(resumed.data_handler.cursor, 20)
+
+        stats = resumed._run_backtest()
+        resumed.portfolio.create_equity_curve_dataframe()
+
+        self.assertEqual(stats.bars, 50)
+        self.assertEqual(resumed.fills, expected.fills)
+        pd.testing.assert_frame_equal(resumed.portfolio.equity_curve, expected.portfolio.equity_curve)
+
+    def test_strategy_param_mismatch(self):
+        with self.assertRaises(ValueError):
+            Backtest(
+                self.csv_dir, self.ticker_list, 100000.0, 0, datetime(2000, 1, 1),
+                SimulatedBroker, SimulatedBroker, Portfolio, [MatrixStrategy, MatrixStrategy],
+                strategy_params=[{}],
+            )
+
+
+class TestSignalsToPositions(unittest.TestCase):
+    def test_naive_order_rules(self):
+        nan = np.nan
+        signals = np.array([[nan, 1, 1, -1, 0, -1, nan, 1, 0, 0]]).T
+        positions = signals_to_positions(signals, quantity=10)
+
+        np.testing.assert_array_equal(positions[:, 0], [0, 10, 10, 10, 0, -10, -10, -10, 0, 0])
+
+
+class TestVectorizedBacktest(unittest.TestCase):
+    def setUp(self):
+        self.csv_dir = tempfile.mkdtemp()
+        self.ticker_list = ['SPY', 'IWM', 'QQQ']
+        self.num_bars = 60
+        write_test_csv_dir(self.csv_dir, self.ticker_list, self.num_bars)
+
+    def tearDown(self):
+        shutil.rmtree(self.csv_dir)
+
+    def test_matches_event_driven(self):
+        signals = make_test_signals(self.num_bars, len(self.ticker_list))
+        start_date = datetime(2000, 1, 1)
+
+        MatrixStrategy.signals = signals
+        backtest = Backtest(
+            self.csv_dir, self.ticker_list, 100000.0, 0, start_date,
+            SimulatedBroker, SimulatedBroker, Portfolio, MatrixStrategy,
+        )
+        backtest._run_backtest()
+        backtest.portfolio.create_equity_curve_dataframe()
+        expected = backtest.portfolio.equity_curve
+
+        vectorized = VectorizedBacktest(
+            backtest.data_handler.bar_store, MatrixVectorizedStrategy(signals), start_date
+        )
+        curve = vectorized.run()
+
+        self.assertGreater(backtest.fills, 0)
+        pd.testing.assert_frame_equal(curve, expected, check_dtype=False, check_index_type=False)
+
+    def test_commission(self):
+        store = SimulatedBroker(None, self.ticker_list, self.csv_dir).bar_store
+        positions = np.zeros((self.num_bars, len(self.ticker_list)))
+        positions[10:20, 0] = 5
+
+        curve = VectorizedBacktest(store, None, datetime(2000, 1, 1), commission=1.0).run(positions)
+
+        self.assertEqual(curve['commission'].iloc[-1], 10.0)
+        self.assertAlmostEqual(
+            curve['total'].iloc[-1],
+            100000.0 - 10.0 + 5 * (store.data['adj_close'][20, 0] - store.data['adj_close'][10, 0]),
+        )
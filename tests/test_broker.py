@@ -2,12 +2,18 @@ from unittest.mock import Mock
 from queue import Queue
 from datetime import datetime
 
+import os
+import shutil
+import tempfile
+import threading
+import time
 import unittest
 import pandas as pd
 import numpy as np
 
-from algo_trade.broker import TDABroker, SimulatedBroker
+from algo_trade.broker import OrderAck, OrderSubmissionError, TDABroker, SimulatedBroker, StreamingSimulatedBroker
 from algo_trade.event import FillEvent, OrderEvent
+from algo_trade.profiling import LatencyRecorder
 
 
 class TestSimulatedBroker(unittest.TestCase):
@@ -36,17 +42,15 @@ class TestSimulatedBroker(unittest.TestCase):
 
         # Instantiate test broker
         self.test_broker = SimulatedBroker(self.test_queue, ['SPY'])
-        self.test_broker.ticker_data['SPY'] = test_data
-        self.test_broker.ticker_generator['SPY'] = test_data.iterrows()
-        self.test_broker.latest_ticker_data['SPY'] = list()
+        self.test_broker.load_ticker_data({'SPY': test_data})
 
         # Update four bars into visible data
         for _ in range(4):
             self.test_broker.update_bars()
 
     def test_update_bars(self):
-        self.assertEqual(len(self.test_broker.latest_ticker_data['SPY']), 4)
-        print(self.test_broker.latest_ticker_data)
+        self.assertEqual(self.test_broker.cursor, 4)
+        self.assertEqual(len(self.test_broker.get_latest_bars('SPY', 10)), 4)
 
     def test_get_latest_bar(self):
         latest_bar = self.test_broker.get_latest_bar('SPY')
@@ -86,6 +90,20 @@ class TestSimulatedBroker(unittest.TestCase):
             )
         )
 
+    def test_get_latest_bars_values_view(self):
+        values = self.test_broker.get_latest_bars_values('SPY', 'adj_close', 3)
+        self.assertTrue(np.shares_memory(values, self.test_broker.bar_store.data['adj_close']))
+        self.assertFalse(values.flags.writeable)
+
+    def test_update_bars_end_of_data(self):
+        for _ in range(4):
+            self.test_broker.update_bars()
+        self.assertTrue(self.test_broker.continue_backtest)
+
+        self.test_broker.update_bars()
+        self.assertFalse(self.test_broker.continue_backtest)
+        self.assertEqual(self.test_broker.get_latest_bar_datetime('SPY'), datetime(1994,1,12))
+
     def test_execute_order(self):
         # Empty queue to test MarketEvent placement into queue
         while not self.test_queue.empty():
@@ -100,6 +118,85 @@ class TestSimulatedBroker(unittest.TestCase):
         self.assertEqual(output_fill.direction, self.test_fill.direction)
         self.assertEqual(output_fill.fill_cost, self.test_fill.fill_cost)
 
+class TestStreamingSimulatedBroker(unittest.TestCase):
+    def setUp(self):
+        self.csv_dir = tempfile.mkdtemp()
+
+        dates = pd.date_range('1994-01-03', periods=10)
+        self.spy_close = np.arange(10, dtype=float)
+        self.iwm_close = np.arange(100, 110, dtype=float)[::2]
+
+        for ticker, index, close in [('SPY', dates, self.spy_close), ('IWM', dates[::2], self.iwm_close)]:
+            pd.DataFrame(
+                {
+                    'Date': index,
+                    'Open': close,
+                    'High': close,
+                    'Low': close,
+                    'Close': close,
+                    'Volume': 1000,
+                    'Adj Close': close,
+                }
+            ).to_csv(os.path.join(self.csv_dir, '%s.csv' % ticker), index=False)
+
+        self.test_broker = StreamingSimulatedBroker(
+            Queue(), ['SPY', 'IWM'], self.csv_dir, lookback=3, chunksize=2
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.csv_dir)
+
+    def test_update_bars(self):
+        for i in range(10):
+            self.test_broker.update_bars()
+            self.assertTrue(self.test_broker.continue_backtest)
+            self.assertEqual(self.test_broker.get_latest_bar_value('SPY', 'adj_close'), self.spy_close[i])
+            self.assertEqual(self.test_broker.get_latest_bar_value('IWM', 'adj_close'), self.iwm_close[i // 2])
+            self.assertLessEqual(self.test_broker.cursor, self.test_broker.capacity)
+            self.assertEqual(len(self.test_broker.bar_store), self.test_broker.cursor)
+
+        self.assertEqual(self.test_broker.get_latest_bar_datetime('SPY'), datetime(1994,1,12))
+
+        self.test_broker.update_bars()
+        self.assertFalse(self.test_broker.continue_backtest)
+
+        # Only the bars held in the window are visible through the store
+        frame = self.test_broker.bar_store.to_frame('SPY')
+        self.assertEqual(len(frame), self.test_broker.cursor)
+        self.assertEqual(frame['adj_close'].iloc[-1], self.spy_close[-1])
+
+    def test_get_latest_bars_values(self):
+        for _ in range(7):
+            self.test_broker.update_bars()
+
+        self.assertTrue(
+            np.array_equal(
+                self.test_broker.get_latest_bars_values('SPY', 'adj_close', 3),
+                [4.0, 5.0, 6.0],
+            )
+        )
+        self.assertTrue(
+            np.array_equal(
+                self.test_broker.get_latest_bars_values('IWM', 'close', 3),
+                [104.0, 104.0, 106.0],
+            )
+        )
+
+    def test_restore_state(self):
+        for _ in range(7):
+            self.test_broker.update_bars()
+        state = self.test_broker.checkpoint_state()
+
+        events = Queue()
+        restored = StreamingSimulatedBroker(events, ['SPY', 'IWM'], self.csv_dir, lookback=3, chunksize=2)
+        restored.restore_state(state)
+
+        self.assertTrue(events.empty())
+        np.testing.assert_array_equal(restored.get_latest_bars_values('SPY', 'adj_close', 3), [4.0, 5.0, 6.0])
+
+        restored.update_bars()
+        self.assertEqual(restored.get_latest_bar_value('SPY', 'adj_close'), 7.0)
+
 class TestTDABroker(unittest.TestCase):
     def setUp(self):
         self.test_queue = Queue()
@@ -126,4 +223,214 @@ class TestTDABroker(unittest.TestCase):
         self.assertEqual(OrderEvent('IWM', 100, 'BUY', 'MARKET'), self.test_queue.get())
 
         self.test_handler.rebalance(10000, self.price, self.state3, self.state1)
-        self.assertEqual(OrderEvent('IWM', 100, 'SELL', 'MARKET'), self.test_queue.get())
\ No newline at end of file
+        self.assertEqual(OrderEvent('IWM', 100, 'SELL', 'MARKET'), self.test_queue.get())
+
+class FakePriceClient(object):
+    '''
+    Local stand-in for the TDA client returning canned price history, optionally failing the first requests of some tickers.
+    '''
+    def __init__(self, candles, failures=None, delay=0):
+        self.candles = candles
+        self.failures = dict(failures or {})
+        self.delay = delay
+        self.calls = list()
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def get_price_history(self, ticker, **kwargs):
+        with self.lock:
+            self.calls.append((ticker, kwargs))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+
+        try:
+            time.sleep(self.delay)
+            with self.lock:
+                if self.failures.get(ticker, 0) > 0:
+                    self.failures[ticker] -= 1
+                    raise ConnectionError('Simulated network failure')
+            return Mock(json=Mock(return_value={'candles': self.candles[ticker]}))
+        finally:
+            with self.lock:
+                self.active -= 1
+
+class FakeRangeClient(object):
+    '''
+    Local stand-in for the TDA client serving one daily candle per day, restricted to any requested start and end datetimes.
+    '''
+    def __init__(self):
+        self.calls = list()
+
+    def get_price_history(self, ticker, **kwargs):
+        self.calls.append((ticker, kwargs))
+
+        end = pd.Timestamp(kwargs.get('end_datetime') or pd.Timestamp.utcnow().tz_localize(None))
+        start = pd.Timestamp(kwargs.get('start_datetime') or end - pd.DateOffset(years=1))
+
+        days = pd.date_range(start.ceil('D'), end, freq='D')
+        candles = [
+            {'datetime': int(d.value // 10**6), 'open': 1.0, 'high': 1.0, 'low': 1.0, 'close': float(d.day), 'volume': 1}
+            for d in days
+        ]
+        return Mock(json=Mock(return_value={'candles': candles}))
+
+class TestTDABrokerData(unittest.TestCase):
+    def setUp(self):
+        day = 86400000
+        candles = {
+            'SPY': [
+                {'datetime': i * day, 'open': i, 'high': i, 'low': i, 'close': 10.0 + i, 'volume': 100}
+                for i in range(4)
+            ],
+            'IWM': [
+                {'datetime': i * day, 'open': i, 'high': i, 'low': i, 'close': 20.0 + i, 'volume': 100}
+                for i in [1, 3, 4]
+            ],
+        }
+        self.test_client = FakePriceClient(candles)
+        self.test_handler = TDABroker(self.test_client, None, Queue(), ['SPY', 'IWM'])
+
+    def test_get_data(self):
+        ticker_data = self.test_handler.get_data()
+        store = self.test_handler.bar_store
+
+        self.assertEqual(len(store), 5)
+        self.assertEqual(store.index[-1], datetime(1970, 1, 5))
+        self.assertTrue(np.array_equal(ticker_data['SPY']['close'], [10.0, 11.0, 12.0, 13.0, 13.0]))
+        self.assertTrue(np.array_equal(ticker_data['IWM']['close'][1:], [21.0, 21.0, 23.0, 24.0]))
+        self.assertTrue(np.isnan(ticker_data['IWM']['close'][0]))
+        self.assertTrue(np.array_equal(store.filled[:, 1], [True, False, True, False, False]))
+        self.assertEqual(self.test_client.calls[0][1]['frequency'], 1)
+
+    def test_get_data_concurrent(self):
+        day = 86400000
+        ticker_list = ['T%d' % i for i in range(8)]
+        candles = dict(
+            (t, [{'datetime': day, 'open': i, 'high': i, 'low': i, 'close': i, 'volume': 1}])
+            for i, t in enumerate(ticker_list)
+        )
+        test_client = FakePriceClient(candles, failures={'T3': 1}, delay=0.02)
+        test_handler = TDABroker(test_client, None, Queue(), ticker_list, max_workers=4, retries=1)
+        test_handler.retry_backoff = 0
+
+        ticker_data = test_handler.get_data()
+
+        self.assertEqual(len(test_client.calls), 9)
+        self.assertGreater(test_client.max_active, 1)
+        self.assertLessEqual(test_client.max_active, 4)
+        self.assertEqual(list(ticker_data), ticker_list)
+        self.assertEqual(ticker_data['T3']['close'][0], 3.0)
+
+    def test_get_data_retries_exhausted(self):
+        test_client = FakePriceClient(self.test_client.candles, failures={'IWM': 2})
+        test_handler = TDABroker(test_client, None, Queue(), ['SPY', 'IWM'], retries=1)
+        test_handler.retry_backoff = 0
+
+        self.assertRaises(ConnectionError, test_handler.get_data)
+
+    def test_get_data_candle_store(self):
+        candle_dir = tempfile.mkdtemp()
+        test_client = FakeRangeClient()
+        start, end = datetime(2020, 1, 1), datetime(2020, 2, 1)
+
+        try:
+            test_handler = TDABroker(test_client, None, Queue(), ['SPY'], candle_dir=candle_dir)
+            test_handler._period_range = Mock(return_value=(start, end))
+            first = test_handler.get_data(period_type='month', period=1)
+
+            self.assertEqual(len(test_client.calls), 1)
+            self.assertEqual(test_client.calls[0][1]['start_datetime'], start)
+            self.assertEqual(len(first['SPY']), 32)
+
+            # A day later only the new day is requested
+            test_handler._period_range = Mock(return_value=(datetime(2020, 1, 2), datetime(2020, 2, 2)))
+            second = test_handler.get_data(period_type='month', period=1)
+
+            self.assertEqual(len(test_client.calls), 2)
+            self.assertEqual(test_client.calls[1][1]['start_datetime'], end)
+            self.assertEqual(test_client.calls[1][1]['end_datetime'], datetime(2020, 2, 2))
+            self.assertEqual(len(second['SPY']), 32)
+            self.assertEqual(second['SPY'].index[-1], datetime(2020, 2, 2))
+            self.assertEqual(len(os.listdir(candle_dir)), 1)
+        finally:
+            shutil.rmtree(candle_dir)
+
+
+class FakeOrderClient(object):
+    '''
+    Local stand-in for the TDA client that takes a fixed time to accept each order.
+    '''
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.orders = list()
+        self.lock = threading.Lock()
+
+    def place_order(self, acc_id, order_spec):
+        time.sleep(self.delay)
+        with self.lock:
+            self.orders.append((acc_id, order_spec))
+            return len(self.orders)
+
+class TestTDABrokerOrders(unittest.TestCase):
+    def setUp(self):
+        self.test_client = FakeOrderClient()
+        self.test_orders = [OrderEvent('T%d' % i, 10, 'BUY' if i % 2 else 'SELL', 'MARKET') for i in range(20)]
+
+    def test_execute_order_sync(self):
+        test_handler = TDABroker(self.test_client, 'ACC', Queue(), None)
+        ack = test_handler.execute_order(self.test_orders[0])
+
+        self.assertIsInstance(ack, OrderAck)
+        self.assertEqual(ack.order, self.test_orders[0])
+        self.assertEqual(ack.response, 1)
+        self.assertGreaterEqual(ack.latency, self.test_client.delay)
+
+    def test_execute_order_async(self):
+        test_handler = TDABroker(self.test_client, 'ACC', Queue(), None, max_workers=10, async_orders=True)
+
+        start = time.perf_counter()
+        futures = [test_handler.execute_order(o) for o in self.test_orders]
+        self.assertLess(time.perf_counter() - start, self.test_client.delay)
+
+        acks = test_handler.wait_orders()
+        self.assertLess(time.perf_counter() - start, 10 * self.test_client.delay)
+        self.assertEqual([a.order for a in acks], self.test_orders)
+        self.assertEqual([f.result() for f in futures], acks)
+        self.assertEqual(len(self.test_client.orders), 20)
+        self.assertEqual(test_handler.wait_orders(), [])
+
+    def test_latency(self):
+        latency = LatencyRecorder(threadsafe=True)
+        test_handler = TDABroker(self.test_client, 'ACC', Queue(), None, max_workers=10, async_orders=True, latency=latency)
+        for o in self.test_orders:
+            test_handler.execute_order(o)
+        test_handler.wait_orders()
+
+        summary = latency.summary()
+        self.assertEqual(summary['order.BUY']['count'], 10)
+        self.assertEqual(summary['order.SELL']['count'], 10)
+        self.assertGreaterEqual(summary['order.BUY']['p99'], self.test_client.delay)
+
+    def test_invalid_order(self):
+        test_handler = TDABroker(self.test_client, 'ACC', Queue(), None, async_orders=True)
+        test_handler.execute_order(OrderEvent('SPY', 10, 'BUY', 'LIMIT'))
+
+        self.assertRaises(Exception, test_handler.wait_orders)
+
+    def test_partial_failure(self):
+        invalid = OrderEvent('SPY', 10, 'BUY', 'LIMIT')
+        with TDABroker(self.test_client, 'ACC', Queue(), None, max_workers=4, async_orders=True) as test_handler:
+            for o in [self.test_orders[0], invalid] + self.test_orders[1:]:
+                test_handler.execute_order(o)
+
+            # The orders placed after the failed one are still acknowledged
+            with self.assertRaises(OrderSubmissionError) as cm:
+                test_handler.wait_orders()
+
+        self.assertIsNone(test_handler.order_pool)
+        self.assertEqual(len(cm.exception.acks), 21)
+        self.assertIsNone(cm.exception.acks[1])
+        self.assertEqual([a.order for a in cm.exception.acks if a is not None], self.test_orders)
+        self.assertEqual([e for e, _ in cm.exception.errors], [invalid])
+        self.assertEqual(len(self.test_client.orders), 20)
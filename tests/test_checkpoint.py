@@ -0,0 +1,67 @@
+from datetime import datetime
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from algo_trade.checkpoint import Checkpointer, dumps_checkpoint, load_checkpoint, loads_checkpoint
+from algo_trade.event import EventType, MarketEvent, SignalEvent
+
+
+class TestCheckpointFormat(unittest.TestCase):
+    def setUp(self):
+        self.state = {
+            'data_handler': {'cursor': 3, 'continue_backtest': True},
+            'events': [MarketEvent(), SignalEvent(1, 'SPY', datetime(2000, 1, 3), 'LONG', 1.0)],
+            'counts': {EventType.MARKET: 3},
+        }
+
+    def test_round_trip(self):
+        for compress in (True, False):
+            state = loads_checkpoint(dumps_checkpoint(self.state, compress))
+
+            self.assertEqual(state['data_handler'], self.state['data_handler'])
+            self.assertEqual(state['counts'], {EventType.MARKET: 3})
+            self.assertIs(state['events'][0].type, EventType.MARKET)
+            self.assertEqual(state['events'][1].strategy_id, 1)
+            self.assertEqual(state['events'][1].ticker, 'SPY')
+
+    def test_bad_header(self):
+        with self.assertRaises(ValueError):
+            loads_checkpoint(b'XXXX' + dumps_checkpoint(self.state)[4:])
+
+
+class TestCheckpointer(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'run.ckpt')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_save(self):
+        checkpointer = Checkpointer(self.path)
+        self.assertTrue(checkpointer.save({'cursor': 1}))
+        checkpointer.wait()
+        self.assertTrue(checkpointer.save({'cursor': 2}))
+        checkpointer.close()
+
+        self.assertEqual(load_checkpoint(self.path), {'cursor': 2})
+        self.assertEqual(checkpointer.written, 2)
+        self.assertEqual(os.listdir(self.tmp_dir), ['run.ckpt'])
+
+    def test_skip_while_busy(self):
+        release = threading.Event()
+        checkpointer = Checkpointer(self.path)
+        write = checkpointer._write
+        checkpointer._write = lambda state: (release.wait(), write(state))
+
+        self.assertTrue(checkpointer.save({'cursor': 1}))
+        self.assertTrue(checkpointer.busy)
+        self.assertFalse(checkpointer.save({'cursor': 2}))
+
+        release.set()
+        checkpointer.close()
+        self.assertEqual(load_checkpoint(self.path), {'cursor': 1})
@@ -0,0 +1,274 @@
+from queue import Queue
+
+import numpy as np
+import os
+import pandas as pd
+import shutil
+import tempfile
+import unittest
+
+from algo_trade.broker import SimulatedBroker
+from algo_trade.data import BarStore, CandleStore, CSVCache, align_bars, generate_bars, read_bar_csv, write_bar_csv
+
+
+def write_test_csv(path, dates, closes):
+    pd.DataFrame(
+        {
+            'Date': dates,
+            'Open': closes,
+            'High': closes,
+            'Low': closes,
+            'Close': closes,
+            'Volume': [1000] * len(closes),
+            'Adj Close': closes,
+        }
+    ).to_csv(path, index=False)
+
+
+class TestAlignBars(unittest.TestCase):
+    def test_union_calendar(self):
+        indexes = [
+            np.array(['2000-01-02', '2000-01-04'], dtype='datetime64[D]'),
+            np.array(['2000-01-01', '2000-01-03', '2000-01-04'], dtype='datetime64[D]'),
+            np.array(['2000-01-05'], dtype='datetime64[D]'),
+        ]
+        values = [
+            np.array([[1.0, -1.0], [2.0, -2.0]]),
+            np.array([[10.0, -10.0], [30.0, -30.0], [40.0, -40.0]]),
+            np.array([[500.0, -500.0]]),
+        ]
+        calendar, panels, filled = align_bars(indexes, values)
+
+        self.assertEqual(len(calendar), 5)
+        self.assertEqual(calendar[0], np.datetime64('2000-01-01'))
+        self.assertEqual(len(panels), 2)
+
+        nan = np.nan
+        expected = np.array([
+            [nan, 10.0, nan],
+            [1.0, 10.0, nan],
+            [1.0, 30.0, nan],
+            [2.0, 40.0, nan],
+            [2.0, 40.0, 500.0],
+        ])
+        np.testing.assert_array_equal(panels[0], expected)
+        np.testing.assert_array_equal(panels[1], -expected)
+        np.testing.assert_array_equal(filled, [
+            [True, False, True],
+            [False, True, True],
+            [True, False, True],
+            [False, False, True],
+            [True, True, False],
+        ])
+
+
+class TestBarStore(unittest.TestCase):
+    def setUp(self):
+        self.spy = pd.DataFrame(
+            {'adj_close': [1.0, 2.0, 3.0, 4.0]},
+            index=pd.to_datetime(['1994-01-03', '1994-01-04', '1994-01-05', '1994-01-06']),
+        )
+        self.iwm = pd.DataFrame(
+            {'adj_close': [10.0, 30.0]},
+            index=pd.to_datetime(['1994-01-04', '1994-01-05']),
+        )
+
+    def test_from_frames(self):
+        store = BarStore.from_frames({'SPY': self.spy, 'IWM': self.iwm})
+
+        self.assertEqual(len(store), 4)
+        self.assertEqual(store.ticker_list, ['SPY', 'IWM'])
+        self.assertEqual(store.data['adj_close'].shape, (4, 2))
+        self.assertTrue(np.array_equal(store.data['adj_close'][:, 0], [1.0, 2.0, 3.0, 4.0]))
+        self.assertTrue(np.array_equal(store.data['adj_close'][1:, 1], [10.0, 30.0, 30.0]))
+        self.assertTrue(np.isnan(store.data['adj_close'][0, 1]))
+
+    def test_publish_attach(self):
+        store = BarStore.from_frames({'SPY': self.spy, 'IWM': self.iwm})
+        tmp_dir = tempfile.mkdtemp()
+        path = os.path.join(tmp_dir, 'panel')
+
+        try:
+            store.publish(path)
+            attached = BarStore.attach(path)
+
+            self.assertTrue(attached.index.equals(store.index))
+            self.assertEqual(attached.ticker_list, store.ticker_list)
+            self.assertIsInstance(attached.data['adj_close'], np.memmap)
+            self.assertFalse(attached.data['adj_close'].flags.writeable)
+            np.testing.assert_array_equal(attached.data['adj_close'], store.data['adj_close'])
+            np.testing.assert_array_equal(attached.filled, store.filled)
+
+            broker = SimulatedBroker(Queue(), ['IWM'], bar_store=attached)
+            broker.update_bars()
+            broker.update_bars()
+            self.assertEqual(broker.get_latest_bar_value('IWM', 'adj_close'), 10.0)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+    def test_to_frame(self):
+        store = BarStore.from_frames({'SPY': self.spy, 'IWM': self.iwm})
+        pd.testing.assert_frame_equal(store.to_frame('SPY'), self.spy, check_freq=False)
+
+    def test_slice(self):
+        store = BarStore.from_frames({'SPY': self.spy, 'IWM': self.iwm})
+        window = store.slice(1, 3)
+
+        self.assertEqual(len(window), 2)
+        self.assertEqual(list(window.index), list(store.index[1:3]))
+        np.testing.assert_array_equal(window.data['adj_close'], [[2.0, 10.0], [3.0, 30.0]])
+        self.assertTrue(np.shares_memory(window.data['adj_close'], store.data['adj_close']))
+
+
+class TestGenerateBars(unittest.TestCase):
+    def test_deterministic(self):
+        bars = generate_bars(['SPY', 'IWM'], 100, seed=1)
+
+        pd.testing.assert_frame_equal(bars['SPY'], generate_bars(['SPY', 'IWM'], 100, seed=1)['SPY'])
+        self.assertFalse(bars['SPY'].equals(generate_bars(['SPY', 'IWM'], 100, seed=2)['SPY']))
+        self.assertEqual(len(bars['IWM']), 100)
+        self.assertTrue((bars['SPY']['high'] >= bars['SPY'][['open', 'close']].max(axis=1)).all())
+        self.assertTrue((bars['SPY']['low'] <= bars['SPY'][['open', 'close']].min(axis=1)).all())
+
+    def test_write_bar_csv(self):
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            bars = generate_bars(['SPY'], 10)
+            write_bar_csv(bars, tmp_dir)
+            index, values, fields = read_bar_csv(os.path.join(tmp_dir, 'SPY.csv'))
+
+            np.testing.assert_array_equal(index, bars['SPY'].index.values)
+            np.testing.assert_allclose(values, bars['SPY'][fields].values)
+        finally:
+            shutil.rmtree(tmp_dir)
+
+
+class TestCSVCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.csv_dir = os.path.join(self.tmp_dir, 'csv')
+        self.cache_dir = os.path.join(self.tmp_dir, 'cache')
+        os.makedirs(self.csv_dir)
+
+        self.spy_path = os.path.join(self.csv_dir, 'SPY.csv')
+        write_test_csv(self.spy_path, ['1994-01-04', '1994-01-03', '1994-01-05'], [2.0, 1.0, 3.0])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_read_bar_csv(self):
+        index, values, fields = read_bar_csv(self.spy_path)
+
+        self.assertEqual(fields, ['open', 'high', 'low', 'close', 'volume', 'adj_close'])
+        self.assertEqual(values.shape, (3, 6))
+        self.assertTrue(np.array_equal(values[:, -1], [1.0, 2.0, 3.0]))
+        self.assertEqual(index[0], np.datetime64('1994-01-03'))
+
+    def test_read_miss_then_hit(self):
+        cache = CSVCache(self.cache_dir)
+        self.assertIsNone(cache.load(self.spy_path))
+
+        index, values, fields = cache.read(self.spy_path)
+        cached_index, cached_values, cached_fields = cache.load(self.spy_path)
+
+        self.assertIsInstance(cached_values, np.memmap)
+        self.assertTrue(np.array_equal(cached_index, index))
+        self.assertTrue(np.array_equal(cached_values, values))
+        self.assertEqual(cached_fields, fields)
+
+    def test_invalidate_on_change(self):
+        cache = CSVCache(self.cache_dir)
+        cache.read(self.spy_path)
+
+        write_test_csv(self.spy_path, ['1994-01-03', '1994-01-04'], [5.0, 6.0])
+        os.utime(self.spy_path, ns=(0, 0))
+        self.assertIsNone(cache.load(self.spy_path))
+
+        _, values, _ = cache.read(self.spy_path)
+        self.assertTrue(np.array_equal(values[:, -1], [5.0, 6.0]))
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+
+    def test_simulated_broker_cache(self):
+        SimulatedBroker(Queue(), ['SPY'], self.csv_dir, cache_dir=self.cache_dir)
+        broker = SimulatedBroker(Queue(), ['SPY'], self.csv_dir, cache_dir=self.cache_dir)
+        broker.update_bars()
+
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        self.assertEqual(broker.get_latest_bar_value('SPY', 'adj_close'), 1.0)
+
+
+class TestParallelLoading(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.ticker_list = ['T%d' % i for i in range(6)]
+
+        for i, t in enumerate(self.ticker_list):
+            closes = [float(i * 10 + j) for j in range(5)]
+            dates = ['1994-01-%02d' % (j + 3) for j in range(5)]
+            write_test_csv(os.path.join(self.tmp_dir, '%s.csv' % t), dates, closes)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_workers_match_serial(self):
+        serial = SimulatedBroker(Queue(), self.ticker_list, self.tmp_dir)
+        parallel = SimulatedBroker(Queue(), self.ticker_list, self.tmp_dir, workers=2)
+
+        self.assertTrue(serial.bar_store.index.equals(parallel.bar_store.index))
+        for f in serial.bar_store.fields:
+            self.assertTrue(np.array_equal(serial.bar_store.data[f], parallel.bar_store.data[f]))
+
+    def test_workers_with_cache(self):
+        cache_dir = os.path.join(self.tmp_dir, 'cache')
+        SimulatedBroker(Queue(), self.ticker_list, self.tmp_dir, cache_dir=cache_dir, workers=2)
+        self.assertEqual(len(os.listdir(cache_dir)), len(self.ticker_list))
+
+        broker = SimulatedBroker(Queue(), self.ticker_list, self.tmp_dir, cache_dir=cache_dir, workers=2)
+        self.assertTrue(np.array_equal(broker.bar_store.data['adj_close'][0], [0.0, 10.0, 20.0, 30.0, 40.0, 50.0]))
+
+
+class TestCandleStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store = CandleStore(self.tmp_dir)
+        self.fields = ['open', 'high', 'low', 'close']
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def make_bars(self, start, days, offset=0.0):
+        index = np.datetime64(start, 'ms') + np.arange(days) * np.timedelta64(1, 'D')
+        values = np.repeat(np.arange(days, dtype=float)[:, None] + offset, 4, axis=1)
+        return index, values
+
+    def test_missing_ranges(self):
+        start, end = np.datetime64('2020-01-01', 'ms'), np.datetime64('2020-01-10', 'ms')
+        self.assertEqual(self.store.missing_ranges('SPY', 'daily-1', start, end), [(start, end)])
+
+        index, values = self.make_bars('2020-01-03', 3)
+        self.store.merge('SPY', 'daily-1', index, values, self.fields, '2020-01-03', '2020-01-05')
+
+        self.assertEqual(
+            self.store.missing_ranges('SPY', 'daily-1', start, end),
+            [(start, np.datetime64('2020-01-03', 'ms')), (np.datetime64('2020-01-05', 'ms'), end)],
+        )
+        self.assertEqual(self.store.missing_ranges('SPY', 'daily-1', '2020-01-04', '2020-01-05'), [])
+        self.assertEqual(len(self.store.missing_ranges('SPY', 'minute-1', start, end)), 1)
+
+    def test_merge_and_read(self):
+        index, values = self.make_bars('2020-01-01', 5)
+        self.store.merge('SPY', 'daily-1', index, values, self.fields, '2020-01-01', '2020-01-05')
+
+        # Overlapping download refreshes the last stored bar
+        index, values = self.make_bars('2020-01-05', 3, offset=100.0)
+        self.store.merge('SPY', 'daily-1', index, values, self.fields, '2020-01-05', '2020-01-07')
+
+        stored_index, stored_values, fields, covered = self.store.load('SPY', 'daily-1')
+        self.assertEqual(len(stored_index), 7)
+        self.assertEqual(fields, self.fields)
+        self.assertEqual(covered[1], np.datetime64('2020-01-07', 'ms'))
+        np.testing.assert_array_equal(stored_values[:, 3], [0, 1, 2, 3, 100, 101, 102])
+
+        read_index, read_values = self.store.read('SPY', 'daily-1', '2020-01-02', '2020-01-05')
+        self.assertEqual(len(read_index), 4)
+        np.testing.assert_array_equal(read_values[:, 0], [1, 2, 3, 100])
@@ -1,7 +1,7 @@
 import unittest
 import pandas as pd
 
-from algo_trade.event import OrderEvent
+from algo_trade.event import EventQueue, EventType, FillEvent, MarketEvent, OrderEvent, SignalEvent
 
 
 class TestOrderEvent(unittest.TestCase):
@@ -13,4 +13,79 @@ class TestOrderEvent(unittest.TestCase):
     def test_order(self):
         self.assertEqual(self.order1, self.order2)
         self.assertNotEqual(self.order1, self.order3)
-        self.assertNotEqual(self.order2, self.order3)
\ No newline at end of file
+        self.assertNotEqual(self.order2, self.order3)
+
+    def test_type(self):
+        self.assertIs(self.order1.type, EventType.ORDER)
+        self.assertEqual(self.order1.type, 'ORDER')
+
+
+class TestEventTypes(unittest.TestCase):
+    def test_slots(self):
+        signal = SignalEvent(0, 'SPY', None, 'LONG', 1.0)
+
+        self.assertFalse(hasattr(MarketEvent(), '__dict__'))
+        self.assertFalse(hasattr(signal, '__dict__'))
+        self.assertIs(signal.type, EventType.SIGNAL)
+        self.assertEqual(MarketEvent().type, 'MARKET')
+
+
+class TestEventQueue(unittest.TestCase):
+    def setUp(self):
+        self.test_queue = EventQueue()
+        self.handled = list()
+
+    def test_queue_interface(self):
+        self.assertTrue(self.test_queue.empty())
+        self.test_queue.put(MarketEvent())
+        self.test_queue.put(None)
+
+        self.assertEqual(self.test_queue.qsize(), 2)
+        self.assertIsInstance(self.test_queue.get(), MarketEvent)
+        self.assertIsNone(self.test_queue.get())
+        self.assertRaises(Exception, self.test_queue.get, False)
+
+    def test_dispatch(self):
+        order = OrderEvent('SPY', 10, 'BUY', 'MARKET')
+
+        def on_market(event):
+            self.handled.append('market1')
+            self.test_queue.put(order)
+            self.test_queue.put(None)
+
+        self.test_queue.subscribe(EventType.MARKET, on_market)
+        self.test_queue.subscribe('MARKET', lambda e: self.handled.append('market2'))
+        self.test_queue.subscribe(EventType.ORDER, lambda e: self.handled.append(e))
+
+        self.test_queue.put(MarketEvent())
+        self.test_queue.dispatch()
+
+        self.assertEqual(self.handled, ['market1', 'market2', order])
+        self.assertTrue(self.test_queue.empty())
+        self.assertEqual(self.test_queue.counts[EventType.MARKET], 1)
+        self.assertEqual(self.test_queue.counts['ORDER'], 1)
+        self.assertEqual(self.test_queue.counts[EventType.FILL], 0)
+
+    def test_dispatch_batch(self):
+        signals = [SignalEvent(0, t, None, 'LONG', 1.0) for t in ('SPY', 'IWM', 'QQQ')]
+
+        def on_market(event):
+            self.test_queue.put(signals[0])
+            self.test_queue.put(signals[1])
+
+        def on_signals(batch):
+            self.handled.append(list(batch))
+            self.test_queue.put(OrderEvent(batch[0].ticker, 10, 'BUY', 'MARKET'))
+            if len(self.handled) == 3:
+                self.test_queue.put(signals[2])
+
+        self.test_queue.subscribe(EventType.MARKET, on_market)
+        self.test_queue.subscribe(EventType.SIGNAL, lambda e: self.handled.append(e.ticker))
+        self.test_queue.subscribe_batch(EventType.SIGNAL, on_signals)
+
+        self.test_queue.put(MarketEvent())
+        self.test_queue.dispatch()
+
+        self.assertEqual(self.handled, ['SPY', 'IWM', signals[:2], 'QQQ', [signals[2]]])
+        self.assertEqual(self.test_queue.counts[EventType.SIGNAL], 3)
+        self.assertEqual(self.test_queue.counts[EventType.ORDER], 2)
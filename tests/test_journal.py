@@ -0,0 +1,124 @@
+from datetime import datetime
+
+import os
+import pandas as pd
+import shutil
+import tempfile
+import unittest
+
+from algo_trade.backtest import Backtest
+from algo_trade.broker import SimulatedBroker
+from algo_trade.event import EventQueue, EventType, OrderEvent
+from algo_trade.journal import EventJournal, JournalReplay, read_journal
+from algo_trade.portfolio import Portfolio
+from backtest_helpers import MatrixStrategy, make_test_signals, write_test_csv_dir
+
+
+class TestEventJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.ticker_list = ['SPY', 'IWM']
+        self.start_date = datetime(2000, 1, 1)
+        self.journal_path = os.path.join(self.tmp_dir, 'events.journal')
+        write_test_csv_dir(self.tmp_dir, self.ticker_list, 50)
+        MatrixStrategy.signals = make_test_signals(50, 2)
+
+        self.backtest = Backtest(
+            self.tmp_dir, self.ticker_list, 100000.0, 0, self.start_date,
+            SimulatedBroker, SimulatedBroker, Portfolio, MatrixStrategy,
+            journal_path=self.journal_path,
+        )
+        self.backtest._run_backtest()
+        self.backtest.portfolio.create_equity_curve_dataframe()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_records(self):
+        meta, records = read_journal(self.journal_path)
+        events = [e for e, _ in records]
+
+        self.assertEqual(meta, {'ticker_list': self.ticker_list, 'fields': self.backtest.data_handler.bar_store.fields})
+        for event_type in EventType:
+            self.assertEqual(sum(e.type is event_type for e in events), self.backtest.events.counts[event_type])
+
+        store = self.backtest.data_handler.bar_store
+        timestamp, values = records[0][1]
+        self.assertEqual(pd.Timestamp(timestamp), store.index[0])
+        self.assertEqual(values[1, store.fields.index('adj_close')], store.data['adj_close'][0, 1])
+
+    def test_replay_portfolio(self):
+        replay = JournalReplay(self.journal_path)
+        portfolio = Portfolio(replay.bars, replay.events, self.start_date, 100000.0)
+        generated = replay.run(portfolio=portfolio)
+        portfolio.create_equity_curve_dataframe()
+
+        recorded_orders = [e for e, _ in replay.records if e.type is EventType.ORDER]
+        self.assertEqual(generated, recorded_orders)
+        pd.testing.assert_frame_equal(portfolio.equity_curve, self.backtest.portfolio.equity_curve)
+
+    def test_replay_strategy(self):
+        replay = JournalReplay(self.journal_path)
+        generated = replay.run(strategy=MatrixStrategy(replay.bars, replay.events))
+
+        recorded = [e for e, _ in replay.records if e.type is EventType.SIGNAL]
+        self.assertEqual(
+            [(e.ticker, e.signal_type, e.strength) for e in generated],
+            [(e.ticker, e.signal_type, e.strength) for e in recorded],
+        )
+
+    def test_append(self):
+        bars = SimulatedBroker(EventQueue(), self.ticker_list, self.tmp_dir)
+        journal = EventJournal(self.journal_path, bars)
+        journal.record(OrderEvent('SPY', 10, 'BUY', 'LIMIT', 101.5, strategy_id=3))
+        journal.close()
+
+        _, records = read_journal(self.journal_path)
+        self.assertEqual(records[-1][0], OrderEvent('SPY', 10, 'BUY', 'LIMIT', 101.5, strategy_id=3))
+
+        with self.assertRaises(ValueError):
+            EventJournal(self.journal_path, bars, fields=['adj_close'])
+
+    def test_checkpoint_resume(self):
+        def make_backtest(**kwargs):
+            return Backtest(
+                self.tmp_dir, self.ticker_list, 100000.0, 0, self.start_date,
+                SimulatedBroker, SimulatedBroker, Portfolio, MatrixStrategy,
+                journal_path=journal_path, checkpoint_path=checkpoint_path, checkpoint_interval=20, **kwargs
+            )
+
+        class Preempted(Exception):
+            pass
+
+        def preempt(stats):
+            raise Preempted
+
+        journal_path = os.path.join(self.tmp_dir, 'resumed.journal')
+        checkpoint_path = os.path.join(self.tmp_dir, 'run.ckpt')
+        expected_records = read_journal(self.journal_path)[1]
+
+        # Resume on a new engine, then again on the same engine after a second preemption
+        interrupted = make_backtest(progress=preempt, progress_interval=30)
+        with self.assertRaises(Preempted):
+            interrupted._run_backtest()
+
+        resumed = make_backtest(progress=preempt, progress_interval=45)
+        resumed.resume()
+        with self.assertRaises(Preempted):
+            resumed._run_backtest()
+
+        resumed.progress = None
+        resumed.resume()
+        resumed._run_backtest()
+        resumed.portfolio.create_equity_curve_dataframe()
+
+        _, records = read_journal(journal_path)
+        self.assertEqual(sum(e.type is EventType.MARKET for e, _ in records), 50)
+        self.assertEqual([e.type for e, _ in records], [e.type for e, _ in expected_records])
+        self.assertEqual([e for e, _ in records if e.type is EventType.ORDER], [e for e, _ in expected_records if e.type is EventType.ORDER])
+
+        replay = JournalReplay(journal_path)
+        portfolio = Portfolio(replay.bars, replay.events, self.start_date, 100000.0)
+        replay.run(portfolio=portfolio)
+        portfolio.create_equity_curve_dataframe()
+        pd.testing.assert_frame_equal(portfolio.equity_curve, self.backtest.portfolio.equity_curve)
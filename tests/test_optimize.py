@@ -0,0 +1,162 @@
+from datetime import datetime
+
+import json
+import numpy as np
+import os
+import pandas as pd
+import shutil
+import tempfile
+import unittest
+
+from algo_trade.data import BarStore
+from algo_trade.event import SignalEvent
+from algo_trade.optimize import ParameterSweep, WalkForward, optimize_window, parameter_grid, run_backtest
+from algo_trade.strategy import Strategy
+
+
+def make_test_store(num_bars=80, ticker_list=('SPY', 'IWM'), seed=0):
+    rng = np.random.RandomState(seed)
+    index = pd.bdate_range('2000-01-03', periods=num_bars)
+    close = 100.0 * np.cumprod(1.0 + rng.normal(0.0, 0.01, (num_bars, len(ticker_list))), axis=0)
+    return BarStore(index, list(ticker_list), {'adj_close': close})
+
+class MovingAverageStrategy(Strategy):
+    '''
+    Goes long when the price is above its moving average and exits below it.
+    '''
+    def __init__(self, bars, events, window=5):
+        self.bars = bars
+        self.events = events
+        self.window = window
+        self.invested = dict((t, False) for t in self.bars.ticker_list)
+
+    def calculate_signals(self, event):
+        for t in self.bars.ticker_list:
+            closes = self.bars.get_latest_bars_values(t, 'adj_close', self.window)
+            if len(closes) < self.window:
+                continue
+
+            above = closes[-1] > closes.mean()
+            if above and not self.invested[t]:
+                self.events.put(SignalEvent(0, t, None, 'LONG', 1.0))
+                self.invested[t] = True
+            elif not above and self.invested[t]:
+                self.events.put(SignalEvent(0, t, None, 'EXIT', 1.0))
+                self.invested[t] = False
+
+
+class TestParameterGrid(unittest.TestCase):
+    def test_parameter_grid(self):
+        self.assertEqual(
+            parameter_grid({'b': [1, 2], 'a': ['x']}),
+            [{'a': 'x', 'b': 1}, {'a': 'x', 'b': 2}],
+        )
+
+
+class TestParameterSweep(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store = make_test_store()
+        self.grid = {'window': [3, 5, 10]}
+        self.start_date = datetime(2000, 1, 1)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_parallel_matches_serial(self):
+        ticker_lists = [['SPY', 'IWM'], ['SPY']]
+        serial = ParameterSweep(self.store, MovingAverageStrategy, self.grid, ticker_lists, self.start_date, workers=1).run()
+        parallel = ParameterSweep(
+            self.store, MovingAverageStrategy, self.grid, ticker_lists, self.start_date,
+            workers=2, shared_dir=self.tmp_dir,
+        ).run()
+
+        self.assertEqual(len(serial), 6)
+        self.assertEqual([r['params'] for r in parallel], [r['params'] for r in serial])
+        self.assertEqual([r['ticker_list'] for r in parallel], [r['ticker_list'] for r in serial])
+        self.assertEqual([r['stats'] for r in parallel], [r['stats'] for r in serial])
+        self.assertEqual(parallel[0]['throughput']['bars'], 80)
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+
+    def test_resume(self):
+        results_path = os.path.join(self.tmp_dir, 'results.jsonl')
+        sweep = ParameterSweep(self.store, MovingAverageStrategy, self.grid, start_date=self.start_date, results_path=results_path, workers=1)
+        expected = sweep.run()
+
+        # Simulate a crash after the first run, part-way through writing the second
+        with open(results_path) as fh:
+            lines = fh.readlines()
+        with open(results_path, 'w') as fh:
+            fh.write(lines[0] + lines[1][:10])
+
+        resumed = sweep.run()
+        with open(results_path) as fh:
+            lines = fh.readlines()
+
+        self.assertEqual([r['stats'] for r in resumed], [r['stats'] for r in expected])
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(
+            [json.loads(line)['key'] for line in lines[2:]],
+            [expected[1]['key'], expected[2]['key']],
+        )
+
+
+class TestWalkForward(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.store = make_test_store(num_bars=100)
+        self.grid = {'window': [3, 5, 10]}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_windows(self):
+        walk = WalkForward(self.store, MovingAverageStrategy, self.grid, 40, 20)
+        self.assertEqual(walk.windows(), [((0, 40), (40, 60)), ((20, 60), (60, 80)), ((40, 80), (80, 100))])
+
+        walk = WalkForward(self.store, MovingAverageStrategy, self.grid, 50, 20, step=30)
+        self.assertEqual(walk.windows(), [((0, 50), (50, 70)), ((30, 80), (80, 100))])
+
+        with self.assertRaises(ValueError):
+            WalkForward(self.store, MovingAverageStrategy, self.grid, 40, 20, step=10)
+        with self.assertRaises(ValueError):
+            WalkForward(self.store, MovingAverageStrategy, self.grid, 90, 20)
+
+    def test_optimize_window(self):
+        result = optimize_window(self.store, MovingAverageStrategy, self.grid, self.store.ticker_list, (0, 40), (40, 60))
+
+        sweep = ParameterSweep(self.store.slice(0, 40), MovingAverageStrategy, self.grid, start_date=self.store.index[0], workers=1).run()
+        best = max(sweep, key=lambda r: r['stats']['sharpe_ratio'])
+
+        self.assertEqual(result['params'], best['params'])
+        self.assertEqual(result['train'], (self.store.index[0], self.store.index[39]))
+        self.assertEqual(result['test'], (self.store.index[40], self.store.index[59]))
+        self.assertEqual(len(result['equity']), 21)
+
+    def test_optimize_window_warmup(self):
+        result = optimize_window(self.store, MovingAverageStrategy, self.grid, self.store.ticker_list, (0, 40), (40, 60), warmup=10)
+        full = run_backtest(self.store.slice(30, 60), MovingAverageStrategy, result['params'], self.store.ticker_list, self.store.index[30], equity=True)
+
+        # The warm-up bars are traded but only the test bars are recorded, from the close of the last warm-up bar
+        self.assertEqual(result['test'], (self.store.index[40], self.store.index[59]))
+        self.assertEqual(list(result['equity'].index), list(self.store.index[39:60]))
+        pd.testing.assert_series_equal(result['equity'], full['equity'].iloc[10:])
+
+        walk = WalkForward(self.store, MovingAverageStrategy, self.grid, 40, 20, warmup=10, workers=1)
+        curve = walk.run()
+        self.assertEqual(list(curve.index), list(self.store.index[40:]))
+        self.assertEqual([r['test'][0] for r in walk.results], [self.store.index[40], self.store.index[60], self.store.index[80]])
+
+    def test_parallel_matches_serial(self):
+        serial = WalkForward(self.store, MovingAverageStrategy, self.grid, 40, 20, workers=1)
+        parallel = WalkForward(self.store, MovingAverageStrategy, self.grid, 40, 20, workers=2, shared_dir=self.tmp_dir)
+        curve = serial.run()
+
+        pd.testing.assert_series_equal(parallel.run(), curve)
+        self.assertEqual([r['params'] for r in parallel.results], [r['params'] for r in serial.results])
+        self.assertEqual(os.listdir(self.tmp_dir), [])
+
+        # The out-of-sample segments cover bars 40-99 once each
+        self.assertEqual(list(curve.index), list(self.store.index[40:]))
+        segment = serial.results[0]['equity']
+        self.assertAlmostEqual(curve.iloc[19], segment.iloc[-1] / segment.iloc[0])
@@ -6,7 +6,10 @@ import numpy as np
 import pandas as pd
 import unittest
 
-from algo_trade.portfolio import Portfolio
+from algo_trade.data import BarStore, WindowStore
+from algo_trade.broker import SimulatedBroker
+from algo_trade.portfolio import Ledger, Portfolio
+from algo_trade.sizing import PositionSizer
 from algo_trade.event import FillEvent, OrderEvent, SignalEvent
 
 
@@ -80,4 +83,122 @@ class TestModuleFunction(unittest.TestCase):
 
         self.assertEqual(output_order_long, expected_order_long)
         self.assertEqual(output_order_short, expected_order_short)
-        self.assertEqual(output_order_exit, expected_order_exit)
\ No newline at end of file
+        self.assertEqual(output_order_exit, expected_order_exit)
+
+class TestLedger(unittest.TestCase):
+    def test_append_and_grow(self):
+        ledger = Ledger(['SPY', 'cash'], capacity=2)
+        for i in range(5):
+            ledger.append(datetime(2000, 1, i + 1), [i, 100.0 - i])
+
+        self.assertEqual(len(ledger), 5)
+        self.assertEqual(ledger[-1], {'datetime': datetime(2000, 1, 5), 'SPY': 4.0, 'cash': 96.0})
+        self.assertEqual([row['SPY'] for row in ledger], [0.0, 1.0, 2.0, 3.0, 4.0])
+        self.assertEqual(ledger.values.shape, (5, 2))
+        self.assertRaises(IndexError, ledger.__getitem__, 5)
+
+    def test_to_frame(self):
+        ledger = Ledger(['SPY', 'cash'])
+        ledger.append(datetime(2000, 1, 1), [1.0, 2.0])
+        frame = ledger.to_frame()
+
+        self.assertEqual(list(frame.columns), ['SPY', 'cash'])
+        self.assertEqual(frame.index.name, 'datetime')
+        self.assertTrue(np.shares_memory(frame.values, ledger.values))
+
+    def test_from_arrays(self):
+        ledger = Ledger(['SPY'])
+        ledger.append(datetime(2000, 1, 1), [1.0])
+        copy = Ledger.from_arrays(ledger.columns, ledger.index, ledger.values, capacity=10)
+        copy.append(datetime(2000, 1, 2), [2.0])
+
+        self.assertEqual(len(ledger), 1)
+        self.assertEqual(copy[0], ledger[0])
+        self.assertEqual(copy[1]['SPY'], 2.0)
+
+
+class TestPortfolioLedger(unittest.TestCase):
+    def test_equity_curve_wraps_ledger(self):
+        index = pd.bdate_range('2000-01-03', periods=5)
+        store = BarStore(index, ['SPY', 'IWM'], {'adj_close': np.arange(10, dtype=float).reshape(5, 2)})
+        bars = SimulatedBroker(Queue(), ['SPY', 'IWM'], bar_store=store)
+        portfolio = Portfolio(bars, Queue(), datetime(2000, 1, 1))
+        capacity = len(portfolio.all_holdings._index)
+
+        portfolio.update_fill(FillEvent(datetime.utcnow(), 'IWM', 'ARCA', 10, 'BUY', 10.0))
+        for _ in range(5):
+            bars.update_bars()
+            portfolio.update_timeindex(None)
+        portfolio.create_equity_curve_dataframe()
+        curve = portfolio.equity_curve
+
+        self.assertEqual(capacity, 6)
+        self.assertEqual(len(portfolio.all_holdings._index), 6)
+        self.assertTrue(np.shares_memory(curve['total'].values, portfolio.all_holdings.values))
+        np.testing.assert_array_equal(curve['IWM'].values, [0.0, 10.0, 30.0, 50.0, 70.0, 90.0])
+        np.testing.assert_array_equal(curve['total'].values[1:], 99990.0 + curve['IWM'].values[1:])
+        self.assertEqual(list(curve.index[1:]), list(index))
+
+    def test_window_store_capacity(self):
+        index = pd.bdate_range('2000-01-03', periods=4).values
+        store = WindowStore(index, ['SPY'], {'adj_close': np.ones((4, 1))}, rows=2)
+        bars = Mock(ticker_list=['SPY'], bar_store=store)
+        portfolio = Portfolio(bars, Queue(), datetime(2000, 1, 1))
+
+        # A streaming window does not tell the length of the run
+        self.assertEqual(len(store), 2)
+        self.assertEqual(len(portfolio.all_holdings._index), 1024)
+
+class TestPortfolioSizing(unittest.TestCase):
+    def setUp(self):
+        index = pd.bdate_range('2000-01-03', periods=3)
+        prices = np.array([[10.0, 20.0, 50.0], [10.0, 20.0, 50.0], [10.0, 25.0, 50.0]])
+        store = BarStore(index, ['SPY', 'IWM', 'QQQ'], {'adj_close': prices})
+        self.bars = SimulatedBroker(Queue(), ['SPY', 'IWM', 'QQQ'], bar_store=store)
+        self.events = Queue()
+
+    def signals(self, *specs):
+        return [SignalEvent(0, ticker, None, signal_type, 1.0) for ticker, signal_type in specs]
+
+    def orders(self):
+        orders = list()
+        while not self.events.empty():
+            orders.append(self.events.get())
+        return orders
+
+    def test_batch(self):
+        sizer = PositionSizer(weight=0.25, max_leverage=0.6)
+        portfolio = Portfolio(self.bars, self.events, datetime(2000, 1, 1), sizer=sizer, strategy_id=2)
+        portfolio.update_fill(FillEvent(datetime.utcnow(), 'QQQ', 'ARCA', 200, 'BUY', 10000.0))
+        for _ in range(3):
+            self.bars.update_bars()
+            portfolio.update_timeindex(None)
+
+        # 10000 held in QQQ leaves 50000 of the 60000 gross cap for two 25000 positions, the last SPY signal wins
+        portfolio.update_signals(self.signals(('SPY', 'SHORT'), ('IWM', 'SHORT'), ('SPY', 'LONG'), ('QQQ', 'LONG')))
+
+        self.assertEqual(self.orders(), [
+            OrderEvent('SPY', 2500, 'BUY', 'MARKET', strategy_id=2),
+            OrderEvent('IWM', 1000, 'SELL', 'MARKET', strategy_id=2),
+        ])
+
+    def test_exit(self):
+        portfolio = Portfolio(self.bars, self.events, datetime(2000, 1, 1))
+        portfolio.update_fill(FillEvent(datetime.utcnow(), 'IWM', 'ARCA', 10, 'SELL', 200.0))
+        self.bars.update_bars()
+
+        portfolio.update_signals(self.signals(('IWM', 'EXIT'), ('SPY', 'EXIT')))
+        self.assertEqual(self.orders(), [OrderEvent('IWM', 10, 'BUY', 'MARKET')])
+
+    def test_unlisted_ticker(self):
+        index = pd.bdate_range('2000-01-03', periods=2)
+        store = BarStore(index, ['SPY', 'IWM'], {'adj_close': np.array([[10.0, np.nan], [10.0, 20.0]])})
+        bars = SimulatedBroker(Queue(), ['SPY', 'IWM'], bar_store=store)
+        portfolio = Portfolio(bars, self.events, datetime(2000, 1, 1), sizer=PositionSizer(weight=0.5, max_leverage=1.0))
+        bars.update_bars()
+        portfolio.update_timeindex(None)
+
+        # IWM has no price before it lists, which leaves the equity known while it is not held
+        self.assertEqual(portfolio.all_holdings.values[-1][-1], 100000.0)
+        portfolio.update_signals(self.signals(('SPY', 'LONG'), ('IWM', 'LONG')))
+        self.assertEqual(self.orders(), [OrderEvent('SPY', 5000, 'BUY', 'MARKET')])
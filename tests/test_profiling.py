@@ -0,0 +1,102 @@
+import pstats
+import threading
+import unittest
+
+from algo_trade.profiling import BarRangeHook, CProfileHook, LatencyHistogram, LatencyRecorder
+
+
+class TestLatencyHistogram(unittest.TestCase):
+    def test_percentiles(self):
+        histogram = LatencyHistogram()
+        for i in range(1, 1001):
+            histogram.record(i * 1e-6)
+
+        self.assertEqual(histogram.count, 1000)
+        self.assertAlmostEqual(histogram.mean, 500.5e-6)
+        self.assertEqual(histogram.max, 1e-3)
+        for q in (50, 90, 99):
+            self.assertAlmostEqual(histogram.percentile(q), q * 10e-6, delta=q * 10e-6 / histogram.SUB_BUCKETS)
+        self.assertEqual(histogram.percentile(100), 1e-3)
+
+    def test_out_of_range(self):
+        histogram = LatencyHistogram()
+        histogram.record(0.0)
+        histogram.record(1e6)
+
+        self.assertEqual(histogram.percentile(50), histogram._upper_bound(0))
+        self.assertEqual(histogram.percentile(100), 1e6)
+
+    def test_merge(self):
+        a, b = LatencyHistogram(), LatencyHistogram()
+        a.record(1e-3)
+        b.record(2e-3)
+        a.merge(b)
+
+        self.assertEqual(a.count, 2)
+        self.assertEqual(a.max, 2e-3)
+
+
+class TestLatencyRecorder(unittest.TestCase):
+    def test_wrap(self):
+        recorder = LatencyRecorder()
+        double = recorder.wrap('double', lambda x: 2 * x)
+
+        self.assertEqual(double(2), 4)
+        self.assertEqual(double(3), 6)
+
+        summary = recorder.summary()
+        self.assertEqual(summary['double']['count'], 2)
+        self.assertEqual(set(summary['double']), {'count', 'mean', 'max', 'p50', 'p90', 'p99', 'p99.9'})
+
+    def test_wrap_error(self):
+        recorder = LatencyRecorder(threadsafe=True)
+
+        def fail():
+            raise ValueError
+
+        self.assertRaises(ValueError, recorder.wrap('fail', fail))
+        self.assertEqual(recorder.histograms['fail'].count, 1)
+
+    def test_threadsafe(self):
+        recorder = LatencyRecorder(threadsafe=True)
+        start = threading.Barrier(5)
+
+        def record():
+            start.wait()
+            for i in range(2000):
+                recorder.record('name%d' % (i % 100), 1e-6)
+
+        # Threads creating the same new names while the summary is read lose no samples
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        while any(thread.is_alive() for thread in threads):
+            recorder.summary()
+        for thread in threads:
+            thread.join()
+
+        summary = recorder.summary()
+        self.assertEqual(len(summary), 100)
+        self.assertEqual(sum(stats['count'] for stats in summary.values()), 8000)
+
+
+class TestBarRangeHook(unittest.TestCase):
+    def test_range(self):
+        calls = list()
+        hook = BarRangeHook(2, 4, lambda: calls.append('start'), lambda: calls.append('stop'))
+
+        for bar in range(6):
+            hook.on_bar(bar)
+            calls.append(bar)
+
+        self.assertEqual(calls, [0, 1, 'start', 2, 3, 'stop', 4, 5])
+
+    def test_close(self):
+        hook = CProfileHook(0, 100)
+        hook.on_bar(0)
+        sum(range(1000))
+        hook.close()
+
+        self.assertFalse(hook.active)
+        self.assertIsInstance(hook.stats(), pstats.Stats)
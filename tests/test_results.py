@@ -0,0 +1,72 @@
+import numpy as np
+import os
+import pandas as pd
+import shutil
+import tempfile
+import threading
+import unittest
+
+from algo_trade.results import ResultsSink, dumps_result, read_results
+
+
+class TestResults(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'results.bin')
+
+        index = pd.date_range('2000-01-03', periods=5, freq='B', name='datetime')
+        self.equity = pd.DataFrame({'total': np.linspace(100.0, 104.0, 5), 'returns': [np.nan, 0.01, 0.01, 0.0, -0.01]}, index=index)
+        self.trades = pd.DataFrame(
+            {'ticker': ['SPY', 'IWM'], 'direction': ['BUY', 'SELL'], 'quantity': [100, 50], 'fill_cost': [1.5e4, 9.0e3]},
+            index=index[[1, 3]],
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_round_trip(self):
+        for compress in (True, False):
+            sink = ResultsSink(self.path, compress=compress)
+            sink.write('run', self.equity, self.trades, {'sharpe_ratio': 1.5})
+            sink.close()
+
+            [result] = read_results(self.path)
+            self.assertEqual(result['name'], 'run')
+            self.assertEqual(result['stats'], {'sharpe_ratio': 1.5})
+            pd.testing.assert_frame_equal(result['equity'], self.equity, check_freq=False)
+            pd.testing.assert_frame_equal(result['trades'], self.trades, check_freq=False)
+
+    def test_append(self):
+        for i in range(3):
+            sink = ResultsSink(self.path, append=True)
+            sink.write('run_%d' % i, self.equity * i)
+            sink.close()
+
+        results = read_results(self.path)
+        self.assertEqual([r['name'] for r in results], ['run_0', 'run_1', 'run_2'])
+        pd.testing.assert_frame_equal(results[2]['equity'], self.equity * 2, check_freq=False)
+        self.assertNotIn('trades', results[0])
+
+        ResultsSink(self.path).close()
+        self.assertEqual(read_results(self.path), [])
+
+    def test_background_write(self):
+        release = threading.Event()
+        sink = ResultsSink(self.path)
+        write = sink._write
+        sink._write = lambda *args: (release.wait(), write(*args))
+
+        sink.write('run', self.equity)
+        self.equity['total'] = 0.0
+        self.assertEqual(sink.written, 0)
+
+        release.set()
+        sink.close()
+        self.assertEqual(sink.written, 1)
+        self.assertEqual(read_results(self.path)[0]['equity']['total'].iloc[-1], 104.0)
+
+    def test_bad_record(self):
+        with open(self.path, 'wb') as fh:
+            fh.write(b'XXXX' + dumps_result('run', {'equity': self.equity})[4:])
+        with self.assertRaises(ValueError):
+            read_results(self.path)
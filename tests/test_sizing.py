@@ -0,0 +1,69 @@
+import numpy as np
+import unittest
+
+from algo_trade.sizing import PositionSizer
+
+
+class TestPositionSizer(unittest.TestCase):
+    def setUp(self):
+        self.directions = [1, -1, 0, 1]
+        self.strengths = [0.5, 1.0, 1.0, 2.0]
+        self.positions = [0, 0, 30, 40]
+        self.prices = [10.0, 20.0, 50.0, 100.0]
+
+    def target(self, sizer, equity=100000.0, cash=100000.0, **kwargs):
+        return sizer.target_positions(self.directions, self.strengths, self.positions, self.prices, equity, cash, **kwargs).tolist()
+
+    def test_default_quantity(self):
+        self.assertEqual(self.target(PositionSizer()), [100, -100, 0, 40])
+        self.assertEqual(self.target(PositionSizer(rebalance=True)), [100, -100, 0, 100])
+        self.assertEqual(self.target(PositionSizer(scale_by_strength=True, rebalance=True)), [50, -100, 0, 200])
+
+    def test_weight_and_caps(self):
+        self.assertEqual(self.target(PositionSizer(weight=0.1, rebalance=True)), [1000, -500, 0, 100])
+        self.assertEqual(self.target(PositionSizer(weight=0.1, max_weight=0.05, rebalance=True)), [500, -250, 0, 50])
+        self.assertEqual(self.target(PositionSizer(weight=0.1, max_quantity=200, rebalance=True)), [200, -200, 0, 100])
+
+    def test_volatility_target(self):
+        rng = np.random.default_rng(0)
+        returns = rng.normal(0.0, 0.01, size=(21, 4)) * [1.0, 2.0, 1.0, 4.0]
+        history = np.cumprod(1.0 + returns, axis=0) * self.prices
+        prices = history[-1]
+        volatility = np.std(history[1:] / history[:-1] - 1.0, axis=0) * np.sqrt(252)
+
+        sizer = PositionSizer(target_volatility=0.1, rebalance=True)
+        targets = sizer.target_positions(self.directions, self.strengths, self.positions, prices, 100000.0, 100000.0, history)
+        expected = np.trunc(np.array([1, -1, 0, 1]) * 0.1 / volatility * 100000.0 / prices)
+
+        self.assertEqual(sizer.history, 21)
+        np.testing.assert_array_equal(targets, expected)
+
+        # Names without enough history are left alone
+        targets = sizer.target_positions(self.directions, self.strengths, self.positions, prices, 100000.0, 100000.0, history[-1:])
+        self.assertEqual(targets.tolist(), [0, 0, 0, 40])
+
+    def test_leverage(self):
+        # 10% of equity per name: 30% gross traded plus 50% held outside the batch, capped at 60%
+        sizer = PositionSizer(weight=0.1, max_leverage=0.6, rebalance=True)
+        targets = self.target(sizer, exposure=50000.0)
+        self.assertEqual(targets, [333, -166, 0, 33])
+        self.assertLessEqual(np.abs(np.multiply(targets, self.prices)).sum() + 50000.0, 60000.0)
+
+    def test_cash_limit(self):
+        # Buys of 10000 and 6000 paid for by 4000 of cash, 10000 of short sale and 1500 of exit proceeds
+        sizer = PositionSizer(weight=0.1, rebalance=True, cash_limit=True)
+        targets = self.target(sizer, cash=4000.0)
+        trades = (np.subtract(targets, self.positions) * self.prices)
+
+        self.assertEqual(targets[1:3], [-500, 0])
+        self.assertLessEqual(trades[trades > 0].sum(), 4000.0 - trades[trades < 0].sum())
+        self.assertAlmostEqual(targets[0] / 1000.0, (targets[3] - 40) / 60.0, delta=0.02)
+
+    def test_exit_and_unknown_equity(self):
+        # Exits are never scaled down, even when buying back a short uses up the cash
+        sizer = PositionSizer(cash_limit=True)
+        self.assertEqual(sizer.target_positions([0, 1], [1, 1], [-100, 0], [10.0, 10.0], 1e5, 500.0).tolist(), [0, 0])
+
+        # Without a valid equity the leverage cap allows no new exposure
+        sizer = PositionSizer(max_leverage=1.0)
+        self.assertEqual(sizer.target_positions([1], [1], [0], [10.0], np.nan, 0.0).tolist(), [0])
@@ -1,5 +1,6 @@
 import numpy as np
 import pandas as pd
+import time
 import unittest
 
 import utilities
@@ -26,4 +27,52 @@ class TestFunction(unittest.TestCase):
         _, test_ddmax, test_duration = utilities.create_drawdowns(self.spy_pnl)
 
         self.assertAlmostEqual(test_ddmax, 0.08217484)
-        self.assertEqual(test_duration, 5)
\ No newline at end of file
+        self.assertEqual(test_duration, 5)
+
+class TestRunningMetrics(unittest.TestCase):
+    def setUp(self):
+        self.spy_series = pd.Series([320.632233,321.672821,315.831909,318.178101,323.027496,326.757843,327.85733,326.109955,328.544495,329.113861,331.234283,330.880859,331.41098,330.556915,332.13736,330.772919,327.366516,316.509247,306.918335,305.789459])
+        self.metrics = utilities.RunningMetrics(self.spy_series[0])
+        for value in self.spy_series[1:]:
+            self.metrics.update(value)
+
+    def test_matches_batch(self):
+        returns = self.spy_series.pct_change()
+        drawdown, max_dd, duration = utilities.create_drawdowns(self.spy_series / self.spy_series[0])
+
+        self.assertAlmostEqual(self.metrics.sharpe_ratio(), utilities.create_sharpe_ratio(returns))
+        self.assertAlmostEqual(self.metrics.mean, returns.mean())
+        self.assertAlmostEqual(self.metrics.variance, returns.var(ddof=0))
+        self.assertAlmostEqual(self.metrics.max_drawdown, max_dd)
+        self.assertAlmostEqual(self.metrics.drawdown, drawdown.iloc[-1])
+        self.assertEqual(self.metrics.max_duration, duration.max())
+        self.assertAlmostEqual(self.metrics.total_return, self.spy_series.iloc[-1] / self.spy_series[0] - 1.0)
+
+    def test_nan_and_turnover(self):
+        metrics = utilities.RunningMetrics(100.0)
+        metrics.update(110.0)
+        metrics.update(np.nan)
+        metrics.update(99.0)
+        metrics.add_trade(-52.25)
+
+        self.assertEqual(metrics.bars, 3)
+        self.assertEqual(metrics.count, 2)
+        self.assertAlmostEqual(metrics.mean, (0.1 - 0.1) / 2)
+        self.assertAlmostEqual(metrics.drawdown, 0.11)
+        self.assertEqual(metrics.duration, 1)
+        self.assertAlmostEqual(metrics.turnover, 52.25 / 104.5)
+        self.assertTrue(np.isnan(utilities.RunningMetrics(1.0).sharpe_ratio()))
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_burst_then_rate(self):
+        limiter = utilities.RateLimiter(rate=50, burst=5)
+
+        start = time.monotonic()
+        for _ in range(5):
+            limiter.acquire()
+        self.assertLess(time.monotonic() - start, 0.05)
+
+        for _ in range(5):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)